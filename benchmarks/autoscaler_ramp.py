@@ -0,0 +1,136 @@
+"""
+Synthetic load ramp for the replica autoscaler.
+
+Drives autoscaler.Autoscaler in simulated time against an in-memory service manager.
+Offered load ramps up, holds, spikes briefly and ramps back down, with noise. Each
+replica serves up to --capacity req/s and latency grows as the replicas saturate.
+The database has one web_server client, which spreads its requests over every replica.
+Prints the replica timeline and a summary (scale actions, direction flips, time
+spent over the latency target, colab instances preempted).
+
+Usage: python3 benchmarks/autoscaler_ramp.py [--peak 160] [--capacity 60]
+"""
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from autoscaler import Autoscaler, AutoscalePolicy
+from catalog import ServiceCatalog, replica_name
+
+STEP = 5.0  # seconds of simulated time per evaluation
+
+
+class SimServiceManager:
+    """In-memory stand-in for ServiceManager exposing what the autoscaler uses."""
+    def __init__(self, slots, colab_instances):
+        self.catalog = ServiceCatalog.load()
+        self.service_instances = {}
+        self.slots = slots
+        self.colab = colab_instances
+        self.preempted = 0
+        self.actions = []
+        self._add("web-1", "database", 1)
+        self._add("web-1", "web_server", 1)
+
+    @staticmethod
+    def _service_name(service_key):
+        return service_key.rsplit("-", 1)[0]
+
+    def _add(self, service_key, app_name, index):
+        self.service_instances[(service_key, replica_name(app_name, index))] = {"base_app": app_name, "listen_port": 81}
+
+    def available_slots(self, net):
+        return self.slots - len(self.service_instances) - 2 * self.colab
+
+    def make_room(self, net, needed_slots):
+        while self.available_slots(net) < needed_slots and self.colab:
+            self.colab -= 1
+            self.preempted += 1
+        return self.available_slots(net)
+
+    def try_redeploy_colab(self, net):
+        while self.available_slots(net) >= 2:
+            self.colab += 1
+
+    def scale_app(self, net, service_key, app_name, replicas):
+        current = [k for k, inst in self.service_instances.items() if k[0] == service_key and inst["base_app"] == app_name]
+        for index in range(len(current) + 1, replicas + 1):
+            self._add(service_key, app_name, index)
+        for index in range(len(current), replicas, -1):
+            del self.service_instances[(service_key, replica_name(app_name, index))]
+        self.actions.append(replicas)
+        return True
+
+
+class SyntheticSource:
+    """Offered load and latency of the database replicas at the current simulated time."""
+    def __init__(self, manager, capacity, base_latency_ms=10.0):
+        self.manager = manager
+        self.capacity = capacity
+        self.base_latency_ms = base_latency_ms
+        self.offered = 0.0
+
+    def replicas(self):
+        return sum(1 for k, inst in self.manager.service_instances.items() if inst["base_app"] == "database")
+
+    def latency(self):
+        utilization = min(self.offered / (self.replicas() * self.capacity), 0.98)
+        return self.base_latency_ms / (1 - utilization)
+
+    def collect(self):
+        served = min(self.offered, self.replicas() * self.capacity)
+        return {("web-1", "database"): {"rps": served, "latency_ms": self.latency()}}
+
+
+def offered_load(t, peak):
+    """Ramp up over 10 min, hold 5 min with a 1 min spike, ramp down over 10 min, idle 5 min."""
+    if t < 600:
+        load = peak * t / 600
+    elif t < 900:
+        load = peak * (1.3 if 720 <= t < 780 else 1.0)
+    elif t < 1500:
+        load = peak * (1 - (t - 900) / 600)
+    else:
+        load = 0.0
+    return max(0.0, load * random.uniform(0.9, 1.1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--peak", type=float, default=160.0, help="peak offered load (req/s)")
+    parser.add_argument("--capacity", type=float, default=60.0, help="requests/s one replica can serve")
+    parser.add_argument("--slots", type=int, default=12, help="host slots in the simulated topology")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    manager = SimServiceManager(slots=args.slots, colab_instances=(args.slots - 2) // 2)
+    source = SyntheticSource(manager, args.capacity)
+    scaler = Autoscaler(manager, net=None, source=source, policy=AutoscalePolicy())
+    latency_target = manager.catalog.app("web", "database")["autoscale"]["latency_ms"]
+
+    violations = 0
+    steps = int(1800 / STEP)
+    print(f"{'t(s)':>6} {'offered':>8} {'replicas':>8} {'latency':>9} {'colab':>6}")
+    for step in range(steps):
+        now = step * STEP
+        source.offered = offered_load(now, args.peak)
+        scaler.evaluate(now)
+        if source.latency() > latency_target:
+            violations += 1
+        if step % 12 == 0:
+            print(f"{now:6.0f} {source.offered:8.1f} {source.replicas():8d} {source.latency():7.1f}ms {manager.colab:6d}")
+
+    flips = sum(1 for a, b, c in zip(manager.actions, manager.actions[1:], manager.actions[2:]) if (b - a) * (c - b) < 0)
+    print()
+    print(f"scale actions       : {len(manager.actions)} {manager.actions}")
+    print(f"direction flips     : {flips}")
+    print(f"time over {latency_target:.0f} ms    : {violations * STEP:.0f}s of {steps * STEP:.0f}s")
+    print(f"colab preempted     : {manager.preempted}")
+
+
+if __name__ == "__main__":
+    main()
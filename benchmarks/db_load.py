@@ -0,0 +1,154 @@
+"""
+Load test of the database service (src/scripts/database.py).
+
+Builds a store of --keys random keys with "database.py build" (timing the build and how long
+the server takes to open it), starts the server on it and runs --clients concurrent clients
+for --duration seconds, reporting keys/s and latency percentiles as JSON. Modes:
+"oneshot" opens a connection per GET as the old clients did, "keepalive" reuses one HTTP/1.1
+connection per client and "batch" fetches --batch keys per GET /batch request.
+--baseline REV also runs the script as it was at git revision REV (oneshot only: the old
+server has neither keep-alive nor batches and always serves its 4 built-in items).
+
+Usage: python3 benchmarks/db_load.py [--baseline REV] [--keys 1000000] [--clients 16] [--duration 5]
+"""
+import os
+import sys
+import json
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from common import SRC_DIR, percentile, ms, wait_for_port
+
+SCRIPTS_DIR = os.path.join(SRC_DIR, "scripts")
+PORT = 81
+
+
+def client(mode, key_count, batch, deadline, latencies, counts, errors):
+    rng = random.Random()
+    connection = None
+    while time.time() < deadline:
+        keys = [str(rng.randrange(1, key_count + 1)) for _ in range(batch if mode == "batch" else 1)]
+        path = f"/batch?keys={','.join(keys)}" if mode == "batch" else f"/{keys[0]}"
+        start = time.perf_counter()
+        try:
+            if connection is None:
+                connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=10)
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                raise ConnectionError(f"HTTP {response.status}")
+            latencies.append(time.perf_counter() - start)
+            counts.append(len(keys))
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            connection.close()
+            connection = None
+            continue
+        # A new connection for every request, as the old HTTP/1.0 server requires
+        if mode == "oneshot":
+            connection.close()
+            connection = None
+    if connection is not None:
+        connection.close()
+
+
+def wait_for_free_port(port, timeout=120):
+    # The old server closes every connection itself and does not set SO_REUSEADDR, so its
+    # TIME_WAIT sockets keep the port from being bound again for up to a minute
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with socket.socket() as s:
+            s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            try:
+                s.bind(("0.0.0.0", port))
+                return
+            except OSError:
+                time.sleep(1)
+
+
+def run(script_path, env, mode, key_count, batch, clients, duration):
+    wait_for_free_port(PORT)
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, script_path], cwd=SCRIPTS_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(PORT, timeout=60):
+            return {"error": f"{os.path.basename(script_path)} did not listen on port {PORT}"}
+        startup = time.perf_counter() - started
+        latencies, counts, errors = [], [], []
+        deadline = time.time() + duration
+        threads = [threading.Thread(target=client, args=(mode, key_count, batch, deadline, latencies, counts, errors))
+                   for _ in range(clients)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=duration + 30)
+        elapsed = time.time() - start
+        return {"startup_s": round(startup, 3), "requests": len(latencies), "errors": len(errors),
+                "rps": round(len(latencies) / elapsed, 1), "keys_per_s": round(sum(counts) / elapsed, 1),
+                "p50_ms": ms(percentile(latencies, 0.5)), "p99_ms": ms(percentile(latencies, 0.99))}
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def build_store(directory, key_count, value_size):
+    source = os.path.join(directory, "items.jsonl")
+    rng = random.Random(0)
+    with open(source, "w") as f:
+        for key in range(1, key_count + 1):
+            value = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(16)) * (value_size // 16)
+            f.write(json.dumps({"key": str(key), "value": value}) + "\n")
+    path = os.path.join(directory, "store")
+    start = time.perf_counter()
+    subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "database.py"), "build", path, source],
+                   cwd=SCRIPTS_DIR, check=True, stdout=subprocess.DEVNULL)
+    return path, time.perf_counter() - start, os.path.getsize(path + ".data") + os.path.getsize(path + ".idx")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--baseline", help="git revision to compare against")
+    parser.add_argument("--modes", nargs="+", choices=["oneshot", "keepalive", "batch"], default=["oneshot", "keepalive", "batch"])
+    parser.add_argument("--keys", type=int, default=1000000)
+    parser.add_argument("--value-size", type=int, default=128)
+    parser.add_argument("--batch", type=int, default=50, help="keys per batch request")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    report = {"keys": args.keys, "clients": args.clients, "duration_s": args.duration, "results": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        path, build_s, size = build_store(directory, args.keys, args.value_size)
+        report["build_s"] = round(build_s, 3)
+        report["store_bytes"] = size
+        print(f"[INFO] Built {args.keys} keys ({size} bytes) in {build_s:.1f}s", file=sys.stderr)
+        versions = [("current", os.path.join(SCRIPTS_DIR, "database.py"), dict(os.environ, DB_PATH=path))]
+        if args.baseline:
+            source = subprocess.run(["git", "show", f"{args.baseline}:src/scripts/database.py"], cwd=SRC_DIR,
+                                    capture_output=True, text=True, check=True).stdout
+            baseline_path = os.path.join(directory, "database_baseline.py")
+            with open(baseline_path, "w") as f:
+                f.write(source)
+            versions.insert(0, (f"baseline {args.baseline}", baseline_path, dict(os.environ)))
+        for version, script_path, env in versions:
+            for mode in args.modes:
+                if mode != "oneshot" and version != "current":
+                    continue
+                # The old server only knows items 1-4
+                key_count = args.keys if version == "current" else 4
+                result = run(script_path, env, mode, key_count, args.batch, args.clients, args.duration)
+                report["results"][f"{version} {mode}"] = result
+                print(f"[INFO] {version} {mode}: {result.get('keys_per_s')} keys/s", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""
+Memory and GC cost of FlowManager's flow table at --flows flows (100k by default).
+
+Flows are generated as add_flow_queue would install them on a large topology, as forward and
+reverse pairs, without any REST call: --hosts hosts on --switches switches, --services services.
+For each representation:
+
+  dict   the first one: a dict of fields per flow, the reverse built with copy() and update(),
+         and the journal mirror keyed by the JSON-encoded flow key
+  slots  the second one: an object with slots per flow, interned values, the directions of a pair
+         pointing to each other, the journal mirror sharing the objects
+  row    FlowEntry rows: a plain tuple of interned values per flow, pairs found by key, the journal
+         mirror sharing the rows
+
+the table is built (live), written as a journal snapshot and loaded back as a restore would
+(restored, where nothing is shared with the topology's strings unless interned). Reports the
+memory held (tracemalloc), the build time and the part of it spent in garbage collections, the
+time of a full gc.collect() once built (baseline_full_gc_s: before anything is built), and the
+snapshot size. Objects and dicts stay tracked by
+the garbage collector and every collection of the oldest generation traverses all of them; tuples
+of strings, ints and None are untracked by the first collection that sees them.
+
+Usage: python3 benchmarks/flow_memory.py [--flows 100000] [--output flow_memory.json]
+"""
+import gc
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from common import SRC_DIR, git_commit
+
+sys.path.insert(0, SRC_DIR)
+
+from flow import FlowManager, FlowEntry, intern
+from journal import DeploymentJournal
+
+
+def flow_specs(args):
+    """
+    (service_key, dpid, src_ip, dst_ip, protocol, src_port, dst_port, in_port, out_port, priority) of every
+    forward flow. IPs and dpids are shared objects, as host.IP() and switch.dpid are.
+    """
+    rng = random.Random(args.seed)
+    ips = [f"10.{i // 65536}.{i // 256 % 256}.{i % 256}" for i in range(args.hosts)]
+    dpids = [f"{i + 1:016x}" for i in range(args.switches)]
+    services = [f"service{i % 7}-{i + 1}" for i in range(args.services)]
+    specs = []
+    while len(specs) * 2 < args.flows:
+        src_ip, dst_ip = rng.sample(ips, 2)
+        service_key = rng.choice(services)
+        protocol, dst_port = rng.choice([(1, None), (6, 81), (6, 85), (6, 5000), (6, 5001), (6, 8083)])
+        # A path of a few switches, one flow pair per hop
+        for hop in range(rng.randint(1, 5)):
+            specs.append((service_key, rng.choice(dpids), src_ip, dst_ip, protocol, None, dst_port,
+                          rng.randint(1, 48), rng.randint(1, 48), 100))
+    return specs[:args.flows // 2]
+
+
+def build_dicts(specs, state):
+    active_flows = {}
+    for service_key, dpid, src_ip, dst_ip, protocol, src_port, dst_port, in_port, out_port, priority in specs:
+        flow_params = {
+            'action': 'add', 'dpid': dpid, 'src_ip': src_ip, 'dst_ip': dst_ip,
+            'protocol': protocol, 'src_port': src_port, 'dst_port': dst_port,
+            'in_port': in_port, 'out_port': out_port, 'priority': priority, 'service_key': service_key
+        }
+        key = (service_key, src_ip, dst_ip, dst_port, protocol, dpid, in_port)
+        active_flows[key] = flow_params
+        state["flows"][json.dumps(list(key))] = flow_params
+        rev_flow_params = flow_params.copy()
+        rev_flow_params.update({'src_ip': dst_ip, 'dst_ip': src_ip, 'src_port': dst_port, 'dst_port': src_port,
+                                'in_port': out_port, 'out_port': in_port})
+        key = (service_key, dst_ip, src_ip, src_port, protocol, dpid, out_port)
+        active_flows[key] = rev_flow_params
+        state["flows"][json.dumps(list(key))] = rev_flow_params
+    return active_flows
+
+
+class SlotsEntry:
+    """The former flow object, kept here for comparison."""
+    FIELDS = FlowEntry.FIELDS
+    __slots__ = FIELDS + ("reverse",)
+
+    def __init__(self, *values):
+        for name, value in zip(self.FIELDS, values + (None,) * (len(self.FIELDS) - len(values))):
+            setattr(self, name, intern(value))
+        self.reverse = None
+
+    @property
+    def key(self):
+        return (self.service_key, self.src_ip, self.dst_ip, self.dst_port, self.protocol, self.dpid, self.in_port)
+
+    @property
+    def reverse_key(self):
+        return (self.service_key, self.dst_ip, self.src_ip, self.src_port, self.protocol, self.dpid, self.out_port)
+
+    def reversed(self):
+        return SlotsEntry(self.service_key, self.dpid, self.dst_ip, self.src_ip, self.protocol, self.dst_port,
+                          self.src_port, self.out_port, self.in_port, self.priority)
+
+    def to_row(self):
+        return [getattr(self, name) for name in self.FIELDS]
+
+
+def build_slots(specs, state):
+    active_flows = {}
+    for spec in specs:
+        flow = SlotsEntry(*spec)
+        for entry in (flow, flow.reversed()):
+            active_flows[entry.key] = entry
+            reverse = active_flows.get(entry.reverse_key)
+            if reverse is not None and reverse is not entry:
+                entry.reverse, reverse.reverse = reverse, entry
+            DeploymentJournal.apply(state, {"event": "flow_add", "key": entry.key, "flow": entry})
+    return active_flows
+
+
+def build_rows(specs, state):
+    flow_manager = FlowManager()
+    for spec in specs:
+        flow = FlowEntry.row(*spec)
+        for row in (flow, FlowEntry.reversed(flow)):
+            flow_manager._track(row)
+            DeploymentJournal.apply(state, {"event": "flow_add", "key": FlowEntry.key(row), "flow": row})
+    return flow_manager.active_flows
+
+
+BUILDERS = {"dict": build_dicts, "slots": build_slots, "row": build_rows}
+
+
+class GCTimer:
+    """Total time of the garbage collections run while it is active (gc.callbacks)."""
+    def __init__(self):
+        self.seconds = 0.0
+        self.collections = 0
+        self.started = None
+
+    def __call__(self, phase, info):
+        if phase == "start":
+            self.started = time.perf_counter()
+        elif self.started is not None:
+            self.seconds += time.perf_counter() - self.started
+            self.collections += 1
+
+    def __enter__(self):
+        gc.callbacks.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        gc.callbacks.remove(self)
+
+
+def measure(build):
+    """Runs build() under tracemalloc: (its result, MB held, seconds, seconds spent in GC during the build)."""
+    gc.collect()
+    with GCTimer() as gc_timer:
+        start = time.perf_counter()
+        result = build()
+        seconds = time.perf_counter() - start
+    # Memory is traced in a second run: tracemalloc slows allocations down, which would skew the timings
+    result = None
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    held = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, round(held / 1e6, 2), seconds, gc_timer.seconds
+
+
+def gc_seconds(runs=3):
+    start = time.perf_counter()
+    for _ in range(runs):
+        gc.collect()
+    return (time.perf_counter() - start) / runs
+
+
+def run(representation, specs):
+    with tempfile.TemporaryDirectory() as state_dir:
+        return _run(representation, specs, DeploymentJournal(state_dir))
+
+
+def _run(representation, specs, journal):
+    def build():
+        journal.state = journal._empty_state()
+        return BUILDERS[representation](specs, journal.state)
+    flows, live_mb, build_s, build_gc_s = measure(build)
+    live_gc_s = gc_seconds()
+    start = time.perf_counter()
+    if representation == "dict":
+        # The first snapshot: the mirror as is
+        with open(journal.snapshot_path, "w") as f:
+            json.dump(journal.state, f)
+    elif representation == "slots":
+        with open(journal.snapshot_path, "w") as f:
+            json.dump(dict(journal.state, flows=list(journal.state["flows"].items())), f, default=SlotsEntry.to_row)
+    else:
+        journal.snapshot()
+    snapshot_s = time.perf_counter() - start
+    snapshot_mb = os.path.getsize(journal.snapshot_path) / 1e6
+    count = len(flows)
+    del flows
+    journal.state = journal._empty_state()
+    gc.collect()
+
+    def restore():
+        if representation == "dict":
+            with open(journal.snapshot_path) as f:
+                return {tuple(json.loads(key)): flow for key, flow in json.load(f)["flows"].items()}
+        if representation == "slots":
+            entries = [SlotsEntry(*row) for row in journal.load()["flows"].values()]
+            return {entry.key: entry for entry in entries}
+        return {FlowEntry.key(row): row for row in (FlowEntry.from_row(flow) for flow in journal.load()["flows"].values())}
+    restored, restored_mb, restore_s, restore_gc_s = measure(restore)
+    restored_gc_s = gc_seconds()
+    assert len(restored) == count
+    return {"flows": count, "live_mb": live_mb, "bytes_per_flow": round(live_mb * 1e6 / count), "build_s": round(build_s, 3),
+            "build_gc_s": round(build_gc_s, 3), "full_gc_s": round(live_gc_s, 4), "snapshot_mb": round(snapshot_mb, 2),
+            "snapshot_s": round(snapshot_s, 3), "restored_mb": restored_mb, "restore_s": round(restore_s, 3),
+            "restore_gc_s": round(restore_gc_s, 3), "restored_full_gc_s": round(restored_gc_s, 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flows", type=int, default=100000)
+    parser.add_argument("--hosts", type=int, default=10000)
+    parser.add_argument("--switches", type=int, default=500)
+    parser.add_argument("--services", type=int, default=5000)
+    parser.add_argument("--representations", nargs="+", choices=list(BUILDERS), default=list(BUILDERS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="print each representation's result as it completes")
+    args = parser.parse_args()
+
+    specs = flow_specs(args)
+    report = {"commit": git_commit(), "flows": args.flows, "hosts": args.hosts, "switches": args.switches,
+              "services": args.services, "python": sys.version.split()[0],
+              "baseline_full_gc_s": round(gc_seconds(), 4), "representations": {}}
+    print(f"[INFO] baseline full gc {report['baseline_full_gc_s'] * 1000:.1f} ms", file=sys.stderr)
+    for representation in args.representations:
+        result = run(representation, specs)
+        report["representations"][representation] = result
+        if args.verbose:
+            print(f"[DEBUG] {representation}: {result}", file=sys.stderr)
+        print(f"[INFO] {representation:5} {result['flows']} flows: {result['live_mb']} MB live ({result['bytes_per_flow']} B/flow), "
+              f"build {result['build_s']}s (gc {result['build_gc_s']}s), full gc {result['full_gc_s'] * 1000:.1f} ms, snapshot {result['snapshot_mb']} MB, "
+              f"restored {result['restored_mb']} MB in {result['restore_s']}s (gc {result['restore_gc_s']}s), full gc {result['restored_full_gc_s'] * 1000:.1f} ms",
+              file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+End-to-end benchmark of the deploy pipeline.
+
+Runs scripted scenarios through ServiceManager against the in-process fake network
+and Ryu REST stub (default), or against real Mininet and a running Ryu controller
+(--backend mininet, needs root). Reports p50/p99 latency per phase, REST calls per
+operation and flows per switch as JSON, which can be compared with an earlier run.
+
+Scenarios:
+  deploy       deploy --services services on an empty network, then stop them
+  churn        --cycles random deploys and stops, keeping up to --services services
+  preemption   fill every host with colab, deploy services until full (each deploy
+               preempts colab) and stop them again (each stop refills colab)
+  colab_fill   deploy colab on all hosts
+  test         deploy services and run test_service on each (needs a writable /shared)
+
+Usage: python3 benchmarks/pipeline.py [--scenarios deploy churn] [--output run.json] [--compare base.json]
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import functools
+import contextlib
+import requests
+from common import SRC_DIR, git_commit, percentile, ms
+
+sys.path.insert(0, SRC_DIR)
+
+from network import NetworkManager
+
+SCENARIOS = ["deploy", "churn", "preemption", "colab_fill", "test"]
+SERVICES = ["web", "random", "datetime"]
+
+
+class Recorder:
+    """
+    Latency samples per phase and REST calls per top-level operation. Phases are timed by
+    wrapping ServiceManager/FlowManager methods on the instances under test.
+    """
+    def __init__(self, service_manager):
+        self.samples = {}  # phase: [seconds]
+        self.rest_calls = {}  # operation: [REST calls]
+        self.calls = 0
+        flow_manager = service_manager.flow_manager
+        send = flow_manager._send_flow_to_ryu
+
+        def counted_send(flow, *args):
+            self.calls += 1
+            return send(flow, *args)
+
+        flow_manager._send_flow_to_ryu = counted_send
+        for obj, method, phase in [
+            (service_manager, "_place_service", "placement"),
+            (service_manager, "_install_flows_for_service", "flow_install"),
+            (service_manager, "deploy_service_instance", "spawn"),
+            (service_manager, "_wait_until_ready", "readiness"),
+            (service_manager, "wait_for_file_content", "result_wait"),
+            (service_manager, "make_room", "preemption"),
+            (service_manager, "try_redeploy_colab", "colab_refill"),
+        ]:
+            self._time_method(obj, method, phase)
+
+    def _time_method(self, obj, method, phase):
+        original = getattr(obj, method)
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.samples.setdefault(phase, []).append(time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+
+    @contextlib.contextmanager
+    def operation(self, name):
+        calls = self.calls
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.setdefault(name, []).append(time.perf_counter() - start)
+            self.rest_calls.setdefault(name, []).append(self.calls - calls)
+
+    def report(self):
+        return {
+            "phases": {phase: {"count": len(samples),
+                               "p50_ms": ms(percentile(samples, 0.5)),
+                               "p99_ms": ms(percentile(samples, 0.99)),
+                               "mean_ms": round(sum(samples) / len(samples) * 1000, 3)}
+                       for phase, samples in sorted(self.samples.items())},
+            "rest_calls_per_op": {op: round(sum(calls) / len(calls), 2) for op, calls in sorted(self.rest_calls.items())},
+        }
+
+
+def flows_per_switch(nm):
+    counts = []
+    for switch in nm.net.switches:
+        dpid = int(switch.dpid, 16)
+        try:
+            response = requests.get(f"{nm.ryu_api_url}/stats/flow/{dpid}", timeout=5)
+            response.raise_for_status()
+            counts.append(len(response.json().get(str(dpid), [])))
+        except (requests.exceptions.RequestException, ValueError):
+            continue
+    if not counts:
+        return {}
+    return {"switches": len(counts), "total": sum(counts), "max": max(counts), "mean": round(sum(counts) / len(counts), 2)}
+
+
+def service_keys(sm, colab=False):
+    return sorted({k for (k, _) in sm.service_instances if k.startswith("colab") == colab})
+
+
+def deploy(sm, net, recorder, service_name):
+    with recorder.operation("deploy"):
+        try:
+            deployed = sm.deploy_services(net, service_name)
+        except ValueError as e:
+            print(f"[ERROR] {e}", file=sys.stderr)
+            return None
+    return deployed[0] if deployed else None
+
+
+def stop(sm, net, recorder, service_key):
+    with recorder.operation("stop"):
+        sm.stop_services(net, [service_key])
+
+
+def stop_all(sm):
+    for service_key in sorted({k for (k, _) in sm.service_instances}):
+        sm.stop_service_instance(service_key)
+
+
+def run_deploy(sm, net, recorder, args):
+    keys = [deploy(sm, net, recorder, SERVICES[i % len(SERVICES)]) for i in range(args.services)]
+    snapshot = {"flows_per_switch": flows_per_switch(args.nm)}
+    for key in keys:
+        if key:
+            stop(sm, net, recorder, key)
+    return snapshot
+
+
+def run_churn(sm, net, recorder, args):
+    rng = random.Random(args.seed)
+    peak = {}
+    for _ in range(args.cycles):
+        active = service_keys(sm)
+        if active and (len(active) >= args.services or rng.random() < 0.4):
+            stop(sm, net, recorder, rng.choice(active))
+        else:
+            deploy(sm, net, recorder, rng.choice(SERVICES))
+    peak["flows_per_switch"] = flows_per_switch(args.nm)
+    return peak
+
+
+def run_preemption(sm, net, recorder, args):
+    with recorder.operation("colab_fill"):
+        sm.deploy_colab_on_all_hosts(net)
+    keys = []
+    for i in range(args.services):
+        key = deploy(sm, net, recorder, SERVICES[i % len(SERVICES)])
+        if not key:
+            break
+        keys.append(key)
+    snapshot = {"flows_per_switch": flows_per_switch(args.nm), "services_deployed": len(keys),
+                "colab_left": len(service_keys(sm, colab=True))}
+    random.Random(args.seed).shuffle(keys)
+    for key in keys:
+        stop(sm, net, recorder, key)
+    return snapshot
+
+
+def run_colab_fill(sm, net, recorder, args):
+    with recorder.operation("colab_fill"):
+        sm.deploy_colab_on_all_hosts(net)
+    return {"flows_per_switch": flows_per_switch(args.nm), "colab_services": len(service_keys(sm, colab=True))}
+
+
+def run_test(sm, net, recorder, args):
+    try:
+        os.makedirs("/shared", exist_ok=True)
+    except OSError as e:
+        return {"skipped": f"/shared is not writable: {e}"}
+    keys = [deploy(sm, net, recorder, SERVICES[i % len(SERVICES)]) for i in range(min(args.services, 6))]
+    for key in keys:
+        if not key:
+            continue
+        if args.backend == "fake":
+            # Fake clients never run: write the result they would have produced
+            with open(f"/shared/{key}.txt", "w") as f:
+                f.write("benchmark result\n")
+        with recorder.operation("test"):
+            sm.test_service(key)
+        stop(sm, net, recorder, key)
+    return {}
+
+
+RUNNERS = {"deploy": run_deploy, "churn": run_churn, "preemption": run_preemption,
+           "colab_fill": run_colab_fill, "test": run_test}
+
+
+def compare(report, baseline):
+    print(f"{'scenario/phase':40} {'p50 base':>10} {'p50 now':>10} {'p99 base':>10} {'p99 now':>10}", file=sys.stderr)
+    for scenario, result in report["scenarios"].items():
+        base_phases = baseline.get("scenarios", {}).get(scenario, {}).get("phases", {})
+        for phase, stats in result.get("phases", {}).items():
+            base = base_phases.get(phase)
+            if not base:
+                continue
+            print(f"{scenario + '/' + phase:40} {base['p50_ms']:10.2f} {stats['p50_ms']:10.2f} "
+                  f"{base['p99_ms']:10.2f} {stats['p99_ms']:10.2f}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fake", "mininet"], default="fake")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--topology", default="complex", help="simple, complex, ring, linear, fat-tree or leaf-spine")
+    parser.add_argument("--hosts", type=int, default=6)
+    parser.add_argument("--switches", type=int, default=4)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--leaves", type=int, default=4)
+    parser.add_argument("--spines", type=int, default=2)
+    parser.add_argument("--hosts-per-leaf", type=int, default=4)
+    parser.add_argument("--services", type=int, default=6, help="services deployed per scenario")
+    parser.add_argument("--cycles", type=int, default=50, help="deploy/stop operations of the churn scenario")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare p50/p99 against")
+    parser.add_argument("--verbose", action="store_true", help="show the managers' log output")
+    args = parser.parse_args()
+
+    topology_params = {
+        "ring": {"hosts": args.hosts, "switches": args.switches},
+        "linear": {"hosts": args.hosts, "switches": args.switches},
+        "fat-tree": {"k": args.k},
+        "leaf-spine": {"leaves": args.leaves, "spines": args.spines, "hosts_per_leaf": args.hosts_per_leaf},
+    }.get(args.topology, {})
+    report = {"commit": git_commit(), "backend": args.backend, "topology": args.topology,
+              "topology_params": topology_params, "services": args.services, "cycles": args.cycles, "scenarios": {}}
+
+    log = sys.stdout if args.verbose else io.StringIO()
+    with tempfile.TemporaryDirectory() as state_dir:
+        nm = NetworkManager(args.topology, topology_params=topology_params, backend=args.backend, state_dir=state_dir)
+        args.nm = nm
+        try:
+            with contextlib.redirect_stdout(log):
+                net = nm.bring_up()
+            report["startup_ms"] = {phase: round(seconds * 1000, 3) for phase, seconds in nm.timings}
+            report["hosts"] = len(net.hosts)
+            report["switches"] = len(net.switches)
+            for scenario in args.scenarios:
+                random.seed(args.seed)
+                sm = nm.service_manager
+                recorder = Recorder(sm)
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(log):
+                    extra = RUNNERS[scenario](sm, net, recorder, args)
+                    stop_all(sm)
+                result = recorder.report()
+                result.update(extra)
+                result["wall_s"] = round(time.perf_counter() - start, 3)
+                report["scenarios"][scenario] = result
+                print(f"[INFO] {scenario}: {result['wall_s']}s", file=sys.stderr)
+                # Fresh, unwrapped manager for the next scenario
+                nm.service_manager.shutdown()
+                nm.service_manager = type(sm)(ryu_api_url=nm.ryu_api_url, state_dir=state_dir)
+        finally:
+            with contextlib.redirect_stdout(log):
+                nm.stop_network()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Latency of the critical services under colab saturation, with and without QoS.
+
+For each mode (--modes off on) a network is brought up (Mininet and a running Ryu controller
+by default: needs root, and OVS with OpenFlow meter support for the "on" mode), the --services
+are deployed and colab fills the remaining hosts. Then, for --duration seconds each:
+
+  idle       one open-loop load generator per service at --qps
+  saturated  the same, while --bulk colab services each run a closed-loop load generator
+             sending --payload-size byte messages to their colab_b, which echoes them back
+
+"on" starts the network with the QoS classes of services.json (queues and meters, see
+src/qos.py), "off" without. Reports qps and p50/p99/p99.9 latency of every service's load
+generator per phase, and the colab bulk throughput, as JSON. With --backend fake the scenario
+runs on the in-process network, where apps never execute: only the control path is exercised.
+
+Usage: sudo python3 benchmarks/qos_latency.py [--topology complex] [--services web random] [--output qos.json]
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+from common import SRC_DIR, git_commit
+
+sys.path.insert(0, SRC_DIR)
+
+from network import NetworkManager
+from loadstats import read_summaries
+
+# Load generators write a summary at least this often (their SUMMARY_INTERVAL)
+SUMMARY_INTERVAL = 5
+
+
+def start_loadgens(sm, net, service_keys, **options):
+    sm.make_room(net, len(service_keys))
+    started = {}
+    for key in service_keys:
+        instance_name = sm.start_loadgen(net, key, **options)
+        if instance_name is None:
+            print(f"[WARNING] No load generator started for {key}", file=sys.stderr)
+            continue
+        started[key] = instance_name
+    return started
+
+
+def stop_loadgens(sm, started):
+    for key, instance_name in started.items():
+        sm.stop_loadgen(key, instance_name)
+
+
+def summaries(started):
+    results = {}
+    for key, instance_name in started.items():
+        summary = read_summaries(service_key=key)["loadgens"].get(f"{key}/{instance_name}")
+        results[key] = {name: summary[name] for name in ("ok", "errors", "qps", "p50_ms", "p99_ms", "p999_ms")} if summary else None
+    return results
+
+
+def run_mode(args, mode, log):
+    report = {}
+    with tempfile.TemporaryDirectory() as state_dir:
+        nm = NetworkManager(args.topology, backend=args.backend, state_dir=state_dir, qos=mode == "on")
+        try:
+            with contextlib.redirect_stdout(log):
+                net = nm.bring_up()
+                sm = nm.service_manager
+                service_keys = [key for name in args.services for key in sm.deploy_services(net, name, 1)]
+                sm.deploy_colab_on_all_hosts(net)
+            # Each phase gets its own load generators, so their summaries are not mixed
+            wait = args.duration + SUMMARY_INTERVAL
+            print(f"[INFO] {mode}: idle phase ({args.duration}s)", file=sys.stderr)
+            with contextlib.redirect_stdout(log):
+                probes = start_loadgens(sm, net, service_keys, qps=args.qps, concurrency=args.concurrency, duration=args.duration)
+            time.sleep(wait)
+            report["idle"] = summaries(probes)
+            with contextlib.redirect_stdout(log):
+                stop_loadgens(sm, probes)
+
+            print(f"[INFO] {mode}: saturated phase ({args.duration}s)", file=sys.stderr)
+            with contextlib.redirect_stdout(log):
+                # Leave room for the probes, then pick the colab services that survived the preemption
+                sm.make_room(net, args.bulk + len(service_keys))
+                colab_keys = sorted({key for key, _ in sm.service_instances if key.startswith("colab")})[:args.bulk]
+            if len(colab_keys) < args.bulk:
+                print(f"[WARNING] Only {len(colab_keys)} colab services left for bulk traffic", file=sys.stderr)
+            with contextlib.redirect_stdout(log):
+                bulk = start_loadgens(sm, net, colab_keys, qps=0, concurrency=args.bulk_concurrency,
+                                      duration=args.duration + 2 * args.warmup, payload_size=args.payload_size)
+            time.sleep(args.warmup)
+            with contextlib.redirect_stdout(log):
+                probes = start_loadgens(sm, net, service_keys, qps=args.qps, concurrency=args.concurrency, duration=args.duration)
+            time.sleep(wait)
+            report["saturated"] = summaries(probes)
+            colab = [summary for summary in summaries(bulk).values() if summary]
+            # Every message crosses the network twice: request and echo
+            report["colab_bulk"] = {"loadgens": len(bulk), "messages_per_s": round(sum(s["qps"] for s in colab), 2),
+                                    "mbit_per_s": round(sum(s["qps"] for s in colab) * args.payload_size * 2 * 8 / 1e6, 2)}
+            with contextlib.redirect_stdout(log):
+                stop_loadgens(sm, probes)
+                stop_loadgens(sm, bulk)
+        finally:
+            with contextlib.redirect_stdout(log):
+                nm.stop_network()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["fake", "mininet"], default="mininet")
+    parser.add_argument("--topology", default="complex", help="simple, complex, ring, linear, fat-tree or leaf-spine")
+    parser.add_argument("--modes", nargs="+", choices=["off", "on"], default=["off", "on"])
+    parser.add_argument("--services", nargs="+", default=["web", "random"], help="services whose latency is measured")
+    parser.add_argument("--qps", type=float, default=50.0, help="request rate of each service's load generator")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per phase")
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of bulk traffic before the saturated phase")
+    parser.add_argument("--bulk", type=int, default=4, help="colab services running a bulk load generator")
+    parser.add_argument("--bulk-concurrency", type=int, default=4)
+    parser.add_argument("--payload-size", type=int, default=256 * 1024, help="bytes per colab message")
+    parser.add_argument("--output", help="write the JSON report to this file instead of stdout")
+    parser.add_argument("--verbose", action="store_true", help="show the managers' log output")
+    args = parser.parse_args()
+
+    log = sys.stdout if args.verbose else io.StringIO()
+    report = {"commit": git_commit(), "backend": args.backend, "topology": args.topology, "services": args.services,
+              "qps": args.qps, "duration_s": args.duration, "bulk": args.bulk, "payload_size": args.payload_size, "modes": {}}
+    for mode in args.modes:
+        report["modes"][mode] = run_mode(args, mode, log)
+
+    for mode, result in report["modes"].items():
+        for phase in ("idle", "saturated"):
+            for key, summary in result[phase].items():
+                if summary:
+                    print(f"[INFO] QoS {mode:3} {phase:9} {key:10} {summary['qps']:8} qps  p50 {summary['p50_ms']} ms  "
+                          f"p99 {summary['p99_ms']} ms  p99.9 {summary['p999_ms']} ms", file=sys.stderr)
+        print(f"[INFO] QoS {mode:3} colab bulk {result['colab_bulk']['mbit_per_s']} Mbit/s", file=sys.stderr)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
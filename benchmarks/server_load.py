@@ -0,0 +1,181 @@
+"""
+Load test of the TCP servers (random generators, date/time fetchers, colab_b).
+
+Starts a server script locally, then runs --clients concurrent clients for --duration
+seconds and reports requests/s and latency percentiles as JSON. In "oneshot" mode every
+request is a new connection read to the first reply, as the service clients do; in
+"persistent" mode each client keeps one connection and sends a request per reply; in
+"pipelined" mode each client keeps --depth requests in flight on its connection.
+--payload-size sets the size of the colab_b messages, to test large payloads.
+--baseline REV also runs the script as it was at git revision REV for a before/after
+comparison, in oneshot mode only and with the line protocol the servers spoke before wire.py.
+
+Usage: python3 benchmarks/server_load.py [--script random_gen1.py] [--baseline REV] [--clients 32] [--duration 5]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from common import SRC_DIR, percentile, ms, wait_for_port
+
+SCRIPTS_DIR = os.path.join(SRC_DIR, "scripts")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from wire import Connection
+
+# script: (port, whether the server greets)
+SERVERS = {
+    "random_gen1.py": (5000, True),
+    "random_gen2.py": (5001, True),
+    "date_fetcher.py": (5002, True),
+    "time_fetcher.py": (5003, True),
+    "colab_b.py": (5004, False),
+}
+
+
+def read_line(sock):
+    # Line protocol of the servers before wire.py; the oldest ones close without a newline
+    buffer = bytearray()
+    while b"\n" not in buffer:
+        data = sock.recv(4096)
+        if not data:
+            break
+        buffer += data
+    return bytes(buffer) or None
+
+
+def legacy_client(port, greets, request, depth, deadline, latencies, errors):
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=5) as s:
+                if not greets:
+                    s.sendall(request + b"\n")
+                if read_line(s) is None:
+                    raise ConnectionError("no reply")
+            latencies.append(time.perf_counter() - start)
+        except OSError:
+            errors.append(1)
+
+
+def oneshot_client(port, greets, request, depth, deadline, latencies, errors):
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            with Connection.connect("127.0.0.1", port, timeout=5) as conn:
+                conn.greeting() if greets else conn.request(request)
+            latencies.append(time.perf_counter() - start)
+        except OSError:
+            errors.append(1)
+
+
+def persistent_client(port, greets, request, depth, deadline, latencies, errors):
+    try:
+        with Connection.connect("127.0.0.1", port, timeout=5) as conn:
+            if greets:
+                # The greeting is the first response
+                start = time.perf_counter()
+                conn.greeting()
+                latencies.append(time.perf_counter() - start)
+            while time.time() < deadline:
+                start = time.perf_counter()
+                conn.request(request)
+                latencies.append(time.perf_counter() - start)
+    except OSError:
+        errors.append(1)
+
+
+def pipelined_client(port, greets, request, depth, deadline, latencies, errors):
+    try:
+        with Connection.connect("127.0.0.1", port, timeout=5) as conn:
+            if greets:
+                conn.greeting()
+            while time.time() < deadline:
+                start = time.perf_counter()
+                conn.pipeline([request] * depth)
+                # Every request of the batch waited for the whole batch
+                latencies.extend([time.perf_counter() - start] * depth)
+    except OSError:
+        errors.append(1)
+
+
+CLIENTS = {"legacy": legacy_client, "oneshot": oneshot_client, "persistent": persistent_client,
+           "pipelined": pipelined_client}
+
+
+def run(script_path, port, greets, request, mode, depth, clients, duration):
+    proc = subprocess.Popen([sys.executable, script_path], cwd=os.path.dirname(script_path),
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(port, timeout=10):
+            return {"error": f"{os.path.basename(script_path)} did not listen on port {port}"}
+        # Old servers pause after every connection, including the readiness check
+        time.sleep(1.1)
+        latencies, errors = [], []
+        deadline = time.time() + duration
+        threads = [threading.Thread(target=CLIENTS[mode], args=(port, greets, request, depth, deadline, latencies, errors))
+                   for _ in range(clients)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=duration + 30)
+        elapsed = time.time() - start
+        return {"requests": len(latencies), "errors": len(errors), "rps": round(len(latencies) / elapsed, 1),
+                "p50_ms": ms(percentile(latencies, 0.5)), "p99_ms": ms(percentile(latencies, 0.99))}
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def baseline_script(revision, script, directory):
+    # The script and the shared modules it may import, as they were at that revision
+    for name in (script, "server_runtime.py", "wire.py"):
+        shown = subprocess.run(["git", "show", f"{revision}:src/scripts/{name}"], cwd=SRC_DIR,
+                               capture_output=True, text=True)
+        if shown.returncode == 0:
+            with open(os.path.join(directory, name), "w") as f:
+                f.write(shown.stdout)
+        elif name == script:
+            raise SystemExit(f"[ERROR] {script} not found at {revision}")
+    return os.path.join(directory, script)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--script", choices=sorted(SERVERS), default="random_gen1.py")
+    parser.add_argument("--baseline", help="git revision to compare against")
+    parser.add_argument("--modes", nargs="+", choices=["oneshot", "persistent", "pipelined"],
+                        default=["oneshot", "persistent", "pipelined"])
+    parser.add_argument("--depth", type=int, default=16, help="requests in flight per client in pipelined mode")
+    parser.add_argument("--payload-size", type=int, default=25, help="bytes per colab_b message")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    port, greets = SERVERS[args.script]
+    request = b"" if greets else b"x" * args.payload_size
+    report = {"script": args.script, "clients": args.clients, "duration_s": args.duration, "results": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        versions = [("current", os.path.join(SCRIPTS_DIR, args.script))]
+        if args.baseline:
+            versions.insert(0, (f"baseline {args.baseline}", baseline_script(args.baseline, args.script, directory)))
+        for version, path in versions:
+            for mode in args.modes:
+                if version != "current":
+                    if mode != "oneshot":
+                        continue
+                    mode = "legacy"
+                result = run(path, port, greets, request, mode, args.depth, args.clients, args.duration)
+                report["results"][f"{version} {mode}"] = result
+                print(f"[INFO] {version} {mode}: {result.get('rps')} req/s", file=sys.stderr)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Load test of the web frontend (src/scripts/web_server.py) with and without its cache.
+
+Builds a database store of --keys keys, starts database.py on it and web_server.py in front
+of it (LISTEN_PORT --port), then runs --clients concurrent keep-alive clients for --duration
+seconds. Keys are drawn from a Zipf-like distribution (a few hot keys, a long tail), as web
+traffic tends to be. Each run reports requests/s, p50/p99 latency and the frontend's cache
+counters from GET /stats as JSON; "nocache" starts the frontend with CACHE_SIZE=0.
+
+Usage: python3 benchmarks/web_load.py [--keys 100000] [--clients 16] [--duration 5] [--ttl 30]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import http.client
+from common import SRC_DIR, percentile, ms, wait_for_port
+
+SCRIPTS_DIR = os.path.join(SRC_DIR, "scripts")
+DB_PORT = 81
+
+
+def client(port, key_count, skew, deadline, latencies, errors):
+    rng = random.Random()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    while time.time() < deadline:
+        key = min(key_count, int(rng.paretovariate(skew)))
+        start = time.perf_counter()
+        try:
+            connection.request("GET", f"/{key}")
+            response = connection.getresponse()
+            response.read()
+            if response.status != 200:
+                raise ConnectionError(f"HTTP {response.status}")
+            latencies.append(time.perf_counter() - start)
+        except (OSError, http.client.HTTPException):
+            errors.append(1)
+            connection.close()
+    connection.close()
+
+
+def get_json(port, path):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request("GET", path)
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+def run(port, cache_size, ttl, key_count, skew, clients, duration):
+    env = dict(os.environ, DB_IP="127.0.0.1", LISTEN_PORT=str(port), CACHE_SIZE=str(cache_size),
+               CACHE_TTL=str(ttl), SERVICE_KEY="web-load")
+    proc = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, "web_server.py")], cwd=SCRIPTS_DIR,
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_for_port(port):
+            return {"error": f"web_server.py did not listen on port {port}"}
+        latencies, errors = [], []
+        deadline = time.time() + duration
+        threads = [threading.Thread(target=client, args=(port, key_count, skew, deadline, latencies, errors))
+                   for _ in range(clients)]
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(timeout=duration + 30)
+        elapsed = time.time() - start
+        return {"requests": len(latencies), "errors": len(errors), "rps": round(len(latencies) / elapsed, 1),
+                "p50_ms": ms(percentile(latencies, 0.5)), "p99_ms": ms(percentile(latencies, 0.99)),
+                "cache": get_json(port, "/stats")}
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=100000)
+    parser.add_argument("--port", type=int, default=85)
+    parser.add_argument("--cache-size", type=int, default=10000)
+    parser.add_argument("--ttl", type=float, default=30.0)
+    parser.add_argument("--skew", type=float, default=1.1, help="Pareto shape of the key distribution (lower: longer tail)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    report = {"keys": args.keys, "clients": args.clients, "duration_s": args.duration, "results": {}}
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "items.jsonl")
+        with open(source, "w") as f:
+            for key in range(1, args.keys + 1):
+                f.write(json.dumps({"key": str(key), "value": f"Item {key} " + "x" * 100}) + "\n")
+        path = os.path.join(directory, "store")
+        subprocess.run([sys.executable, os.path.join(SCRIPTS_DIR, "database.py"), "build", path, source],
+                       cwd=SCRIPTS_DIR, check=True, stdout=subprocess.DEVNULL)
+        database = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, "database.py")], cwd=SCRIPTS_DIR,
+                                    env=dict(os.environ, DB_PATH=path), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_for_port(DB_PORT):
+                sys.exit(f"[ERROR] database.py did not listen on port {DB_PORT}")
+            for name, cache_size in (("nocache", 0), ("cache", args.cache_size)):
+                result = run(args.port, cache_size, args.ttl, args.keys, args.skew, args.clients, args.duration)
+                report["results"][name] = result
+                print(f"[INFO] {name}: {result.get('rps')} req/s, p99 {result.get('p99_ms')} ms", file=sys.stderr)
+        finally:
+            database.kill()
+            database.wait()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Deploy latency of service apps with and without the per-host zygote runtime.
+
+Runs locally without Mininet: a LocalHost stands in for a Mininet host and the
+scripts are started from src/scripts. For servers the latency is measured from the
+spawn call until the listen port accepts connections; for one-shot clients until
+the process exits.
+
+Usage: python3 benchmarks/zygote_spawn.py [--runs 20]
+"""
+import os
+import sys
+import time
+import socket
+import signal
+import argparse
+import statistics
+import subprocess
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+SCRIPTS_DIR = os.path.join(SRC_DIR, "scripts")
+sys.path.insert(0, SRC_DIR)
+
+from runtime import ZygotePool
+
+# (script, port to wait for, or None to wait for the process to exit)
+CASES = [
+    ("random_gen1.py", 5000),
+    ("date_fetcher.py", 5002),
+    ("colab_b.py", 5004),
+    ("database.py", 81),
+    ("web_server.py", None),
+]
+
+
+class LocalHost:
+    """Minimal stand-in for a Mininet host running in the root namespace."""
+    name = "local"
+
+    def IP(self):
+        return "127.0.0.1"
+
+    def popen(self, args, **kwargs):
+        return subprocess.Popen(args, **kwargs)
+
+
+def wait_ready(proc, port, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if port is None:
+            if proc.poll() is not None:
+                return True
+        else:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                    return True
+            except OSError:
+                pass
+        time.sleep(0.001)
+    return False
+
+
+def stop(proc):
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    try:
+        proc.wait(timeout=2)
+    except subprocess.TimeoutExpired:
+        pass
+    for stream in (proc.stdout, proc.stderr):
+        if stream:
+            stream.close()
+
+
+def measure(spawn, script, port, runs):
+    samples = []
+    for _ in range(runs):
+        env = dict(os.environ, SERVICE_KEY="bench-1")
+        start = time.perf_counter()
+        proc = spawn(["python3", os.path.join(SCRIPTS_DIR, script)], env)
+        ready = wait_ready(proc, port)
+        elapsed = time.perf_counter() - start
+        stop(proc)
+        if ready:
+            samples.append(elapsed * 1000)
+        # Let the port go back to TIME_WAIT-free state before the next run
+        time.sleep(0.05)
+    return samples
+
+
+def summary(samples):
+    if not samples:
+        return "no successful runs"
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    return f"median {statistics.median(samples):7.1f} ms  p99 {p99:7.1f} ms  (n={len(samples)})"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args()
+
+    host = LocalHost()
+    pool = ZygotePool(zygote_script=os.path.join(SCRIPTS_DIR, "zygote.py"), python=sys.executable)
+
+    def popen_spawn(cmd_args, env):
+        return host.popen(cmd_args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, preexec_fn=os.setsid, env=env)
+
+    def zygote_spawn(cmd_args, env):
+        return pool.spawn(host, cmd_args, env)
+
+    # Warm the zygote so its own startup is not counted as app deploy latency
+    pool._ensure_zygote(host)
+    try:
+        for script, port in CASES:
+            print(f"{script}")
+            print(f"  popen : {summary(measure(popen_spawn, script, port, args.runs))}")
+            print(f"  zygote: {summary(measure(zygote_spawn, script, port, args.runs))}")
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
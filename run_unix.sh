@@ -10,7 +10,7 @@ RYU_PID=$!
 
 # Wait for Ryu REST API to be up
 echo "Waiting for Ryu REST API to be up..."
-for i in {1..30}; do
+for i in {1..150}; do
     if curl -s http://localhost:8080/stats/switches >/dev/null; then
         echo "Ryu REST API is up."
         break
@@ -19,36 +19,18 @@ for i in {1..30}; do
         echo "Ryu controller failed to start. Check ryu.log."
         exit 1
     fi
-    sleep 1
-    if [ $i -eq 30 ]; then
+    sleep 0.2
+    if [ $i -eq 150 ]; then
         echo "Ryu REST API did not start in time. Check ryu.log."
         kill $RYU_PID
         exit 1
     fi
 done
 
-# Wait for Ryu to listen on OpenFlow port 6653
-echo "Waiting for Ryu to listen on TCP port 6653..."
-for i in {1..30}; do
-    if netstat -lnt | grep -q ':6653'; then
-        echo "Ryu is listening on port 6653."
-        break
-    fi
-    if ! kill -0 $RYU_PID 2>/dev/null; then
-        echo "Ryu controller failed to start. Check ryu.log."
-        exit 1
-    fi
-    sleep 1
-    if [ $i -eq 30 ]; then
-        echo "Ryu did not listen on port 6653 in time. Check ryu.log."
-        kill $RYU_PID
-        exit 1
-    fi
-done
-
+# The application itself waits for every switch to connect to the controller
 # Start your main application
 echo "Starting main application..."
-sudo -E python3 src/main.py
+sudo -E python3 src/main.py "$@"
 
 # When done, kill Ryu
 echo "Shutting down Ryu controller..."
@@ -0,0 +1,367 @@
+import os
+import json
+import socket
+import asyncio
+import fnmatch
+import threading
+import http.client
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from concurrent.futures import ThreadPoolExecutor
+from catalog import base_app
+from loadstats import read_summaries
+from runtime import RUNTIME_DIR, private_dir
+
+DEFAULT_SOCKET = os.path.join(RUNTIME_DIR, "control.sock")
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error"}
+
+
+class ControlServer:
+    """
+    Headless control plane: an HTTP/JSON API on a Unix socket and/or a local TCP port, served
+    by an asyncio loop in its own thread. The GUI, cadctl and scripts are all clients of the
+    same ServiceManager. Operations that change the deployment run one at a time in arrival
+    order, each on a worker thread where it parallelizes its own placement, spawns and flow installs.
+
+      GET  /services                               running app instances
+      GET  /flows?stats=1                          installed flows, with the switches' packet/byte counters
+      GET  /logs?service_key=...&app=...&lines=50  recent output of an app instance
+      POST /deploy {"service": "web", "count": 20}  deploy count instances as one batch
+      POST /stop   {"pattern": "datetime-*"}       stop the services whose key matches a glob
+      POST /scale  {"service_key", "app", "replicas" or "delta"}
+      POST /test   {"service_key"}                 wait for the client's result
+      POST /loadgen {"service_key", "qps", "concurrency", "duration", "payload_size"}  start a load generator
+      POST /loadgen/stop {"service_key", "app"}    stop a load generator
+      GET  /load?service_key=...&window=60         aggregated load generator summaries
+    """
+    def __init__(self, service_manager, net, socket_path=DEFAULT_SOCKET, port=None, workers=8):
+        if socket_path is None and port is None:
+            raise ValueError("The control API needs a socket path or a port")
+        self.service_manager = service_manager
+        self.net = net
+        self.socket_path = socket_path
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="control")
+        self.loop = None
+        self.servers = []
+        self.thread = None
+        self.error = None
+        self.routes = {
+            ("GET", "/services"): self.services,
+            ("GET", "/flows"): self.flows,
+            ("GET", "/logs"): self.logs,
+            ("POST", "/deploy"): self.deploy,
+            ("POST", "/stop"): self.stop_matching,
+            ("POST", "/scale"): self.scale,
+            ("POST", "/test"): self.test,
+            ("POST", "/loadgen"): self.loadgen,
+            ("POST", "/loadgen/stop"): self.stop_loadgen,
+            ("GET", "/load"): self.load,
+        }
+        # Reads and tests only look at the deployment, everything else is serialized
+        self.read_only = {"/services", "/flows", "/logs", "/test", "/load"}
+
+    @property
+    def address(self):
+        # Where clients connect: the socket path, else the TCP URL
+        return self.socket_path or f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self._run, args=(ready,), name="control-api", daemon=True)
+        self.thread.start()
+        ready.wait()
+        if self.error:
+            raise self.error
+        print(f"[INFO] Control API listening on {', '.join(self._addresses())}")
+
+    def _addresses(self):
+        return [address for address in (self.socket_path, self.port is not None and f"http://127.0.0.1:{self.port}") if address]
+
+    def _run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._listen())
+        except OSError as e:
+            self.error = e
+            ready.set()
+            return
+        ready.set()
+        self.loop.run_forever()
+        for server in self.servers:
+            server.close()
+        # Drop the idle keep-alive connections
+        connections = asyncio.all_tasks(self.loop)
+        for task in connections:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*connections, return_exceptions=True))
+        self.loop.close()
+
+    async def _listen(self):
+        self.mutations = asyncio.Lock()
+        if self.socket_path:
+            # Only this user may reach the socket or plant one in its place
+            private_dir(os.path.dirname(os.path.abspath(self.socket_path)))
+            # A socket left behind by a previous run refuses new binds
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            self.servers.append(await asyncio.start_unix_server(self._serve, path=self.socket_path))
+        if self.port is not None:
+            server = await asyncio.start_server(self._serve, "127.0.0.1", self.port)
+            self.port = server.sockets[0].getsockname()[1]
+            self.servers.append(server)
+
+    def stop(self):
+        if self.loop and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=5)
+        self.executor.shutdown(wait=False)
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def _serve(self, reader, writer):
+        # Minimal HTTP/1.1 with keep-alive: one request at a time per connection
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self._dispatch(method, target, body)
+                data = json.dumps(payload).encode()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                writer.write((f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+                              f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+                              f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n").encode() + data)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, asyncio.CancelledError):
+            # Dropped connection, malformed request, or the server shutting down
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, target, body):
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path))
+        if handler is None:
+            return 404, {"error": f"No such operation: {method} {url.path}"}
+        params = dict(parse_qsl(url.query))
+        try:
+            if body:
+                params.update(json.loads(body))
+        except (ValueError, TypeError):
+            return 400, {"error": "Request body must be a JSON object"}
+        try:
+            if url.path in self.read_only:
+                result = await self.loop.run_in_executor(self.executor, handler, params)
+            else:
+                async with self.mutations:
+                    result = await self.loop.run_in_executor(self.executor, handler, params)
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except Exception as e:
+            print(f"[ERROR] Control API {method} {url.path} failed: {e}")
+            return 500, {"error": str(e)}
+        return 200, result
+
+    @staticmethod
+    def _param(params, name, kind=str, default=None):
+        value = params.get(name, default)
+        if value is None:
+            raise ValueError(f"Missing parameter '{name}'")
+        try:
+            return kind(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid value for '{name}': {value!r}")
+
+    def services(self, params):
+        return [{"service_key": service_key, "app": app_name, "host": instance["host"].name, "ip": instance["ip"],
+                 "status": instance["status"], "pid": getattr(instance.get("process"), "pid", None),
+                 "usage": instance.get("usage")}
+                for (service_key, app_name), instance in list(self.service_manager.service_instances.items())]
+
+    def flows(self, params):
+        flow_manager = self.service_manager.flow_manager
+        stats = params.get("stats") in ("1", "true", True)
+        table = flow_manager.flow_rows(flow_manager.flow_counters() if stats else None)
+        if params.get("compact") in ("1", "true", True):
+            # One row per flow in the order of "fields", without repeating the field names
+            return table
+        return [dict(zip(table["fields"], row)) for row in table["rows"]]
+
+    def logs(self, params):
+        lines = self.service_manager.get_instance_logs(self._param(params, "service_key"), self._param(params, "app"),
+                                                       lines=self._param(params, "lines", int, 50))
+        return {"lines": list(lines)}
+
+    def deploy(self, params):
+        service_name = self._param(params, "service")
+        count = self._param(params, "count", int, 1)
+        if count < 1:
+            raise ValueError("count must be at least 1")
+        deployed = self.service_manager.deploy_services(self.net, service_name, count)
+        return {"requested": count, "deployed": deployed}
+
+    def stop_matching(self, params):
+        pattern = self._param(params, "pattern")
+        service_keys = sorted({service_key for (service_key, _) in list(self.service_manager.service_instances)
+                               if fnmatch.fnmatchcase(service_key, pattern)})
+        return {"stopped": self.service_manager.stop_services(self.net, service_keys)}
+
+    def scale(self, params):
+        service_key = self._param(params, "service_key")
+        app_name = base_app(self._param(params, "app"))
+        current = sum(1 for (s_k, name) in list(self.service_manager.service_instances)
+                      if s_k == service_key and base_app(name) == app_name)
+        if not current:
+            raise ValueError(f"{service_key} has no app {app_name}")
+        if "replicas" in params:
+            replicas = self._param(params, "replicas", int)
+        else:
+            replicas = current + self._param(params, "delta", int)
+        if replicas > current:
+            # Added replicas preempt colab like deploys do
+            self.service_manager.make_room(self.net, replicas - current)
+        ok = bool(self.service_manager.scale_app(self.net, service_key, app_name, replicas))
+        if ok and replicas < current:
+            self.service_manager.try_redeploy_colab(self.net)
+        return {"ok": ok, "replicas": replicas if ok else current}
+
+    def test(self, params):
+        return self.service_manager.test_service(self._param(params, "service_key"))
+
+    def loadgen(self, params):
+        service_key = self._param(params, "service_key")
+        options = {name: self._param(params, name, kind) for name, kind in
+                   (("qps", float), ("concurrency", int), ("duration", float), ("payload_size", int))
+                   if params.get(name) is not None}
+        # The load generator takes a host slot like an added replica
+        self.service_manager.make_room(self.net, 1)
+        try:
+            instance_name = self.service_manager.start_loadgen(self.net, service_key, **options)
+        except Exception:
+            self.service_manager.try_redeploy_colab(self.net)
+            raise
+        if instance_name is None:
+            # Give the slot freed for it back to colab
+            self.service_manager.try_redeploy_colab(self.net)
+            raise RuntimeError(f"Could not start a load generator for {service_key}")
+        return {"service_key": service_key, "app": instance_name}
+
+    def stop_loadgen(self, params):
+        self.service_manager.stop_loadgen(self._param(params, "service_key"), self._param(params, "app"))
+        self.service_manager.try_redeploy_colab(self.net)
+        return {"stopped": True}
+
+    def load(self, params):
+        window = params.get("window")
+        return read_summaries(service_key=params.get("service_key"),
+                              window=self._param(params, "window", float) if window is not None else None)
+
+
+class ControlError(Exception):
+    pass
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class ControlClient:
+    """
+    Blocking client of a ControlServer at a Unix socket path or an http://host:port URL.
+    Keeps one keep-alive connection per thread and raises ControlError on failed operations.
+    """
+    def __init__(self, address=DEFAULT_SOCKET, timeout=120):
+        self.address = address
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def _connect(self):
+        if self.address.startswith("http://"):
+            url = urlsplit(self.address)
+            return http.client.HTTPConnection(url.hostname, url.port, timeout=self.timeout)
+        return _UnixHTTPConnection(self.address, self.timeout)
+
+    def request(self, method, path, body=None, **query):
+        if query:
+            path = f"{path}?{urlencode(query)}"
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data else {}
+        # Only reads are sent again: a deploy or scale may have been applied before the connection dropped
+        attempts = 2 if method == "GET" else 1
+        for attempt in range(attempts):
+            connection = getattr(self.local, "connection", None) or self._connect()
+            self.local.connection = connection
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+                break
+            except (http.client.HTTPException, ConnectionError):
+                # The server closed an idle keep-alive connection: reconnect once
+                connection.close()
+                self.local.connection = None
+                if attempt == attempts - 1:
+                    raise
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise ControlError(f"Invalid response to {method} {path} (HTTP {response.status})")
+        if response.status != 200:
+            raise ControlError(payload.get("error", f"HTTP {response.status}") if isinstance(payload, dict) else payload)
+        return payload
+
+    def services(self):
+        return self.request("GET", "/services")
+
+    def flows(self, stats=False, compact=False):
+        # compact: {"fields": [...], "rows": [[...], ...]} instead of one dict per flow
+        params = {name: 1 for name, enabled in (("stats", stats), ("compact", compact)) if enabled}
+        return self.request("GET", "/flows", **params)
+
+    def logs(self, service_key, app_name, lines=50):
+        return self.request("GET", "/logs", service_key=service_key, app=app_name, lines=lines)["lines"]
+
+    def deploy(self, service_name, count=1):
+        return self.request("POST", "/deploy", {"service": service_name, "count": count})["deployed"]
+
+    def stop(self, pattern):
+        return self.request("POST", "/stop", {"pattern": pattern})["stopped"]
+
+    def scale(self, service_key, app_name, replicas=None, delta=None):
+        body = {"service_key": service_key, "app": app_name}
+        body.update({"replicas": replicas} if replicas is not None else {"delta": delta or 0})
+        return self.request("POST", "/scale", body)
+
+    def test(self, service_key):
+        return self.request("POST", "/test", {"service_key": service_key})
+
+    def loadgen(self, service_key, qps=None, concurrency=None, duration=None, payload_size=None):
+        body = {"service_key": service_key, "qps": qps, "concurrency": concurrency, "duration": duration,
+                "payload_size": payload_size}
+        return self.request("POST", "/loadgen", {k: v for k, v in body.items() if v is not None})["app"]
+
+    def stop_loadgen(self, service_key, app_name):
+        return self.request("POST", "/loadgen/stop", {"service_key": service_key, "app": app_name})
+
+    def load(self, service_key=None, window=None):
+        query = {k: v for k, v in (("service_key", service_key), ("window", window)) if v is not None}
+        return self.request("GET", "/load", **query)
@@ -0,0 +1,234 @@
+import os
+import json
+import math
+import time
+import threading
+import requests
+from flow import FlowEntry
+from metrics import metrics
+
+METRICS_DIR = "/shared/metrics"
+
+
+class FlowCounterSource:
+    """
+    Derives per-app request rates from the packet counters of the flows that steer
+    clients to each replica, read from the switches through the Ryu REST API.
+    Every hop of a path counts the same packets, so the maximum over switches is used.
+    """
+    def __init__(self, service_manager, ryu_api_url="http://localhost:8080", packets_per_request=5):
+        self.service_manager = service_manager
+        self.ryu_api_url = ryu_api_url
+        self.packets_per_request = packets_per_request
+        self.previous = {}  # (service_key, app_name): (timestamp, packet count)
+
+    def collect(self):
+        sm = self.service_manager
+        targets = {}  # (replica ip, listen port): (service_key, app_name)
+        for (service_key, _), instance in list(sm.service_instances.items()):
+            if instance["listen_port"]:
+                targets[(instance["ip"], instance["listen_port"])] = (service_key, instance["base_app"])
+        dpids = {flow[FlowEntry.DPID] for flow in list(sm.flow_manager.get_active_flows().values())
+                 if (flow[FlowEntry.DST_IP], flow[FlowEntry.DST_PORT]) in targets}
+        per_flow = {}  # (src ip, dst ip, dst port): max packet count seen on any hop
+        for dpid in dpids:
+            dpid_int = int(dpid, 16) if isinstance(dpid, str) else dpid
+            metrics.inc("rest_requests_total", endpoint="flow")
+            try:
+                response = requests.get(f"{self.ryu_api_url}/stats/flow/{dpid_int}", timeout=2)
+                response.raise_for_status()
+                entries = response.json().get(str(dpid_int), [])
+            except (requests.exceptions.RequestException, ValueError) as e:
+                metrics.inc("rest_failures_total", endpoint="flow")
+                print(f"[ERROR] Failed to read flow stats for DPID {dpid_int}: {e}")
+                continue
+            for entry in entries:
+                match = entry.get("match", {})
+                flow_key = (match.get("ipv4_src"), match.get("ipv4_dst"), match.get("tcp_dst"))
+                if (flow_key[1], flow_key[2]) in targets:
+                    per_flow[flow_key] = max(per_flow.get(flow_key, 0), entry.get("packet_count", 0))
+        totals = {}
+        for (_, dst_ip, dst_port), packets in per_flow.items():
+            app_key = targets[(dst_ip, dst_port)]
+            totals[app_key] = totals.get(app_key, 0) + packets
+        now = time.time()
+        samples = {}
+        for app_key, packets in totals.items():
+            if app_key in self.previous:
+                last_time, last_packets = self.previous[app_key]
+                rate = max(0, packets - last_packets) / self.packets_per_request / max(now - last_time, 1e-6)
+                samples[app_key] = {"rps": rate, "latency_ms": None}
+            self.previous[app_key] = (now, packets)
+        return samples
+
+
+class FileMetricsSource:
+    """
+    Reads the counters reported by the service scripts in /shared/metrics/<service_key>.<instance>.json
+    ({"requests": cumulative count, "latency_ms_sum": cumulative latency}) and turns them into rates.
+    """
+    def __init__(self, service_manager, metrics_dir=METRICS_DIR):
+        self.service_manager = service_manager
+        self.metrics_dir = metrics_dir
+        self.previous = {}  # (service_key, instance_name): (timestamp, requests, latency sum)
+
+    def collect(self):
+        now = time.time()
+        metrics = {}
+        instances = list(self.service_manager.service_instances.items())
+        # Forget the instances stopped since the last collection
+        self.previous = {key: self.previous[key] for key, _ in instances if key in self.previous}
+        for (service_key, name), instance in instances:
+            path = os.path.join(self.metrics_dir, f"{service_key}.{name}.json")
+            try:
+                with open(path) as f:
+                    report = json.load(f)
+            except (OSError, ValueError):
+                continue
+            current = (now, report.get("requests", 0), report.get("latency_ms_sum", 0.0))
+            last = self.previous.get((service_key, name))
+            self.previous[(service_key, name)] = current
+            if not last:
+                continue
+            app_key = (service_key, instance["base_app"])
+            requests_delta = max(0, current[1] - last[1])
+            entry = metrics.setdefault(app_key, {"rps": 0.0, "requests": 0, "latency_sum": 0.0})
+            entry["rps"] += requests_delta / max(current[0] - last[0], 1e-6)
+            entry["requests"] += requests_delta
+            entry["latency_sum"] += max(0.0, current[2] - last[2])
+        for entry in metrics.values():
+            requests_count = entry.pop("requests")
+            latency_sum = entry.pop("latency_sum")
+            entry["latency_ms"] = latency_sum / requests_count if requests_count else None
+        return metrics
+
+
+class CombinedSource:
+    """
+    Merges several sources: an app's request rate comes from the first source reporting the app,
+    its latency from the first one measuring it. The app reports count the requests of every client,
+    including those that never cross a switch, and carry latency; flow counters cover the apps that
+    do not report.
+    """
+    def __init__(self, *sources):
+        self.sources = sources
+
+    def collect(self):
+        metrics = {}
+        for source in self.sources:
+            for app_key, sample in source.collect().items():
+                entry = metrics.setdefault(app_key, dict(sample))
+                if entry.get("latency_ms") is None:
+                    entry["latency_ms"] = sample.get("latency_ms")
+        return metrics
+
+
+class AutoscalePolicy:
+    """
+    Replica count decisions with hysteresis: a change needs the same signal over several
+    consecutive evaluations and respects separate cooldowns for scaling out and in.
+    Scaling in only happens when the load would stay below a low watermark with one replica less.
+    """
+    def __init__(self, up_windows=2, down_windows=5, cooldown_up=15.0, cooldown_down=60.0, low_ratio=0.6):
+        self.up_windows = up_windows
+        self.down_windows = down_windows
+        self.cooldown_up = cooldown_up
+        self.cooldown_down = cooldown_down
+        self.low_ratio = low_ratio
+
+    def decide(self, state, replicas, rps, latency_ms, config, now):
+        """
+        state: per-app dict kept between calls. Returns the desired replica count.
+        """
+        target = config["target_rps"]
+        max_latency = config.get("latency_ms")
+        latency_high = bool(max_latency and latency_ms is not None and latency_ms > max_latency)
+        high = rps / replicas > target or latency_high
+        low = replicas > 1 and not latency_high and rps / (replicas - 1) < target * self.low_ratio
+
+        state["above"] = state.get("above", 0) + 1 if high else 0
+        state["below"] = state.get("below", 0) + 1 if low else 0
+        since_change = now - state.get("last_change", float("-inf"))
+
+        if state["above"] >= self.up_windows and since_change >= self.cooldown_up and replicas < config["max"]:
+            desired = min(config["max"], max(replicas + 1, math.ceil(rps / target)))
+        elif state["below"] >= self.down_windows and since_change >= self.cooldown_down and replicas > config["min"]:
+            desired = replicas - 1
+        else:
+            return replicas
+        state["above"] = state["below"] = 0
+        state["last_change"] = now
+        return desired
+
+
+class Autoscaler:
+    """
+    Periodically compares each autoscaled app's load to the targets declared in its "autoscale"
+    block of services.json and adds or removes replicas through ServiceManager.scale_app.
+    Load is read from the apps' /shared/metrics reports and from the flow counters by default.
+    Scaling out may preempt colab instances, scaling in gives the slots back to colab.
+    """
+    def __init__(self, service_manager, net, source=None, policy=None, interval=5.0):
+        self.service_manager = service_manager
+        self.net = net
+        self.source = source or CombinedSource(FileMetricsSource(service_manager),
+                                               FlowCounterSource(service_manager, service_manager.flow_manager.ryu_api_url))
+        self.policy = policy or AutoscalePolicy()
+        self.interval = interval
+        self.state = {}  # (service_key, app_name): policy state
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="autoscaler", daemon=True)
+        self.thread.start()
+        print("[INFO] Autoscaler started")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.interval + 1)
+
+    def _loop(self):
+        while self.running:
+            try:
+                self.evaluate(time.time())
+            except Exception as e:
+                print(f"[ERROR] Autoscaler evaluation failed: {e}")
+            time.sleep(self.interval)
+
+    def replica_counts(self):
+        counts = {}
+        for (service_key, _), instance in list(self.service_manager.service_instances.items()):
+            app_key = (service_key, instance["base_app"])
+            counts[app_key] = counts.get(app_key, 0) + 1
+        return counts
+
+    def evaluate(self, now):
+        sm = self.service_manager
+        metrics = self.source.collect()
+        counts = self.replica_counts()
+        for app_key in list(self.state):
+            if app_key not in counts:
+                del self.state[app_key]
+        for (service_key, app_name), replicas in counts.items():
+            config = sm.catalog.app(sm._service_name(service_key), app_name)["autoscale"]
+            sample = metrics.get((service_key, app_name))
+            if not config or sample is None:
+                continue
+            state = self.state.setdefault((service_key, app_name), {})
+            desired = self.policy.decide(state, replicas, sample["rps"], sample.get("latency_ms"), config, now)
+            if desired > replicas:
+                # Colab capacity is preemptible, other services are not
+                free = sm.make_room(self.net, desired - replicas) if not service_key.startswith("colab") else sm.available_slots(self.net)
+                desired = min(desired, replicas + free)
+            if desired == replicas:
+                continue
+            print(f"[INFO] Autoscaling {app_name} of {service_key}: {replicas} -> {desired} replicas "
+                  f"({sample['rps']:.1f} req/s)")
+            sm.scale_app(self.net, service_key, app_name, desired)
+            if desired < replicas:
+                sm.try_redeploy_colab(self.net)
@@ -0,0 +1,94 @@
+import sys
+import json
+import argparse
+from api import ControlClient, ControlError, DEFAULT_SOCKET
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Command-line client of the control API of a running network.")
+    parser.add_argument("--address", default=DEFAULT_SOCKET,
+                        help=f"Unix socket path or http://127.0.0.1:PORT of the control API (default {DEFAULT_SOCKET})")
+    parser.add_argument("--json", action="store_true", help="print the raw JSON answer")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("services", help="list the running app instances")
+    flows = commands.add_parser("flows", help="list the installed flows")
+    flows.add_argument("--stats", action="store_true", help="add the packet/byte counters read from the switches")
+    deploy = commands.add_parser("deploy", help="deploy instances of a service as one batch")
+    deploy.add_argument("service")
+    deploy.add_argument("-n", "--count", type=int, default=1)
+    stop = commands.add_parser("stop", help="stop the services whose key matches a glob, e.g. 'datetime-*'")
+    stop.add_argument("patterns", nargs="+")
+    scale = commands.add_parser("scale", help="set or change the replica count of an app")
+    scale.add_argument("service_key")
+    scale.add_argument("app")
+    change = scale.add_mutually_exclusive_group(required=True)
+    change.add_argument("--replicas", type=int)
+    change.add_argument("--delta", type=int)
+    test = commands.add_parser("test", help="wait for and print the result of a service's client")
+    test.add_argument("service_key")
+    loadgen = commands.add_parser("loadgen", help="start a load generator against a service (or --stop one)")
+    loadgen.add_argument("service_key")
+    loadgen.add_argument("--qps", type=float, help="open-loop request rate, 0 for closed loop")
+    loadgen.add_argument("--concurrency", type=int)
+    loadgen.add_argument("--duration", type=float, help="seconds, 0 to run until stopped")
+    loadgen.add_argument("--payload-size", type=int, help="bytes per request (TCP services), for bulk traffic")
+    loadgen.add_argument("--stop", metavar="APP", help="stop this load generator instead, e.g. loadgen#2")
+    load = commands.add_parser("load", help="print the aggregated load generator summaries")
+    load.add_argument("service_key", nargs="?")
+    load.add_argument("--window", type=float, help="only the last WINDOW seconds")
+    logs = commands.add_parser("logs", help="print the recent output of an app instance")
+    logs.add_argument("service_key")
+    logs.add_argument("app")
+    logs.add_argument("--lines", type=int, default=50)
+    return parser.parse_args()
+
+
+def run(client, args):
+    if args.command == "services":
+        result = client.services()
+        lines = [f"{i['service_key']:16} {i['app']:20} {i['host']:8} {i['ip']:16} {i['status']:10}"
+                 + (f" cpu {i['usage']['cpu']} mem {i['usage']['memory_mb']} MiB" if i.get("usage") else "") for i in result]
+    elif args.command == "flows":
+        result = client.flows(stats=args.stats)
+        lines = [f"{f['service_key']:16} {f['src_ip']:>15} -> {f['dst_ip']:15} dpid {f['dpid']} "
+                 f"in {f['in_port']} out {f['out_port']} proto {f['protocol']} dst_port {f['dst_port']}"
+                 + (f" packets {f['packet_count']} bytes {f['byte_count']}" if args.stats else "") for f in result]
+    elif args.command == "deploy":
+        result = client.deploy(args.service, args.count)
+        lines = [f"[SUCCESS] Deployed {len(result)} of {args.count}: {', '.join(result)}"]
+    elif args.command == "stop":
+        result = [key for pattern in args.patterns for key in client.stop(pattern)]
+        lines = [f"[SUCCESS] Stopped {len(result)}: {', '.join(result)}"]
+    elif args.command == "scale":
+        result = client.scale(args.service_key, args.app, replicas=args.replicas, delta=args.delta)
+        status = "SUCCESS" if result["ok"] else "ERROR"
+        lines = [f"[{status}] {args.service_key}/{args.app}: {result['replicas']} replicas"]
+    elif args.command == "test":
+        result = client.test(args.service_key)
+        lines = [f"Service: {key}\nResult:\n{value}" for key, value in result.items()]
+    elif args.command == "loadgen":
+        if args.stop:
+            result = client.stop_loadgen(args.service_key, args.stop)
+            lines = [f"[SUCCESS] Stopped {args.stop} of {args.service_key}"]
+        else:
+            result = client.loadgen(args.service_key, qps=args.qps, concurrency=args.concurrency, duration=args.duration,
+                                    payload_size=args.payload_size)
+            lines = [f"[SUCCESS] Started {result} of {args.service_key}"]
+    elif args.command == "load":
+        result = client.load(args.service_key, args.window)
+        rows = list(result["loadgens"].items()) + [("total", result["total"])]
+        lines = [f"{name:24} {s['qps']:>10} qps {s['ok']:>9} ok {s['errors']:>6} errors  "
+                 f"p50 {s['p50_ms']} ms  p99 {s['p99_ms']} ms  p99.9 {s['p999_ms']} ms" for name, s in rows]
+    else:
+        result = client.logs(args.service_key, args.app, args.lines)
+        lines = result
+    print(json.dumps(result, indent=2) if args.json else "\n".join(lines))
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        run(ControlClient(args.address), args)
+    except (ControlError, OSError) as e:
+        print(f"[ERROR] {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,170 @@
+import os
+import json
+
+SCRIPTS_DIR = "/shared/scripts"
+DEFAULT_SPEC_PATH = os.path.join(os.path.dirname(__file__), "services.json")
+
+
+def replica_name(app_name, index):
+    """Instance name of a replica: the first keeps the app name, the others get a #index suffix."""
+    return app_name if index == 1 else f"{app_name}#{index}"
+
+
+def base_app(instance_name):
+    return instance_name.split("#", 1)[0]
+
+
+def replica_index(instance_name):
+    return int(instance_name.split("#", 1)[1]) if "#" in instance_name else 1
+
+
+class ServiceCatalog:
+    """
+    Declarative service definitions loaded from a JSON spec file.
+    Each service lists its apps with their script, listen port, readiness probe,
+    extra environment, resource limits and dependencies. The dependency graph drives startup order,
+    the environment variables wired into each app and the TCP flows installed between apps.
+    A service can name one of the spec's QoS classes (rates in Mbit/s, see qos.py).
+    """
+    def __init__(self, spec):
+        self.services = {}  # service_name: {"client": ..., "qos": class name or None, "apps": [app_spec, ...]}
+        self.qos_classes = {}  # class name: {"queue": ..., "min_rate": ..., "max_rate": ..., "priority": ...}
+        for queue, (class_name, class_spec) in enumerate(spec.get("qos_classes", {}).items(), start=1):
+            # Queue 0 is left to unclassified traffic
+            self.qos_classes[class_name] = {"queue": queue, "min_rate": class_spec.get("min_rate", 0),
+                                            "max_rate": class_spec.get("max_rate"), "priority": class_spec.get("priority", 0)}
+        for service_name, service_spec in spec.get("services", {}).items():
+            qos = service_spec.get("qos")
+            if qos is not None and qos not in self.qos_classes:
+                raise ValueError(f"{service_name}: unknown QoS class {qos}")
+            apps = []
+            for app_spec in service_spec.get("apps", []):
+                app = dict(app_spec)
+                app.setdefault("depends_on", {})
+                app.setdefault("readiness", None)
+                app.setdefault("listen_port", 0)
+                app.setdefault("replicas", 1)
+                app.setdefault("autoscale", None)
+                app.setdefault("env", {})
+                # CPU (cores) and memory (MiB) limits of each instance's cgroup, see cgroups.py
+                app.setdefault("resources", {})
+                # Servers are kept running, one-shot clients are only restarted if they fail
+                app.setdefault("restart", "always" if app["readiness"] else "on-failure")
+                apps.append(app)
+            self.services[service_name] = {"client": service_spec.get("client"), "qos": qos, "apps": apps}
+        self._levels = {name: self._compute_levels(name) for name in self.services}
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or DEFAULT_SPEC_PATH
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def names(self):
+        return list(self.services)
+
+    def apps(self, service_name):
+        return self.services[service_name]["apps"]
+
+    def app(self, service_name, app_name):
+        for app in self.apps(service_name):
+            if app["name"] == app_name:
+                return app
+        raise KeyError(f"Unknown app {app_name} in service {service_name}")
+
+    def instances(self, service_name):
+        """
+        Instance names of a service with every app expanded to its replica count.
+        """
+        return [replica_name(app["name"], i) for app in self.apps(service_name) for i in range(1, app["replicas"] + 1)]
+
+    def slots(self, service_name):
+        return sum(app["replicas"] for app in self.apps(service_name))
+
+    def client(self, service_name):
+        return self.services[service_name]["client"]
+
+    def qos_class(self, service_name):
+        """
+        (class name, class spec) of the service's QoS class, or None for unclassified services.
+        """
+        service = self.services.get(service_name)
+        if not service or service["qos"] is None:
+            return None
+        return service["qos"], self.qos_classes[service["qos"]]
+
+    def command(self, service_name, app_name):
+        return f"python3 {SCRIPTS_DIR}/{self.app(service_name, app_name)['script']}"
+
+    def levels(self, service_name):
+        """
+        Returns the apps of a service grouped by DAG level: level 0 has no
+        dependencies, level n only depends on apps of lower levels.
+        """
+        return self._levels[service_name]
+
+    def restart_policy(self, service_name, app_name):
+        """
+        "always", "on-failure" or "never", used by the supervisor when an app exits.
+        """
+        return self.app(service_name, app_name)["restart"]
+
+    def dependents(self, service_name, app_name):
+        return [app["name"] for app in self.apps(service_name) if app_name in app["depends_on"]]
+
+    def resolve_env(self, service_name, app_name, dep_ips):
+        """
+        Builds the environment of an app. dep_ips maps dependency app names to the IPs of their replicas,
+        comma separated. A dependency variable named X_IP also gets X_PORT, the dependency's listen_port.
+        """
+        app = self.app(service_name, app_name)
+        env = {"LISTEN_PORT": str(app["listen_port"]), **app["env"]}
+        for dep_name, env_var in app["depends_on"].items():
+            env[env_var] = dep_ips.get(dep_name)
+            if env_var.endswith("_IP"):
+                env.setdefault(env_var[:-3] + "_PORT", str(self.app(service_name, dep_name)["listen_port"]))
+        return env
+
+    def probe_command(self, service_name, app_name, ip="127.0.0.1", timeout=10):
+        """
+        Shell command that blocks until the app passes its readiness probe, or None if it has none.
+        """
+        app = self.app(service_name, app_name)
+        readiness = app["readiness"]
+        if not readiness:
+            return None
+        port = readiness.get("port", app["listen_port"])
+        if readiness["type"] == "http":
+            return f"python3 {SCRIPTS_DIR}/probe.py http {ip} {port} {readiness.get('path', '/')} {timeout}"
+        if readiness["type"] == "tcp":
+            return f"python3 {SCRIPTS_DIR}/probe.py tcp {ip} {port} {timeout}"
+        raise ValueError(f"Unknown readiness probe type: {readiness['type']}")
+
+    def definitions(self):
+        """
+        Legacy view: {service_name: [(app_name, command, env_vars), ...]} with unresolved dependencies set to None.
+        """
+        return {
+            service_name: [
+                (app["name"], self.command(service_name, app["name"]), self.resolve_env(service_name, app["name"], {}))
+                for app in self.apps(service_name)
+            ]
+            for service_name in self.services
+        }
+
+    def _compute_levels(self, service_name):
+        apps = {app["name"]: app for app in self.apps(service_name)}
+        for app in apps.values():
+            for dep_name in app["depends_on"]:
+                if dep_name not in apps:
+                    raise ValueError(f"{service_name}: {app['name']} depends on unknown app {dep_name}")
+        levels = []
+        placed = set()
+        while len(placed) < len(apps):
+            level = [name for name, app in apps.items()
+                     if name not in placed and all(dep in placed for dep in app["depends_on"])]
+            if not level:
+                raise ValueError(f"{service_name}: dependency cycle between {sorted(set(apps) - placed)}")
+            levels.append(level)
+            placed.update(level)
+        return levels
@@ -0,0 +1,193 @@
+import os
+import time
+import threading
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+TREE = "cad"  # cgroups of the apps: <root>/cad/<host>/<service_key>.<instance>
+CPU_PERIOD_US = 100000
+REMOVE_RETRIES = 20
+
+
+class AppCgroup:
+    """
+    The cgroup of one app instance: the directories per controller (one directory on cgroup v2)
+    and the cgroup.procs files the app's process is written to before it starts.
+    """
+    def __init__(self, version, dirs):
+        self.version = version
+        self.dirs = dirs  # controller ("cpu", "cpuacct", "memory" or "unified"): directory
+        self.procs_files = sorted({os.path.join(path, "cgroup.procs") for path in dirs.values()})
+
+    def join(self, pid=None):
+        for path in self.procs_files:
+            with open(path, "w") as f:
+                f.write(str(pid or os.getpid()))
+
+    def cpu_usage_us(self):
+        if self.version == 2:
+            with open(os.path.join(self.dirs["unified"], "cpu.stat")) as f:
+                for line in f:
+                    if line.startswith("usage_usec "):
+                        return int(line.split()[1])
+            return 0
+        with open(os.path.join(self.dirs["cpuacct"], "cpuacct.usage")) as f:
+            return int(f.read()) // 1000
+
+    def memory_bytes(self):
+        path = (os.path.join(self.dirs["unified"], "memory.current") if self.version == 2
+                else os.path.join(self.dirs["memory"], "memory.usage_in_bytes"))
+        with open(path) as f:
+            return int(f.read())
+
+
+class CgroupManager:
+    """
+    Gives every app instance its own cgroup with the CPU and memory limits of its app spec
+    ("resources": {"cpu": cores, "memory_mb": MiB}) and samples what the apps really use.
+
+    Works on cgroup v2 and on v1. On v1 the cpu/cpuacct cgroups of apps on a CPU-limited host
+    (Mininet's CPULimitedHost, which has a cgroup named after the host) are nested in the host's,
+    so the host's share and quota bound its apps together. Everywhere else apps get <root>/cad/<host>/.
+    Creating cgroups needs root: if it fails, apps run without limits and no usage is reported.
+    """
+    def __init__(self, service_manager, root=CGROUP_ROOT, interval=2.0):
+        self.service_manager = service_manager
+        self.root = root
+        self.version = 2 if os.path.exists(os.path.join(root, "cgroup.controllers")) else 1
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.previous = {}  # cgroup procs file: (timestamp, cpu usage in us)
+        self.disabled = False
+        self.running = False
+        self.thread = None
+
+    def create(self, host, service_key, app_name, resources):
+        """
+        Creates the app's cgroup with its limits. Returns an AppCgroup, or None if cgroups are unavailable.
+        """
+        if self.disabled:
+            return None
+        name = f"{service_key}.{app_name}"
+        try:
+            with self.lock:
+                cgroup = self._make_dirs(host, name)
+            self._set_limits(cgroup, resources)
+            return cgroup
+        except OSError as e:
+            self.disabled = True
+            print(f"[WARNING] Cannot create app cgroups under {self.root}, apps run without CPU/memory limits: {e}")
+            return None
+
+    def _make_dirs(self, host, name):
+        if self.version == 2:
+            parent = os.path.join(self.root, TREE, host.name)
+            os.makedirs(parent, exist_ok=True)
+            # Children only get the controllers their parents delegate
+            for path in (self.root, os.path.dirname(parent), parent):
+                with open(os.path.join(path, "cgroup.subtree_control"), "w") as f:
+                    f.write("+cpu +memory")
+            path = os.path.join(parent, name)
+            os.makedirs(path, exist_ok=True)
+            return AppCgroup(2, {"unified": path})
+        dirs = {}
+        for controller in ("cpu", "cpuacct", "memory"):
+            host_cgroup = os.path.join(self.root, controller, host.name)
+            # Mininet's CPULimitedHost has cpu and cpuacct cgroups named after the host
+            if controller != "memory" and getattr(host, "cgroup", None) and os.path.isdir(host_cgroup):
+                parent = host_cgroup
+            else:
+                parent = os.path.join(self.root, controller, TREE, host.name)
+            dirs[controller] = os.path.join(parent, name)
+            os.makedirs(dirs[controller], exist_ok=True)
+        return AppCgroup(1, dirs)
+
+    def _set_limits(self, cgroup, resources):
+        cpu = resources.get("cpu")
+        memory_mb = resources.get("memory_mb")
+        if cgroup.version == 2:
+            path = cgroup.dirs["unified"]
+            _write(os.path.join(path, "cpu.max"), f"{int(cpu * CPU_PERIOD_US)} {CPU_PERIOD_US}" if cpu else f"max {CPU_PERIOD_US}")
+            _write(os.path.join(path, "memory.max"), str(int(memory_mb * 1024 * 1024)) if memory_mb else "max")
+            return
+        _write(os.path.join(cgroup.dirs["cpu"], "cpu.cfs_period_us"), str(CPU_PERIOD_US))
+        _write(os.path.join(cgroup.dirs["cpu"], "cpu.cfs_quota_us"), str(int(cpu * CPU_PERIOD_US)) if cpu else "-1")
+        _write(os.path.join(cgroup.dirs["memory"], "memory.limit_in_bytes"), str(int(memory_mb * 1024 * 1024)) if memory_mb else "-1")
+
+    def remove(self, cgroup):
+        """
+        Removes the cgroup of a stopped app (it must have no process left).
+        """
+        if cgroup is None:
+            return
+        self.previous.pop(cgroup.procs_files[0], None)
+        for path in set(cgroup.dirs.values()):
+            # A killed app leaves its cgroup shortly after it is reaped
+            for attempt in range(REMOVE_RETRIES):
+                try:
+                    os.rmdir(path)
+                    break
+                except FileNotFoundError:
+                    break
+                except OSError as e:
+                    if attempt == REMOVE_RETRIES - 1:
+                        print(f"[WARNING] Failed to remove cgroup {path}: {e}")
+                    time.sleep(0.05)
+
+    def cleanup(self):
+        """
+        Removes the cgroups left under <root>/cad once the network is stopped and its apps are gone.
+        Cgroups nested in CPU-limited hosts' are removed with the hosts by Mininet.
+        """
+        trees = [os.path.join(self.root, TREE)] if self.version == 2 else \
+            [os.path.join(self.root, controller, TREE) for controller in ("cpu", "cpuacct", "memory")]
+        for tree in trees:
+            # Cgroup directories only hold control files: rmdir works bottom-up once they have no processes
+            for path, _, _ in sorted(os.walk(tree), key=lambda entry: -entry[0].count(os.sep)):
+                try:
+                    os.rmdir(path)
+                except OSError as e:
+                    print(f"[WARNING] Failed to remove cgroup {path}: {e}")
+
+    def sample(self, cgroup):
+        """
+        Usage of an app since the previous sample: {"cpu": cores, "memory_mb": MiB}. "cpu" is None on the first sample.
+        """
+        now = time.monotonic()
+        cpu_us = cgroup.cpu_usage_us()
+        key = cgroup.procs_files[0]
+        previous = self.previous.get(key)
+        self.previous[key] = (now, cpu_us)
+        cpu = round((cpu_us - previous[1]) / 1e6 / max(now - previous[0], 1e-6), 3) if previous else None
+        return {"cpu": cpu, "memory_mb": round(cgroup.memory_bytes() / (1024 * 1024), 1)}
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="cgroup-usage", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+
+    def _loop(self):
+        # Usage is stored on each instance, where placement and the control API read it
+        while self.running:
+            for instance in list(self.service_manager.service_instances.values()):
+                cgroup = instance.get("cgroup")
+                if cgroup is None:
+                    continue
+                try:
+                    usage = self.sample(cgroup)
+                except (OSError, ValueError):
+                    continue  # app stopping, its cgroup is going away
+                if usage["cpu"] is not None:
+                    instance["usage"] = usage
+            time.sleep(self.interval)
+
+
+def _write(path, value):
+    with open(path, "w") as f:
+        f.write(value)
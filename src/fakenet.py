@@ -0,0 +1,204 @@
+import os
+import re
+import signal
+import itertools
+import subprocess
+import time
+
+# Fake pids are above Linux's pid_max so they can never name a real process
+_fake_pids = itertools.count(1 << 23)
+
+
+class FakeProcess:
+    """
+    Popen-like stand-in for an app process that is never executed. It runs until it is
+    signalled or exit() is called, which lets the supervisor be exercised too.
+    """
+    def __init__(self, args, env=None):
+        self.args = args
+        self.env = env or {}
+        self.pid = next(_fake_pids)
+        self.stdin = self.stdout = self.stderr = None
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+    def wait(self, timeout=None):
+        # Nothing runs in the background, so a live fake process only ends when signalled
+        if self.returncode is None and timeout is not None:
+            raise subprocess.TimeoutExpired(self.args, timeout)
+        return self.returncode
+
+    def exit(self, returncode=0):
+        if self.returncode is None:
+            self.returncode = returncode
+
+    def signal_group(self, sig):
+        self.exit(-sig)
+
+    def kill(self):
+        self.signal_group(signal.SIGKILL)
+
+    def terminate(self):
+        self.signal_group(signal.SIGTERM)
+
+
+class FakeIntf:
+    def __init__(self, node, name):
+        self.node = node
+        self.name = name
+        self.params = {}
+
+    def __repr__(self):
+        return self.name
+
+
+class FakeNode:
+    def __init__(self, name, first_port):
+        self.name = name
+        self.ports = {}  # FakeIntf: port number, as Mininet's Node.ports
+        self.next_port = first_port
+
+    def new_intf(self):
+        intf = FakeIntf(self, f"{self.name}-eth{self.next_port}")
+        self.ports[intf] = self.next_port
+        self.next_port += 1
+        return intf
+
+    def __repr__(self):
+        return self.name
+
+
+class FakeSwitch(FakeNode):
+    def __init__(self, name, dpid=None):
+        # Switch port numbers start at 1, as on OVS
+        super().__init__(name, first_port=1)
+        digits = re.findall(r"\d+", name)
+        self.dpid = dpid or f"{int(digits[0]) if digits else 0:016x}"
+        self.commands = []  # shell commands issued on the switch (QoS setup), recorded only
+
+    def cmd(self, command):
+        self.commands.append(command)
+        return ""
+
+
+class FakeHost(FakeNode):
+    """
+    Host with Mininet's cmd/popen/IP surface. By default apps are FakeProcesses and cmd()
+    answers the commands ServiceManager issues (env, readiness and liveness probes, cat,
+    mkdir) without running anything. With run_processes=True apps and commands really run
+    as local processes, in the root namespace.
+    """
+    def __init__(self, name, ip=None, run_processes=False):
+        super().__init__(name, first_port=0)
+        self.ip = ip.split("/", 1)[0] if ip else None
+        self.run_processes = run_processes
+        self.processes = []
+
+    def IP(self):
+        return self.ip
+
+    def setIP(self, ip, prefixLen=8):
+        self.ip = ip.split("/", 1)[0]
+
+    def popen(self, args, **kwargs):
+        if self.run_processes:
+            proc = subprocess.Popen(args, **kwargs)
+        else:
+            proc = FakeProcess(args, kwargs.get("env"))
+        self.processes.append(proc)
+        return proc
+
+    def cmd(self, command):
+        if self.run_processes:
+            return subprocess.run(["bash", "-c", command], stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True).stdout
+        command = command.strip()
+        if command == "env":
+            return "".join(f"{key}={value}\n" for key, value in os.environ.items() if "\n" not in value)
+        if "probe.py" in command:
+            return "READY\n"
+        match = re.search(r"/dev/tcp/[\d.]+/(\d+)", command)
+        if match:
+            return "ALIVE\n" if self._listening(match.group(1)) else ""
+        match = re.match(r"cat (\S+)", command)
+        if match:
+            try:
+                with open(match.group(1)) as f:
+                    return f.read()
+            except OSError:
+                return "\n"
+        return ""
+
+    def _listening(self, port):
+        self.processes = [proc for proc in self.processes if proc.poll() is None]
+        return any(proc.env.get("LISTEN_PORT") == port for proc in self.processes if isinstance(proc, FakeProcess))
+
+    def stop(self):
+        for proc in self.processes:
+            if proc.poll() is None:
+                proc.kill()
+
+
+class FakeLink:
+    def __init__(self, node1, node2, **params):
+        self.intf1 = node1.new_intf()
+        self.intf2 = node2.new_intf()
+        self.params = params
+        # Link parameters (bw, delay) are known to both interfaces, as on Mininet
+        self.intf1.params = self.intf2.params = params
+
+
+class FakeNet:
+    """
+    In-process replacement for the part of Mininet used by NetworkManager, ServiceManager and
+    FlowManager (hosts, switches, links, get, addHost/addSwitch/addLink). Nothing is emulated
+    on the data path, so topologies with thousands of hosts build in seconds without root.
+    Switches connect to ryu_stub (a RyuStub) on start().
+    """
+    def __init__(self, ryu_stub=None, run_processes=False):
+        self.ryu_stub = ryu_stub
+        self.run_processes = run_processes
+        self.hosts = []
+        self.switches = []
+        self.links = []
+        self.nameToNode = {}
+
+    def addHost(self, name, ip=None, **params):
+        host = FakeHost(name, ip, run_processes=self.run_processes)
+        self.hosts.append(host)
+        self.nameToNode[name] = host
+        return host
+
+    def addSwitch(self, name, dpid=None, **params):
+        switch = FakeSwitch(name, dpid)
+        self.switches.append(switch)
+        self.nameToNode[name] = switch
+        return switch
+
+    def addLink(self, node1, node2, **params):
+        link = FakeLink(self.get(node1) if isinstance(node1, str) else node1,
+                        self.get(node2) if isinstance(node2, str) else node2, **params)
+        self.links.append(link)
+        return link
+
+    def addController(self, *args, **params):
+        pass
+
+    def get(self, *names):
+        nodes = [self.nameToNode[name] for name in names]
+        return nodes[0] if len(nodes) == 1 else nodes
+
+    def __getitem__(self, name):
+        return self.nameToNode[name]
+
+    def start(self):
+        start = time.time()
+        if self.ryu_stub:
+            self.ryu_stub.connect_switches(int(switch.dpid, 16) for switch in self.switches)
+        print(f"[INFO] Fake network started: {len(self.hosts)} hosts, {len(self.switches)} switches, "
+              f"{len(self.links)} links ({time.time() - start:.2f}s)")
+
+    def stop(self):
+        for host in self.hosts:
+            host.stop()
@@ -1,64 +1,162 @@
+import sys
 import networkx
-from mininet.node import OVSKernelSwitch
 import requests 
 import json 
+import time
+from metrics import metrics
+from concurrent.futures import ThreadPoolExecutor
+
+
+def intern(value):
+    """
+    Returns the shared copy of an IP, dpid or service key, so the thousands of flows of a host or
+    switch all point to one string instead of each holding its own. Interned strings are freed once
+    no flow uses them. Other values are returned as they are.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class FlowEntry:
+    """
+    One direction of a service flow on one switch, kept as a row: a plain tuple of its interned
+    field values in FIELDS order. Tuples holding only strings, ints and None are untracked by the
+    garbage collector, so a table of 100k rows adds nothing to the work of its collections, where
+    100k objects (or dicts of them) would all be traversed. The forward and reverse rows of a host
+    pair refer to each other only through their keys. Rows are also the form written to the journal
+    and sent to the GUI.
+    """
+    FIELDS = ("service_key", "dpid", "src_ip", "dst_ip", "protocol", "src_port", "dst_port",
+              "in_port", "out_port", "priority", "queue_id", "meter_id")
+    # Index of each field in a row
+    (SERVICE_KEY, DPID, SRC_IP, DST_IP, PROTOCOL, SRC_PORT, DST_PORT,
+     IN_PORT, OUT_PORT, PRIORITY, QUEUE_ID, METER_ID) = range(len(FIELDS))
+
+    @staticmethod
+    def row(service_key, dpid, src_ip, dst_ip, protocol, src_port, dst_port, in_port, out_port, priority,
+            queue_id=None, meter_id=None):
+        return (intern(service_key), intern(dpid), intern(src_ip), intern(dst_ip), protocol, intern(src_port),
+                intern(dst_port), intern(in_port), intern(out_port), priority, queue_id, meter_id)
+
+    @staticmethod
+    def key(row):
+        # Unique per switch entry: the same flow of another service, or on another switch, is another entry
+        return (row[0], row[2], row[3], row[6], row[4], row[1], row[7])
+
+    @staticmethod
+    def reverse_key(row):
+        return (row[0], row[3], row[2], row[5], row[4], row[1], row[8])
+
+    @staticmethod
+    def reversed(row):
+        """
+        The row carrying the answers of this flow on the same switch (QoS is assigned per direction).
+        """
+        return (row[0], row[1], row[3], row[2], row[4], row[6], row[5], row[8], row[7], row[9], None, None)
+
+    @staticmethod
+    def with_qos(row, queue_id, meter_id):
+        return row[:FlowEntry.QUEUE_ID] + (queue_id, meter_id)
+
+    @staticmethod
+    def from_row(row):
+        # Row from its JSON form (a list)
+        return FlowEntry.row(*row)
+
 
 class FlowManager:
     def __init__(self, ryu_api_url='http://localhost:8080'): # Add Ryu API URL
-        self.active_flows = {}
+        self.active_flows = {}  # flow key: row (see FlowEntry)
         self.ryu_api_url = ryu_api_url # Store the API URL
+        self.journal = None  # DeploymentJournal recording flow events, if any
+        self.qos = None  # QosManager assigning queues and meters to the flows, if QoS is enabled
+        self._topology_cache = None
 
-    def get_switch_for_host(self, net, host_name):
-        host = net.get(host_name)
+    def _topology(self, net):
+        """
+        Switch graph, host attachments and port numbers of net, computed once and cached until links change.
+        Switches are recognized by their dpid, so any backend exposing Mininet's node/link surface works.
+        """
+        signature = (id(net), len(net.links))
+        if self._topology_cache and self._topology_cache["signature"] == signature:
+            return self._topology_cache
+        graph = networkx.Graph()
+        host_switch = {}  # host name: switch it is attached to
+        ports = {}  # (node name, neighbor name): port of node towards neighbor
+        intfs = {}  # (node name, port): interface
+        host_ports = set()  # (switch name, port) of the switch ports hosts are attached to
         for link in net.links:
-            if link.intf1.node == host and isinstance(link.intf2.node, OVSKernelSwitch):
-                return link.intf2.node
-            elif link.intf2.node == host and isinstance(link.intf1.node, OVSKernelSwitch):
-                return link.intf1.node
-        return None
+            n1, n2 = link.intf1.node, link.intf2.node
+            # With parallel links the first one is used, as before
+            ports.setdefault((n1.name, n2.name), n1.ports[link.intf1])
+            ports.setdefault((n2.name, n1.name), n2.ports[link.intf2])
+            intfs[(n1.name, n1.ports[link.intf1])] = link.intf1
+            intfs[(n2.name, n2.ports[link.intf2])] = link.intf2
+            is_switch1, is_switch2 = hasattr(n1, "dpid"), hasattr(n2, "dpid")
+            if is_switch1 and is_switch2:
+                graph.add_edge(n1.name, n2.name)
+            elif is_switch2:
+                host_switch.setdefault(n1.name, n2)
+                host_ports.add((n2.name, n2.ports[link.intf2]))
+            elif is_switch1:
+                host_switch.setdefault(n2.name, n1)
+                host_ports.add((n1.name, n1.ports[link.intf1]))
+        self._topology_cache = {"signature": signature, "graph": graph, "host_switch": host_switch, "ports": ports,
+                                "intfs": intfs, "host_ports": host_ports, "paths": {}}
+        return self._topology_cache
+
+    def get_switch_for_host(self, net, host_name):
+        return self._topology(net)["host_switch"].get(host_name)
 
     def get_port(self, net, node1, node2):
-        for link in net.links:
-            if link.intf1.node == node1 and link.intf2.node == node2:
-                return node1.ports[link.intf1]
-            elif link.intf2.node == node1 and link.intf1.node == node2:
-                return node1.ports[link.intf2]
-        return None
+        return self._topology(net)["ports"].get((node1.name, node2.name))
 
     def get_path(self, net, src, dst):
-        g = networkx.Graph()
-        for link in net.links:
-            n1, n2 = link.intf1.node, link.intf2.node
-            if isinstance(n1, OVSKernelSwitch) and isinstance(n2, OVSKernelSwitch):
-                g.add_edge(n1.name, n2.name)
-        try:
-            return networkx.shortest_path(g, src, dst)
-        except Exception:
-            return None
-
-    def _send_flow_to_ryu(self, flow_data):
-        dpid = flow_data['dpid']
-        flow_action = flow_data['action']  # 'add' or 'remove'
-        dpid_int = int(dpid, 16) if isinstance(dpid, str) else dpid
+        topology = self._topology(net)
+        if (src, dst) not in topology["paths"]:
+            try:
+                topology["paths"][(src, dst)] = networkx.shortest_path(topology["graph"], src, dst)
+            except Exception:
+                return None
+        return topology["paths"][(src, dst)]
 
-        url = f"{self.ryu_api_url}/stats/flowentry/{flow_action}"  # cmd endpoint
-        
+    @staticmethod
+    def _flow_match(flow):
         match = {
             "eth_type": 0x0800,
-            "ipv4_src": flow_data['src_ip'],
-            "ipv4_dst": flow_data['dst_ip'],
-            "in_port": flow_data['in_port']
+            "ipv4_src": flow[FlowEntry.SRC_IP],
+            "ipv4_dst": flow[FlowEntry.DST_IP],
+            "in_port": flow[FlowEntry.IN_PORT]
         }
-        if flow_data['protocol'] == 6:  # TCP
+        protocol = flow[FlowEntry.PROTOCOL]
+        if protocol == 6:  # TCP
             match["ip_proto"] = 6
-            if flow_data['src_port']:
-                match["tcp_src"] = flow_data['src_port']
-            if flow_data['dst_port']:
-                match["tcp_dst"] = flow_data['dst_port']
-        elif flow_data['protocol'] == 1:  # ICMP
+            if flow[FlowEntry.SRC_PORT]:
+                match["tcp_src"] = flow[FlowEntry.SRC_PORT]
+            if flow[FlowEntry.DST_PORT]:
+                match["tcp_dst"] = flow[FlowEntry.DST_PORT]
+        elif protocol == 1:  # ICMP
             match["ip_proto"] = 1
+        return match
+
+    @staticmethod
+    def _match_key(priority, match):
+        # Switches may report extra match fields: compare only the ones this manager sets
+        return (priority, match.get("in_port"), match.get("ipv4_src"), match.get("ipv4_dst"),
+                match.get("ip_proto"), match.get("tcp_src"), match.get("tcp_dst"))
+
+    def _send_flow_to_ryu(self, flow, flow_action="add"):
+        # flow_action: 'add' or 'delete'
+        dpid = flow[FlowEntry.DPID]
+        dpid_int = int(dpid, 16) if isinstance(dpid, str) else dpid
 
-        actions = [{"type": "OUTPUT", "port": flow_data['out_port']}]
+        url = f"{self.ryu_api_url}/stats/flowentry/{flow_action}"  # cmd endpoint
+        match = self._flow_match(flow)
+        actions = [{"type": "OUTPUT", "port": flow[FlowEntry.OUT_PORT]}]
+        # QoS: police at the meter, then leave through the class's queue of the output port
+        if flow[FlowEntry.QUEUE_ID] is not None:
+            actions.insert(0, {"type": "SET_QUEUE", "queue_id": flow[FlowEntry.QUEUE_ID]})
+        if flow[FlowEntry.METER_ID]:
+            actions.insert(0, {"type": "METER", "meter_id": flow[FlowEntry.METER_ID]})
 
         flow_entry = {
             "dpid": dpid_int,
@@ -67,7 +165,7 @@ class FlowManager:
             "table_id": 0,
             "idle_timeout": 0,
             "hard_timeout": 0,
-            "priority": flow_data['priority'],
+            "priority": flow[FlowEntry.PRIORITY],
             "flags": 0,
             "match": match,
             "actions": actions
@@ -78,12 +176,37 @@ class FlowManager:
             flow_entry.pop("cookie_mask")
         
         headers = {'Content-Type': 'application/json'}
+        endpoint = f"flowentry/{flow_action}"
+        metrics.inc("rest_requests_total", endpoint=endpoint)
+        start = time.perf_counter()
         try:
             response = requests.post(url, data=json.dumps(flow_entry), headers=headers)
             response.raise_for_status()
             print(f"[Ryu API] Flow {flow_action}ed for DPID {dpid_int}: {response.status_code}")
         except requests.exceptions.RequestException as e:
+            metrics.inc("rest_failures_total", endpoint=endpoint)
             print(f"[ERROR] Failed to {flow_action} flow via Ryu API for DPID {dpid_int}: {e}")
+        metrics.observe("rest_duration_seconds", time.perf_counter() - start, endpoint=endpoint)
+
+    def _with_qos(self, net, switch, flow):
+        """
+        The flow with the queue and meter of the service's QoS class (after setting them up on the
+        switch if needed), or without any when QoS is off. Flows are metered where they enter
+        the network, i.e. on the switch port of their source host.
+        """
+        if not self.qos:
+            return FlowEntry.with_qos(flow, None, None)
+        topology = self._topology(net)
+        qos = self.qos.flow_qos(switch, topology["intfs"].get((switch.name, flow[FlowEntry.OUT_PORT])),
+                                flow[FlowEntry.SERVICE_KEY], (switch.name, flow[FlowEntry.IN_PORT]) in topology["host_ports"])
+        return FlowEntry.with_qos(flow, qos["queue_id"], qos["meter_id"])
+
+    def _add_flow_pair(self, net, switch, flow):
+        # Installs the flow and its reverse direction on the switch
+        for entry in (flow, FlowEntry.reversed(flow)):
+            entry = self._with_qos(net, switch, entry)
+            self._send_flow_to_ryu(entry)
+            self._track(entry)
 
     def add_flow_queue(self, net, service_key, src_host, dst_host, protocol, src_port=None, dst_port=None):        
         src_ip, dst_ip = src_host.IP(), dst_host.IP()
@@ -92,20 +215,8 @@ class FlowManager:
         out_port = self.get_port(net, sw2, dst_host)
         
         if sw1.name == sw2.name:
-            flow_params = {
-                'action': 'add', 'dpid': sw1.dpid, 'src_ip': src_ip, 'dst_ip': dst_ip,
-                'protocol': protocol, 'src_port': src_port, 'dst_port': dst_port,
-                'in_port': in_port, 'out_port': out_port, 'priority': 200, 'service_key': service_key
-            }
-            self._send_flow_to_ryu(flow_params)
-            self.active_flows[(service_key, src_ip, dst_ip, dst_port, protocol, sw1.dpid, in_port)] = flow_params
-            
-            # Reverse flow
-            rev_flow_params = flow_params.copy()
-            rev_flow_params.update({'src_ip': dst_ip, 'dst_ip': src_ip, 'src_port': dst_port, 'dst_port': src_port,
-                                    'in_port': out_port, 'out_port': in_port})
-            self._send_flow_to_ryu(rev_flow_params)
-            self.active_flows[(service_key, dst_ip, src_ip, src_port, protocol, sw1.dpid, out_port)] = rev_flow_params
+            self._add_flow_pair(net, sw1, FlowEntry.row(service_key, sw1.dpid, src_ip, dst_ip, protocol, src_port, dst_port,
+                                                    in_port, out_port, 200))
             return
 
         path = self.get_path(net, sw1.name, sw2.name)
@@ -122,30 +233,106 @@ class FlowManager:
                 in_p = self.get_port(net, sw, net.get(path[i-1]))
                 out_p = self.get_port(net, sw, net.get(path[i+1]))
             
-            flow_params = {
-                'action': 'add', 'dpid': dpid, 'src_ip': src_ip, 'dst_ip': dst_ip,
-                'protocol': protocol, 'src_port': src_port, 'dst_port': dst_port,
-                'in_port': in_p, 'out_port': out_p, 'priority': 100, 'service_key': service_key
-            }
-            self._send_flow_to_ryu(flow_params)
-            self.active_flows[(service_key, src_ip, dst_ip, dst_port, protocol, dpid, in_p)] = flow_params
-            
-            # Reverse flow
-            rev_flow_params = flow_params.copy()
-            rev_flow_params.update({'src_ip': dst_ip, 'dst_ip': src_ip, 'src_port': dst_port, 'dst_port': src_port,
-                                    'in_port': out_p, 'out_port': in_p})
-            self._send_flow_to_ryu(rev_flow_params)
-            self.active_flows[(service_key, dst_ip, src_ip, src_port, protocol, dpid, out_p)] = rev_flow_params
+            self._add_flow_pair(net, sw, FlowEntry.row(service_key, dpid, src_ip, dst_ip, protocol, src_port, dst_port,
+                                                   in_p, out_p, 100))
 
     def remove_flow_queue(self, service_key, src_ip, dst_ip, protocol=None, src_port=None, dst_port=None):
-        keys = [k for k in self.active_flows if k[0] == service_key and k[1] == src_ip and k[2] == dst_ip and
+        # Iterate over a copy: batched deploys and stops add and remove other services' flows concurrently
+        keys = [k for k in list(self.active_flows) if k[0] == service_key and k[1] == src_ip and k[2] == dst_ip and
                 (protocol is None or k[4] == protocol) and (dst_port is None or k[3] == dst_port)]
+        self._remove_keys(keys)
+
+    def remove_flow_pair(self, service_key, src_ip, dst_ip, protocol, dst_port):
+        """
+        Removes a flow installed by add_flow_queue (src -> dst:dst_port) together with its reverse direction.
+        """
+        keys = set()
+        for k, f in list(self.active_flows.items()):
+            if k[0] == service_key and k[4] == protocol and k[1] == src_ip and k[2] == dst_ip and k[3] == dst_port:
+                keys.add(k)
+                keys.add(FlowEntry.reverse_key(f))
+        self._remove_keys(keys)
+
+    def remove_flows_for_ip(self, service_key, ip, keep=()):
+        """
+        Removes every flow of a service to or from ip, except the ones whose (src_ip, dst_ip, dst_port, protocol)
+        is in keep: the flows the service's other apps on the same host still need.
+        """
+        keys = [k for k in list(self.active_flows) if k[0] == service_key and ip in (k[1], k[2]) and k[1:5] not in keep]
+        self._remove_keys(keys)
+
+    def _remove_keys(self, keys):
         for k in keys:
-            flow = self.active_flows[k]
-            flow_data = flow.copy()
-            flow_data['action'] = 'delete'
-            self._send_flow_to_ryu(flow_data) # Send removal request
-            del self.active_flows[k]
+            flow = self.active_flows.pop(k, None)
+            if flow is None:
+                continue
+            self._send_flow_to_ryu(flow, "delete") # Send removal request
+            if self.journal:
+                self.journal.record("flow_del", key=k)
+
+    def _track(self, flow):
+        # The reverse direction is found through FlowEntry.reverse_key, so no link between the rows is kept
+        key = FlowEntry.key(flow)
+        self.active_flows[key] = flow
+        if self.journal:
+            self.journal.record("flow_add", key=key, flow=flow)
+
+    def install_flows(self, flows, workers=16, net=None):
+        """
+        Bulk-installs already computed flow rows, e.g. when restoring a checkpoint.
+        REST calls are issued in parallel. With net, queues and meters are assigned for the current QoS setting.
+        """
+        if net is not None:
+            switches = {switch.dpid: switch for switch in net.switches}
+            flows = [self._with_qos(net, switches[flow[FlowEntry.DPID]], flow) for flow in flows]
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(self._send_flow_to_ryu, flows))
+        for flow in flows:
+            self._track(flow)
 
     def get_active_flows(self):
-        return self.active_flows
\ No newline at end of file
+        return self.active_flows
+
+    def flow_rows(self, counters=None):
+        """
+        Compact listing of the active flows for the GUI: {"fields": FlowEntry.FIELDS, "rows": [row, ...]}.
+        With counters (from flow_counters()), every row ends with the flow's packet and byte counts.
+        """
+        flows = list(self.active_flows.items())
+        if counters is None:
+            return {"fields": list(FlowEntry.FIELDS), "rows": [list(flow) for _, flow in flows]}
+        return {"fields": list(FlowEntry.FIELDS) + ["packet_count", "byte_count"],
+                "rows": [list(flow + counters.get(key, (None, None))) for key, flow in flows]}
+
+    def flow_counters(self, workers=16):
+        """
+        Packet and byte counters of the active flows, read from the switches through the Ryu REST API.
+        Returns {flow key: (packet_count, byte_count)}; flows a switch did not report are left out.
+        """
+        by_dpid = {}
+        for key, flow in list(self.active_flows.items()):
+            # Services sharing a host pair share the switch entry, and its counters
+            by_dpid.setdefault(flow[FlowEntry.DPID], {}).setdefault(self._match_key(flow[FlowEntry.PRIORITY], self._flow_match(flow)), []).append(key)
+
+        def read_table(dpid):
+            dpid_int = int(dpid, 16) if isinstance(dpid, str) else dpid
+            metrics.inc("rest_requests_total", endpoint="flow")
+            try:
+                response = requests.get(f"{self.ryu_api_url}/stats/flow/{dpid_int}", timeout=2)
+                response.raise_for_status()
+                return dpid, response.json().get(str(dpid_int), [])
+            except (requests.exceptions.RequestException, ValueError) as e:
+                metrics.inc("rest_failures_total", endpoint="flow")
+                print(f"[ERROR] Failed to read flow stats for DPID {dpid_int}: {e}")
+                return dpid, []
+
+        counters = {}
+        if not by_dpid:
+            return counters
+        with ThreadPoolExecutor(max_workers=min(workers, len(by_dpid))) as executor:
+            for dpid, entries in executor.map(read_table, list(by_dpid)):
+                keys = by_dpid[dpid]
+                for entry in entries:
+                    for key in keys.get(self._match_key(entry.get("priority"), entry.get("match", {})), ()):
+                        counters[key] = (entry.get("packet_count", 0), entry.get("byte_count", 0))
+        return counters
@@ -0,0 +1,234 @@
+import tkinter as tk
+from tkinter import ttk
+
+COLUMNS = [
+    # (column, heading, width)
+    ("service", "Service", 110),
+    ("src", "Source", 95),
+    ("dst", "Destination", 95),
+    ("dpid", "DPID", 50),
+    ("in_port", "In", 40),
+    ("out_port", "Out", 40),
+    ("protocol", "Proto", 50),
+    ("dst_port", "Port", 50),
+    ("packets", "Packets", 70),
+    ("bytes", "Bytes", 80),
+]
+# Fields of a flow's key and of its row (the COLUMNS), as named by the control API
+KEY_FIELDS = ("service_key", "src_ip", "dst_ip", "dst_port", "protocol", "dpid", "in_port")
+ROW_FIELDS = ("service_key", "src_ip", "dst_ip", "dpid", "in_port", "out_port", "protocol", "dst_port", "packet_count", "byte_count")
+GROUPS = {"none": None, "service": 0, "dpid": 3, "src": 1, "dst": 2}  # group by: index of the row field
+PROTOCOLS = {1: "ICMP", 6: "TCP"}
+ROW_HEIGHT = 20
+HEADING_HEIGHT = 24
+
+
+class FlowStore:
+    """
+    Flows as last listed by the control API, by flow key. update() returns the keys that
+    were added, changed (e.g. their counters) or removed since the previous listing.
+    """
+    def __init__(self):
+        self.flows = {}  # flow key: row fields, in COLUMNS order
+
+    @staticmethod
+    def flow_key(flow):
+        return (flow["service_key"], flow["src_ip"], flow["dst_ip"], flow["dst_port"], flow["protocol"], flow["dpid"], flow["in_port"])
+
+    @staticmethod
+    def row(flow):
+        return (flow["service_key"], flow["src_ip"], flow["dst_ip"], int(flow["dpid"], 16) if isinstance(flow["dpid"], str) else flow["dpid"],
+                flow["in_port"], flow["out_port"], flow["protocol"], flow["dst_port"],
+                flow.get("packet_count"), flow.get("byte_count"))
+
+    @staticmethod
+    def compact_rows(flows):
+        """
+        Yields (flow key, row) from the compact listing of the control API ({"fields": [...], "rows": [...]}),
+        reading the values by position instead of building a dict per flow.
+        """
+        index = {name: i for i, name in enumerate(flows["fields"])}
+        key_at = [index[name] for name in KEY_FIELDS]
+        row_at = [index.get(name) for name in ROW_FIELDS]
+        dpid_at = index["dpid"]
+        for values in flows["rows"]:
+            row = [values[i] if i is not None else None for i in row_at]
+            if isinstance(values[dpid_at], str):
+                row[3] = int(values[dpid_at], 16)
+            yield tuple(values[i] for i in key_at), tuple(row)
+
+    def update(self, flows):
+        # flows: a list of flow dicts, or the compact listing
+        pairs = self.compact_rows(flows) if isinstance(flows, dict) else ((self.flow_key(flow), self.row(flow)) for flow in flows)
+        new = dict(pairs)
+        added = new.keys() - self.flows.keys()
+        removed = self.flows.keys() - new.keys()
+        changed = {key for key in new.keys() & self.flows.keys() if new[key] != self.flows[key]}
+        self.flows = new
+        return added, changed, removed
+
+
+class FlowBrowser:
+    """
+    Flow table on a ttk.Treeview that holds only the rows in view: scrolling moves a window
+    over the filtered, grouped and sorted flows and rewrites just the rows whose content
+    differs from what is shown. Flows can be filtered by text (every word must appear in the
+    row) and grouped by service, dpid, source or destination; click a group to expand it.
+    """
+    def __init__(self, parent):
+        self.store = FlowStore()
+        self.frame = ttk.Frame(parent)
+        self.frame.grid_rowconfigure(1, weight=1)
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.rows = []  # (row id, values, tags) of the whole table
+        self.shown = []  # (row id, values, tags) in each tree item, top to bottom
+        self.offset = 0  # index in rows of the top tree item
+        self.visible = 15
+        self.expanded = set()  # groups opened by the user
+        self.sort_column = None
+        self.sort_reverse = False
+
+        controls = ttk.Frame(self.frame)
+        controls.grid(row=0, column=0, columnspan=2, sticky="ew")
+        controls.grid_columnconfigure(1, weight=1)
+        ttk.Label(controls, text="Filter:").grid(row=0, column=0, padx=(0, 5))
+        self.filter_var = tk.StringVar()
+        self.filter_var.trace_add("write", lambda *_: self.rebuild())
+        ttk.Entry(controls, textvariable=self.filter_var).grid(row=0, column=1, sticky="ew")
+        ttk.Label(controls, text="Group by:").grid(row=0, column=2, padx=5)
+        self.group_combobox = ttk.Combobox(controls, values=list(GROUPS), state="readonly", width=8)
+        self.group_combobox.set("service")
+        self.group_combobox.bind("<<ComboboxSelected>>", lambda _: self.rebuild())
+        self.group_combobox.grid(row=0, column=3)
+        self.count_var = tk.StringVar()
+        ttk.Label(controls, textvariable=self.count_var).grid(row=1, column=0, columnspan=4, sticky="w")
+
+        ttk.Style().configure("Flows.Treeview", rowheight=ROW_HEIGHT)
+        self.tree = ttk.Treeview(self.frame, columns=[c for c, _, _ in COLUMNS], show="headings",
+                                 selectmode="none", height=self.visible, style="Flows.Treeview")
+        for column, heading, width in COLUMNS:
+            self.tree.heading(column, text=heading, command=lambda c=column: self.sort_by(c))
+            self.tree.column(column, width=width, stretch=column == "service")
+        self.tree.tag_configure("group", background="#e8e8e8")
+        self.tree.grid(row=1, column=0, sticky="nsew")
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.scroll)
+        self.scrollbar.grid(row=1, column=1, sticky="ns")
+        self.tree.bind("<Configure>", self._resized)
+        self.tree.bind("<Button-1>", self._clicked)
+        self.tree.bind("<MouseWheel>", lambda e: self.scroll("scroll", -e.delta // 120, "units"))
+        self.tree.bind("<Button-4>", lambda e: self.scroll("scroll", -1, "units"))
+        self.tree.bind("<Button-5>", lambda e: self.scroll("scroll", 1, "units"))
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def update(self, flows):
+        # Nothing to redraw when no flow was added, removed or has new counters
+        if any(self.store.update(flows)):
+            self.rebuild()
+
+    def rebuild(self):
+        terms = self.filter_var.get().lower().split()
+        flows = [(key, row) for key, row in self.store.flows.items()
+                 if not terms or all(term in " ".join(_display(row)).lower() for term in terms)]
+        if self.sort_column:
+            index = [c for c, _, _ in COLUMNS].index(self.sort_column)
+            flows.sort(key=lambda item: _sort_value(item[1][index]), reverse=self.sort_reverse)
+        else:
+            flows.sort(key=lambda item: _sort_value(item[0]))
+        group_index = GROUPS[self.group_combobox.get()]
+        if group_index is None:
+            self.rows = [(key, _display(row), ()) for key, row in flows]
+        else:
+            groups = {}
+            for key, row in flows:
+                groups.setdefault(row[group_index], []).append((key, row))
+            self.rows = []
+            for group in sorted(groups, key=_sort_value):
+                members = groups[group]
+                opened = (group_index, group) in self.expanded
+                header = [""] * len(COLUMNS)
+                header[0] = f"{'▾' if opened else '▸'} {_format(group_index, group)} ({len(members)} flows)"
+                header[8] = _total(row[8] for _, row in members)
+                header[9] = _total(row[9] for _, row in members)
+                self.rows.append((("group", group_index, group), tuple(header), ("group",)))
+                if opened:
+                    self.rows.extend((key, _display(row), ()) for key, row in members)
+        shown_flows = len(flows)
+        self.count_var.set(f"{shown_flows} of {len(self.store.flows)} flows" if terms else f"{shown_flows} flows")
+        self.render()
+
+    def render(self):
+        self.offset = max(0, min(self.offset, len(self.rows) - self.visible))
+        window = self.rows[self.offset:self.offset + self.visible]
+        window += [(None, ("",) * len(COLUMNS), ())] * (self.visible - len(window))
+        # Create or drop tree items when the number of visible rows changed
+        while len(self.shown) < self.visible:
+            self.tree.insert("", tk.END, iid=f"row{len(self.shown)}", values=("",) * len(COLUMNS))
+            self.shown.append((None, ("",) * len(COLUMNS), ()))
+        while len(self.shown) > self.visible:
+            self.shown.pop()
+            self.tree.delete(f"row{len(self.shown)}")
+        for i, row in enumerate(window):
+            if self.shown[i] != row:
+                self.tree.item(f"row{i}", values=row[1], tags=row[2])
+                self.shown[i] = row
+        if self.rows:
+            self.scrollbar.set(self.offset / len(self.rows), min(1.0, (self.offset + self.visible) / len(self.rows)))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.offset = int(float(amount) * len(self.rows))
+        elif unit == "pages":
+            self.offset += int(amount) * self.visible
+        else:
+            self.offset += int(amount)
+        self.render()
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column, self.sort_reverse = column, False
+        self.rebuild()
+
+    def _resized(self, event):
+        visible = max(1, (event.height - HEADING_HEIGHT) // ROW_HEIGHT)
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
+    def _clicked(self, event):
+        item = self.tree.identify_row(event.y)
+        if not item:
+            return
+        row_id = self.shown[int(item[3:])][0]
+        if isinstance(row_id, tuple) and row_id[0] == "group":
+            self.expanded ^= {row_id[1:]}
+            self.rebuild()
+
+
+def _format(index, value):
+    if value is None:
+        return "-"
+    if index == 6:
+        return PROTOCOLS.get(value, str(value))
+    return str(value)
+
+
+def _display(row):
+    return tuple(_format(i, value) for i, value in enumerate(row))
+
+
+def _sort_value(value):
+    # Mixed None/int/str columns (counters not read yet, TCP/ICMP ports) sort without errors
+    if isinstance(value, tuple):
+        return tuple(_sort_value(v) for v in value)
+    return (value is not None, isinstance(value, str), value if value is not None else 0)
+
+
+def _total(values):
+    values = [value for value in values if value is not None]
+    return str(sum(values)) if values else "-"
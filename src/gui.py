@@ -1,31 +1,47 @@
+import queue
 import tkinter as tk
 from tkinter import ttk
-from services import ServiceManager
+from difflib import SequenceMatcher
+from concurrent.futures import ThreadPoolExecutor
+from api import ControlError
+from flow_browser import FlowBrowser
+
+REFRESH_MS = 2000  # period of the automatic services/flows refresh
+POLL_MS = 50  # how often results of background operations are applied to the widgets
 
 class ServiceDeployGUI:
-    def __init__(self, root, net, flow_queue):
+    """
+    Tk front end of the control API: every action goes through client (a ControlClient),
+    like the ones of cadctl and scripts. Calls to the API run on a background executor and
+    their results are applied on the Tk thread, so the window never waits on the network.
+    Lists and texts are updated by diffing the new lines against the displayed ones, flows
+    are shown in a FlowBrowser.
+    """
+    def __init__(self, root, client):
         self.root = root
-        self.net = net
-        self.service_manager = ServiceManager()
-        self.service_manager.flow_modification_queue = flow_queue
+        self.client = client
+        self.instances = []  # app instances as last listed by the control API
+        self.service_lines = []  # lines shown in the services listbox
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="gui")
+        self.results = queue.Queue()  # (message, on_done, result, error) of finished operations
+        self.pending = 0
+        self.refreshing = set()  # views with a refresh in flight
 
         self.services = ["web", "random", "datetime"]
         
-        # init gui with colab services and update
         self.setup_gui()
 
-        # Deploy colab service on all hosts at GUI startup
-        self.service_manager.deploy_colab_on_all_hosts(self.net)
-
-        self.update_communication_results()
-        self.update_active_services()
-        self.update_test_service_combobox()
+        self.root.after(POLL_MS, self._apply_results)
+        self.auto_refresh()
         
     
     def update_test_service_combobox(self):
-        active_service = sorted({s_k for (s_k, _) in self.service_manager.service_instances})
+        active_service = sorted({instance["service_key"] for instance in self.instances})
+        if list(self.test_service_combobox["values"]) == active_service:
+            return
         self.test_service_combobox["values"] = active_service
-        if active_service:
+        # Keep the user's choice while the service is still running
+        if active_service and self.test_service_combobox.get() not in active_service:
             self.test_service_combobox.set(active_service[0])
     
     def setup_gui(self):
@@ -55,14 +71,17 @@ class ServiceDeployGUI:
         self.active_services_listbox.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
         ttk.Button(active_frame, text="Stop Selected", command=self.stop_selected_service).grid(row=1, column=0, pady=5)
         ttk.Button(active_frame, text="Refresh", command=self.update_active_services).grid(row=2, column=0, pady=5)
+        ttk.Button(active_frame, text="Show Logs", command=self.show_selected_logs).grid(row=3, column=0, pady=5)
+        ttk.Button(active_frame, text="Add Replica", command=lambda: self.scale_selected_app(1)).grid(row=4, column=0, pady=5)
+        ttk.Button(active_frame, text="Remove Replica", command=lambda: self.scale_selected_app(-1)).grid(row=5, column=0, pady=5)
 
         # Communication Flows
         flow_frame = ttk.LabelFrame(self.root, text="SDN Communication Flows")
         flow_frame.grid(row=1, column=1, padx=10, pady=10, sticky="nsew")
         flow_frame.grid_rowconfigure(0, weight=1)
         flow_frame.grid_columnconfigure(0, weight=1)
-        self.communication_results_text = tk.Text(flow_frame, height=15, width=60, state="disabled")
-        self.communication_results_text.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
+        self.flow_browser = FlowBrowser(flow_frame)
+        self.flow_browser.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
         ttk.Button(flow_frame, text="Refresh Flows", command=self.update_communication_results).grid(row=1, column=0, pady=5)
 
         # Test Results
@@ -78,13 +97,98 @@ class ServiceDeployGUI:
         self.test_results_text.grid(row=1, column=0, columnspan=2, padx=5, pady=5, sticky="nsew")
         ttk.Button(test_frame, text="Test", command=self.test_selected_service).grid(row=2, column=0, columnspan=2, pady=5)
 
+        # Progress of background operations
+        status_frame = ttk.Frame(self.root)
+        status_frame.grid(row=2, column=0, columnspan=2, padx=10, pady=(0, 10), sticky="ew")
+        status_frame.grid_columnconfigure(0, weight=1)
+        self.status_var = tk.StringVar(value="Ready")
+        ttk.Label(status_frame, textvariable=self.status_var).grid(row=0, column=0, sticky="w")
+        self.progress = ttk.Progressbar(status_frame, mode="indeterminate", length=150)
+        self.progress.grid(row=0, column=1, sticky="e")
+
+    def run_in_background(self, message, work, on_done=None):
+        """
+        Runs work() on the executor and then on_done(result) on the Tk thread. message, if
+        given, is shown in the status bar while the operation runs; failures are reported.
+        """
+        self.pending += 1
+        if message:
+            self.status_var.set(f"{message}...")
+        self.progress.start(10)
+
+        def task():
+            # Any failure is handed back, or pending would never go down and the progress bar never stop
+            try:
+                self.results.put((message, on_done, work(), None))
+            except Exception as e:
+                self.results.put((message, on_done, None, e))
+
+        self.executor.submit(task)
+
+    def _apply_results(self):
+        # Tk widgets may only be touched from the Tk thread: finished operations are handed over here
+        try:
+            while True:
+                message, on_done, result, error = self.results.get_nowait()
+                self.pending -= 1
+                if not error and on_done:
+                    # A failing callback must not stop the results of later operations from being handled
+                    try:
+                        on_done(result)
+                    except Exception as e:
+                        error = e
+                if error:
+                    self.show_message(f"{message or 'Control API call'} failed: {error}")
+                if message:
+                    self.status_var.set(f"{message}: {'failed' if error else 'done'}")
+        except queue.Empty:
+            pass
+        finally:
+            if not self.pending:
+                self.progress.stop()
+            self.root.after(POLL_MS, self._apply_results)
+
+    def auto_refresh(self):
+        self.refresh()
+        self.root.after(REFRESH_MS, self.auto_refresh)
+
+    def refresh(self):
+        self.update_active_services()
+        self.update_communication_results()
+
+    def _refresh_view(self, view, work, on_done):
+        # At most one refresh per view in flight: slow answers are not queued up behind each other
+        if view in self.refreshing:
+            return
+        self.refreshing.add(view)
+
+        def fetch():
+            # Every failure goes through done(), which lets the view be refreshed again
+            try:
+                return work(), None
+            except Exception as e:
+                return None, e
+
+        def done(answer):
+            self.refreshing.discard(view)
+            result, error = answer
+            if error:
+                # Reported in the status bar only: the automatic refresh would repeat it every period
+                self.status_var.set(f"Control API unavailable: {error}")
+            else:
+                on_done(result)
+
+        self.run_in_background(None, fetch, done)
+
     def deploy_service_callback(self):
         service_name = self.service_combobox.get()
         if service_name:
-            self.service_manager.control_services(self.net, action='deploy', service_name=service_name, gui=self)
-            self.update_active_services()
-            self.update_communication_results()
-            self.update_test_service_combobox()
+            def deployed(service_keys):
+                if not service_keys:
+                    self.show_message("Not enough space to deploy the service.")
+                self.refresh()
+
+            self.run_in_background(f"Deploying {service_name}", lambda: self.client.deploy(service_name), deployed)
 
     def stop_selected_service(self):
         selected = self.active_services_listbox.curselection()
@@ -95,45 +199,118 @@ class ServiceDeployGUI:
         service_key = parts.get('Service')
         app_name = parts.get('App')
         if service_key and app_name:
-            self.service_manager.control_services(self.net, action='stop', service_name=service_key, selected_process=selected_service, gui=self)
-            self.update_active_services()
-            self.update_communication_results()
-            self.update_test_service_combobox()
-            # Try redeploy colab
-            self.service_manager.try_redeploy_colab(self.net)
+            # The control API refills the freed slots with colab
+            self.run_in_background(f"Stopping {service_key}", lambda: self.client.stop(service_key), lambda _: self.refresh())
+
+    def scale_selected_app(self, delta):
+        selected = self.active_services_listbox.curselection()
+        if not selected:
+            return
+        selected_service = self.active_services_listbox.get(selected[0])
+        parts = {p.split(': ')[0]: p.split(': ')[1] for p in selected_service.split(', ')}
+
+        def scaled(result):
+            if not result["ok"]:
+                self.show_message(f"Could not scale {parts['App']} of {parts['Service']}.")
+            self.refresh()
+
+        self.run_in_background(f"Scaling {parts['App']} of {parts['Service']}",
+                               lambda: self.client.scale(parts['Service'], parts['App'], delta=delta), scaled)
+
+    def show_selected_logs(self):
+        selected = self.active_services_listbox.curselection()
+        if not selected:
+            return
+        selected_service = self.active_services_listbox.get(selected[0])
+        parts = {p.split(': ')[0]: p.split(': ')[1] for p in selected_service.split(', ')}
+        service_key = parts.get('Service')
+        app_name = parts.get('App')
+        if not (service_key and app_name):
+            return
+
+        log_window = tk.Toplevel(self.root)
+        log_window.title(f"Logs: {service_key} / {app_name}")
+        log_window.grid_rowconfigure(0, weight=1)
+        log_window.grid_columnconfigure(0, weight=1)
+        log_text = tk.Text(log_window, height=25, width=100, state="disabled")
+        log_text.grid(row=0, column=0, padx=5, pady=5, sticky="nsew")
+        shown = []
+
+        def fetch_logs():
+            try:
+                return self.client.logs(service_key, app_name, lines=200) or ["No output captured yet."]
+            except (ControlError, OSError) as e:
+                return [f"Logs unavailable: {e}"]
+
+        def show_logs(lines):
+            # Tail the instance output until the window is closed
+            if not log_window.winfo_exists():
+                return
+            _sync_text(log_text, shown, lines)
+            shown[:] = lines
+            log_text.see(tk.END)
+            log_window.after(1000, lambda: self.run_in_background(None, fetch_logs, show_logs))
+
+        self.run_in_background(None, fetch_logs, show_logs)
 
     def update_active_services(self):
-        self.active_services_listbox.delete(0, tk.END)
-        for service_info in self.service_manager.update_gui_with_active_services():
-            self.active_services_listbox.insert(tk.END, service_info)
+        self._refresh_view("services", self.client.services, self._show_services)
+
+    def _show_services(self, instances):
+        self.instances = sorted(instances, key=lambda i: (i["service_key"], i["app"]))
+        lines = [f"Service: {i['service_key']}, App: {i['app']}, Host: {i['host']}, IP: {i['ip']}, Status: {i['status']}"
+                 for i in self.instances]
+        _sync_listbox(self.active_services_listbox, self.service_lines, lines)
+        self.service_lines = lines
+        self.update_test_service_combobox()
 
     def update_communication_results(self):
-        self.communication_results_text.config(state="normal")
-        self.communication_results_text.delete(1.0, tk.END)
-        active_flows = self.service_manager.update_gui_with_active_flows()["flows"]
-        if not active_flows:
-            self.communication_results_text.insert(tk.END, "No active flows detected.\n")
-        else:
-            for (service_key, src_ip, dst_ip, dst_port, protocol, dpid, in_port), details in active_flows.items():
-                out_port = details.get('out_port', 'N/A')
-                priority = details.get('priority', 'N/A')
-                flow_line = (f"Service: {service_key}, {src_ip} -> {dst_ip}, "
-                             f"DPID: {dpid}, InPort: {in_port}, OutPort: {out_port}, "
-                             f"Priority: {priority}, DstPort: {dst_port}, Proto: {protocol}\n")
-                self.communication_results_text.insert(tk.END, flow_line)
-        self.communication_results_text.config(state="disabled")
+        # Flows come with the packet/byte counters read from the switches
+        self._refresh_view("flows", lambda: self.client.flows(stats=True, compact=True), self.flow_browser.update)
 
     def test_selected_service(self):
         service_to_test = self.test_service_combobox.get()
         self.test_results_text.config(state="normal")
         self.test_results_text.delete(1.0, tk.END)
         self.test_results_text.insert(tk.END, f"Running test for {service_to_test}...\n")
-        self.root.update_idletasks()
-        test_results = self.service_manager.test_service(service_to_test)
-        self.test_results_text.delete(1.0, tk.END)
-        if test_results:
-            for service_key, result in test_results.items():
-                self.test_results_text.insert(tk.END, f"Service: {service_key}\nResult:\n{result}\n\n")
-        else:
-            self.test_results_text.insert(tk.END, "No test results available.\n")
-        self.test_results_text.config(state="disabled")
\ No newline at end of file
+        self.test_results_text.config(state="disabled")
+
+        def show_results(test_results):
+            self.test_results_text.config(state="normal")
+            self.test_results_text.delete(1.0, tk.END)
+            if test_results:
+                for service_key, result in test_results.items():
+                    self.test_results_text.insert(tk.END, f"Service: {service_key}\nResult:\n{result}\n\n")
+            else:
+                self.test_results_text.insert(tk.END, "No test results available.\n")
+            self.test_results_text.config(state="disabled")
+
+        self.run_in_background(f"Testing {service_to_test}", lambda: self.client.test(service_to_test), show_results)
+
+    def show_message(self, message):
+        self.test_results_text.config(state="normal")
+        self.test_results_text.insert(tk.END, message + "\n")
+        self.test_results_text.config(state="disabled")
+
+
+def _changes(old, new):
+    # Non-equal opcodes turning old into new, last first so earlier indexes stay valid while applying them
+    return [op for op in SequenceMatcher(None, old, new).get_opcodes() if op[0] != "equal"][::-1]
+
+
+def _sync_listbox(listbox, old, new):
+    for _, i1, i2, j1, j2 in _changes(old, new):
+        if i2 > i1:
+            listbox.delete(i1, i2 - 1)
+        if j2 > j1:
+            listbox.insert(i1, *new[j1:j2])
+
+
+def _sync_text(text, old, new):
+    text.config(state="normal")
+    for _, i1, i2, j1, j2 in _changes(old, new):
+        if i2 > i1:
+            text.delete(f"{i1 + 1}.0", f"{i2 + 1}.0")
+        if j2 > j1:
+            text.insert(f"{i1 + 1}.0", "".join(line + "\n" for line in new[j1:j2]))
+    text.config(state="disabled")
@@ -0,0 +1,134 @@
+import gc
+import os
+import json
+import threading
+
+DEFAULT_STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "state")
+
+
+class DeploymentJournal:
+    """
+    Append-only journal of deploy, stop and flow events with periodic compact snapshots.
+    Every event is applied to an in-memory mirror of the deployment and appended as one
+    JSON line to journal.jsonl. Every snapshot_every events the mirror is written to
+    snapshot.json and the journal is truncated, so loading is one snapshot plus a short replay.
+    """
+    def __init__(self, state_dir=None, snapshot_every=1000):
+        self.state_dir = state_dir or DEFAULT_STATE_DIR
+        self.snapshot_path = os.path.join(self.state_dir, "snapshot.json")
+        self.journal_path = os.path.join(self.state_dir, "journal.jsonl")
+        self.snapshot_every = snapshot_every
+        self.lock = threading.Lock()
+        self.state = self._empty_state()
+        self.events_since_snapshot = 0
+        self.file = None
+        self.deferred = False  # True while a new history is only kept in memory, see reset()
+
+    @staticmethod
+    def _empty_state():
+        # instances: "service_key|instance_name": deploy fields, flows: flow key tuple: flow row
+        return {"hosts": [], "counters": {}, "instances": {}, "flows": {}}
+
+    @staticmethod
+    def apply(state, event):
+        kind = event["event"]
+        if kind == "topology":
+            state["hosts"] = event["hosts"]
+        elif kind == "counters":
+            state["counters"].update(event["counters"])
+        elif kind == "deploy":
+            state["instances"][f"{event['service_key']}|{event['app']}"] = {k: v for k, v in event.items() if k != "event"}
+        elif kind == "stop":
+            state["instances"].pop(f"{event['service_key']}|{event['app']}", None)
+        elif kind == "flow_add":
+            # The mirror shares the live row (and its key) with FlowManager instead of copying it
+            flow = event["flow"]
+            state["flows"][tuple(event["key"])] = tuple(flow) if isinstance(flow, list) else flow
+        elif kind == "flow_del":
+            state["flows"].pop(tuple(event["key"]), None)
+        else:
+            raise ValueError(f"Unknown journal event: {kind}")
+
+    def record(self, kind, **fields):
+        event = dict(fields, event=kind)
+        with self.lock:
+            self.apply(self.state, event)
+            if self.deferred:
+                return
+            if self.file is None:
+                os.makedirs(self.state_dir, exist_ok=True)
+                self.file = open(self.journal_path, "a")
+            self.file.write(json.dumps(event) + "\n")
+            self.file.flush()
+            self.events_since_snapshot += 1
+            if self.events_since_snapshot >= self.snapshot_every:
+                self._snapshot()
+
+    def snapshot(self):
+        with self.lock:
+            self._snapshot()
+
+    def _snapshot(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            # Flows are written as [key, row] pairs: JSON object keys can only be strings
+            json.dump(dict(self.state, flows=list(self.state["flows"].items())), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        # Everything journaled so far is in the snapshot
+        if self.file:
+            self.file.close()
+        self.file = open(self.journal_path, "w")
+        self.events_since_snapshot = 0
+        self.deferred = False
+
+    def load(self):
+        """
+        Returns the last recorded state: the snapshot with the journal replayed on top.
+        A torn last line (crash while appending) is ignored.
+        """
+        state = self._empty_state()
+        if os.path.exists(self.snapshot_path):
+            # Everything parsed survives until the flows are turned into tuples below: collections
+            # run during the parse would only traverse the growing lists of rows
+            enabled = gc.isenabled()
+            gc.disable()
+            try:
+                with open(self.snapshot_path) as f:
+                    state.update(json.load(f))
+                pairs = state["flows"]
+                state["flows"] = {tuple(key): tuple(flow) for key, flow in pairs}
+                del pairs
+            finally:
+                if enabled:
+                    gc.enable()
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path) as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break
+                    self.apply(state, event)
+        return state
+
+    def reset(self, persist=True):
+        """
+        Starts a new, empty history. With persist=False it is only kept in memory until the next
+        snapshot(), which replaces the history on disk in one step: until then load() still returns
+        the previous one, e.g. while it is being restored.
+        """
+        with self.lock:
+            self.state = self._empty_state()
+            if persist:
+                self._snapshot()
+            else:
+                self.deferred = True
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
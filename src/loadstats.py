@@ -0,0 +1,80 @@
+import os
+import json
+import time
+
+LOADGEN_DIR = "/shared/loadgen"
+# Histogram buckets of scripts/loadgen.py: exact below 2**SUB_BITS us, then 2**(SUB_BITS - 1) per power of two
+SUB_BITS = 7
+
+
+def read_summaries(directory=LOADGEN_DIR, service_key=None, window=None):
+    """
+    Aggregates the summaries written by the load generator apps (scripts/loadgen.py).
+    Only the load generators of service_key are read if given, and only the summaries of the
+    last window seconds. Returns {"loadgens": {"<service_key>/<instance>": {...}}, "total": {...}},
+    where each entry has its request counts, throughput, percentiles over the window and latest
+    summary, and the total merges the histograms of every load generator.
+    """
+    since = time.time() - window if window else 0
+    loadgens = {}
+    merged = {}
+    for filename in sorted(os.listdir(directory)) if os.path.isdir(directory) else []:
+        if not filename.endswith(".jsonl"):
+            continue
+        key, instance = filename[:-len(".jsonl")].split(".", 1)
+        if service_key and key != service_key:
+            continue
+        histogram = {}
+        ok = errors = 0
+        interval_s = 0.0
+        latest = None
+        with open(os.path.join(directory, filename)) as f:
+            for line in f:
+                try:
+                    summary = json.loads(line)
+                except ValueError:
+                    continue  # a line being written
+                if summary["t"] < since:
+                    continue
+                ok += summary["ok"]
+                errors += summary["errors"]
+                interval_s += summary["interval_s"]
+                _merge(histogram, summary["hist"])
+                latest = summary
+        if latest is None:
+            continue
+        _merge(merged, histogram.items())
+        latest = {name: value for name, value in latest.items() if name != "hist"}
+        loadgens[f"{key}/{instance}"] = dict(_totals(histogram, ok, errors), qps=round(ok / interval_s, 2) if interval_s else 0.0,
+                                             latest=latest)
+    total = _totals(merged, sum(l["ok"] for l in loadgens.values()), sum(l["errors"] for l in loadgens.values()))
+    # Load generators run side by side: their rates add up
+    total["qps"] = round(sum(l["qps"] for l in loadgens.values()), 2)
+    return {"loadgens": loadgens, "total": total}
+
+
+def _merge(histogram, buckets):
+    for lower_us, count in buckets:
+        histogram[lower_us] = histogram.get(lower_us, 0) + count
+
+
+def _totals(histogram, ok, errors):
+    return {"ok": ok, "errors": errors, "p50_ms": _percentile(histogram, 0.5), "p90_ms": _percentile(histogram, 0.9),
+            "p99_ms": _percentile(histogram, 0.99), "p999_ms": _percentile(histogram, 0.999)}
+
+
+def _bucket_upper(lower_us):
+    # Bound above which no sample of the bucket starting at lower_us lies
+    return lower_us + (1 << max(0, lower_us.bit_length() - SUB_BITS))
+
+
+def _percentile(histogram, q):
+    # Bucket upper bounds, as Histogram.percentile in scripts/loadgen.py: at most 1.6% above the samples
+    total = sum(histogram.values())
+    if not total:
+        return None
+    seen = 0
+    for lower_us in sorted(histogram):
+        seen += histogram[lower_us]
+        if seen >= q * total:
+            return round(_bucket_upper(lower_us) / 1000, 3)
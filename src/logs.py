@@ -0,0 +1,174 @@
+import os
+import logging
+import logging.handlers
+import selectors
+import threading
+from collections import deque
+
+
+class LogDrainer:
+    """
+    Continuously drains the stdout/stderr pipes of every deployed app.
+    A single selector thread serves all instances, so a chatty server can never
+    block on a full pipe. Output is kept in a bounded ring buffer per
+    (service_key, app_name) and can optionally be spilled to rotating files.
+    """
+    MAX_PARTIAL = 64 * 1024  # bytes kept of a line whose newline has not arrived yet
+
+    def __init__(self, max_lines=500, spill_dir=None, max_bytes=1024 * 1024, backup_count=3):
+        self.max_lines = max_lines
+        self.spill_dir = spill_dir
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.buffers = {}  # (service_key, app_name): deque of output lines
+        self.spill_loggers = {}  # (service_key, app_name): logging.Logger
+        self.lock = threading.Lock()
+        self.selector = selectors.DefaultSelector()
+        self.pending = []  # (op, key, stream_name, file object) applied by the drain thread
+        self.partial = {}  # fd: bytes received after the last newline
+        self.thread = None
+        self.running = False
+        # Self-pipe used to wake the selector when (un)registrations are queued
+        self._wake_r, self._wake_w = os.pipe()
+        os.set_blocking(self._wake_r, False)
+        self.selector.register(self._wake_r, selectors.EVENT_READ, None)
+
+    def register(self, service_key, app_name, process):
+        """
+        Starts draining the pipes of a (re)started process. The ring buffer of the
+        instance is kept across restarts so crash output stays visible.
+        """
+        key = (service_key, app_name)
+        with self.lock:
+            if key not in self.buffers:
+                self.buffers[key] = deque(maxlen=self.max_lines)
+            for stream_name in ("stdout", "stderr"):
+                stream = getattr(process, stream_name, None)
+                if stream is not None:
+                    self.pending.append(("add", key, stream_name, stream))
+        self._ensure_running()
+        self._wake()
+
+    def forget(self, service_key, app_name):
+        """
+        Drops the buffer of a stopped instance. Late output still sitting in its pipes is discarded.
+        """
+        key = (service_key, app_name)
+        with self.lock:
+            self.buffers.pop(key, None)
+            spill_logger = self.spill_loggers.pop(key, None)
+        if spill_logger:
+            for handler in list(spill_logger.handlers):
+                handler.close()
+                spill_logger.removeHandler(handler)
+
+    def tail(self, service_key, app_name, lines=50):
+        """
+        Returns the last `lines` lines captured for an instance.
+        """
+        with self.lock:
+            buf = self.buffers.get((service_key, app_name))
+            if not buf:
+                return []
+            return list(buf)[-lines:]
+
+    def stop(self):
+        self.running = False
+        self._wake()
+        if self.thread:
+            self.thread.join(timeout=1)
+
+    def _ensure_running(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._drain_loop, name="log-drainer", daemon=True)
+        self.thread.start()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b"\0")
+        except (BlockingIOError, OSError):
+            pass
+
+    def _apply_pending(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        for op, key, stream_name, stream in pending:
+            if op == "add":
+                try:
+                    fd = stream.fileno()
+                    os.set_blocking(fd, False)
+                    self.selector.register(fd, selectors.EVENT_READ, (key, stream_name, stream))
+                except (ValueError, OSError, KeyError) as e:
+                    print(f"[ERROR] Cannot drain {stream_name} of {key[0]}-{key[1]}: {e}")
+
+    def _drain_loop(self):
+        while self.running:
+            for sel_key, _ in self.selector.select(timeout=1.0):
+                if sel_key.data is None:
+                    try:
+                        while os.read(self._wake_r, 4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                self._read_ready(sel_key.fd, *sel_key.data)
+            self._apply_pending()
+
+    def _read_ready(self, fd, key, stream_name, stream):
+        try:
+            chunk = os.read(fd, 65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            chunk = b""
+        if not chunk:
+            # EOF: the process exited or was killed, flush what is left and close the pipe
+            rest = self.partial.pop(fd, b"")
+            if rest:
+                self._store(key, stream_name, [rest])
+            self.selector.unregister(fd)
+            try:
+                stream.close()
+            except OSError:
+                pass
+            return
+        data = self.partial.pop(fd, b"") + chunk
+        lines = data.split(b"\n")
+        if len(lines[-1]) >= self.MAX_PARTIAL:
+            # An app writing without newlines: flush what it wrote so far as a line of its own
+            lines.append(b"")
+        elif lines[-1]:
+            self.partial[fd] = lines[-1]
+        self._store(key, stream_name, lines[:-1])
+
+    def _store(self, key, stream_name, raw_lines):
+        prefix = "[stderr] " if stream_name == "stderr" else ""
+        text_lines = [prefix + line.decode(errors="replace") for line in raw_lines]
+        with self.lock:
+            buf = self.buffers.get(key)
+            if buf is None:
+                return
+            buf.extend(text_lines)
+        if self.spill_dir:
+            spill_logger = self._get_spill_logger(key)
+            for line in text_lines:
+                spill_logger.info(line)
+
+    def _get_spill_logger(self, key):
+        spill_logger = self.spill_loggers.get(key)
+        if spill_logger is None:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            spill_logger = logging.getLogger(f"applog.{key[0]}.{key[1]}")
+            spill_logger.propagate = False
+            spill_logger.setLevel(logging.INFO)
+            handler = logging.handlers.RotatingFileHandler(
+                os.path.join(self.spill_dir, f"{key[0]}.{key[1]}.log"),
+                maxBytes=self.max_bytes, backupCount=self.backup_count
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            spill_logger.addHandler(handler)
+            with self.lock:
+                self.spill_loggers[key] = spill_logger
+        return spill_logger
@@ -1,28 +1,70 @@
+import argparse
 from network import NetworkManager
+from topology import DEFAULT_TIERS
+from api import DEFAULT_SOCKET
 
-if __name__ == "__main__":
-    print("Select the topology type:")
-    print("1. Simple")
-    print("2. Complex")
-    choice = input("Enter the number of your choice: ")
 
-    if choice == "1":
-        topology_type = "simple"
-    elif choice == "2":
-        topology_type = "complex"
-    else:
-        print("[ERROR] Invalid choice. Exiting.")
-        exit(1)
+def parse_link(value):
+    # TIER=BW[,DELAY], e.g. core=1000,1ms
+    try:
+        tier, params = value.split("=", 1)
+        bw, _, delay = params.partition(",")
+        link = {"bw": float(bw)}
+        if delay:
+            link["delay"] = delay
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid link spec '{value}', expected TIER=BW[,DELAY]")
+    if tier not in DEFAULT_TIERS:
+        raise argparse.ArgumentTypeError(f"Unknown link tier '{tier}', choose from {', '.join(DEFAULT_TIERS)}")
+    return tier, link
+
 
-    print("Select the link layout:")
-    print("1. Ring ")
-    print("2. Linear")
-    layout_choice = input("Enter the number of your choice: ")
+def parse_args():
+    parser = argparse.ArgumentParser(description="Deploy and manage services on an SDN network emulated with Mininet.")
+    parser.add_argument("--topology", choices=["simple", "complex", "ring", "linear", "fat-tree", "leaf-spine"], default="simple",
+                        help="simple (6 hosts, 4 switches) and complex (19 hosts, 7 switches) are presets, the others are generated")
+    parser.add_argument("--layout", choices=["ring", "linear"], default="ring", help="switch layout of the simple/complex presets")
+    parser.add_argument("--hosts", type=int, default=6, help="hosts of a ring/linear topology")
+    parser.add_argument("--switches", type=int, default=4, help="switches of a ring/linear topology")
+    parser.add_argument("--k", type=int, default=4, help="fat-tree arity (k^3/4 hosts)")
+    parser.add_argument("--leaves", type=int, default=4, help="leaf switches of a leaf-spine topology")
+    parser.add_argument("--spines", type=int, default=2, help="spine switches of a leaf-spine topology")
+    parser.add_argument("--hosts-per-leaf", type=int, default=4, help="hosts per leaf switch of a leaf-spine topology")
+    parser.add_argument("--link", type=parse_link, action="append", default=[], metavar="TIER=BW[,DELAY]",
+                        help=f"bandwidth (Mbit/s) and delay of a link tier ({', '.join(DEFAULT_TIERS)}), repeatable")
+    parser.add_argument("--runtime", choices=["popen", "zygote"], default="popen",
+                        help="popen starts a fresh interpreter per app, zygote forks apps from a pre-warmed process per host")
+    parser.add_argument("--autoscale", action="store_true", help="enable replica autoscaling")
+    parser.add_argument("--qos", action="store_true",
+                        help="enforce the QoS classes of services.json with OVS queues and OpenFlow meters")
+    parser.add_argument("--host-cpu", type=float, metavar="FRACTION",
+                        help="make hosts CPU-limited, each getting this fraction of the machine's CPU time (implies --app-cgroups)")
+    parser.add_argument("--app-cgroups", action="store_true",
+                        help="run every app in its own cgroup with the CPU/memory limits of services.json and report its usage")
+    parser.add_argument("--restore", action="store_true", help="restore the previous deployment")
+    parser.add_argument("--backend", choices=["mininet", "fake"], default="mininet",
+                        help="fake runs the network, controller and apps as in-process stand-ins (no root needed)")
+    parser.add_argument("--metrics-file", help="write Prometheus-format metrics of the deploy pipeline to this file")
+    parser.add_argument("--metrics-port", type=int, help="serve Prometheus-format metrics on http://127.0.0.1:PORT/metrics")
+    parser.add_argument("--api-socket", default=DEFAULT_SOCKET, help="Unix socket of the control API used by the GUI and cadctl")
+    parser.add_argument("--api-port", type=int, help="also serve the control API on http://127.0.0.1:PORT")
+    parser.add_argument("--startup-timeout", type=float, default=60, help="seconds to wait for the controller and switches")
+    return parser.parse_args()
 
-    if layout_choice == "2":
-        link_type = "linear"
-    else:
-        link_type = "ring"  
 
-    network_manager = NetworkManager(topology_type, link_type=link_type)
-    network_manager.start_network()
\ No newline at end of file
+if __name__ == "__main__":
+    args = parse_args()
+    topology_params = {
+        "ring": {"hosts": args.hosts, "switches": args.switches},
+        "linear": {"hosts": args.hosts, "switches": args.switches},
+        "fat-tree": {"k": args.k},
+        "leaf-spine": {"leaves": args.leaves, "spines": args.spines, "hosts_per_leaf": args.hosts_per_leaf},
+    }.get(args.topology, {})
+
+    network_manager = NetworkManager(args.topology, link_type=args.layout, runtime=args.runtime, autoscale=args.autoscale,
+                                     restore=args.restore, startup_timeout=args.startup_timeout,
+                                     topology_params=topology_params, tiers=dict(args.link), backend=args.backend,
+                                     metrics_file=args.metrics_file, metrics_port=args.metrics_port,
+                                     api_socket=args.api_socket, api_port=args.api_port, qos=args.qos,
+                                     host_cpu=args.host_cpu, app_cgroups=args.app_cgroups)
+    network_manager.start_network()
@@ -0,0 +1,227 @@
+import os
+import json
+import time
+import bisect
+import inspect
+import functools
+import threading
+from collections import deque, OrderedDict
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "cad_"
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_DISABLED = nullcontext()
+
+
+class _Span:
+    __slots__ = ("metrics", "phase", "service_key", "start")
+
+    def __init__(self, metrics, phase, service_key):
+        self.metrics = metrics
+        self.phase = phase
+        self.service_key = service_key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics._end_span(self, time.perf_counter() - self.start, exc_type is None)
+        return False
+
+
+class Metrics:
+    """
+    In-memory spans, counters and histograms for the deploy pipeline, exported in the
+    Prometheus text format to a file and/or a local HTTP endpoint (/metrics, plus
+    /traces?service_key=... with the recent spans of a service as JSON).
+    Disabled by default: span() then returns a shared no-op context manager and the
+    other calls return immediately.
+    """
+    def __init__(self, max_traced_services=1000, spans_per_service=100):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.counters = {}  # (name, labels): value
+        self.histograms = {}  # (name, labels): [bucket counts..., +Inf count, sum]
+        self.traces = OrderedDict()  # service_key: deque of spans, least recently used first
+        self.max_traced_services = max_traced_services
+        self.spans_per_service = spans_per_service
+        self.server = None
+        self.exporter = None
+        self.stop_event = threading.Event()
+
+    def enable(self):
+        self.enabled = True
+
+    def span(self, phase, service_key=None):
+        """
+        Times a phase of the pipeline: with metrics.span("spawn", service_key): ...
+        """
+        if not self.enabled:
+            return _DISABLED
+        return _Span(self, phase, service_key)
+
+    def timed(self, phase, key=None):
+        """
+        Decorator timing every call of a function as a span. key names the argument holding
+        the service_key, or is a function of the bound arguments returning it.
+        """
+        def decorator(func):
+            signature = inspect.signature(func)
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                service_key = None
+                if key is not None:
+                    bound = signature.bind(*args, **kwargs).arguments
+                    service_key = key(bound) if callable(key) else bound.get(key)
+                with _Span(self, phase, service_key):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def inc(self, name, value=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self._observe(key, value)
+
+    def _observe(self, key, value):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [0] * (len(BUCKETS) + 2)
+        histogram[bisect.bisect_left(BUCKETS, value)] += 1
+        histogram[-1] += value
+
+    def _end_span(self, span, seconds, ok):
+        with self.lock:
+            self._observe(("phase_duration_seconds", (("phase", span.phase),)), seconds)
+            if not ok:
+                key = ("phase_failures_total", (("phase", span.phase),))
+                self.counters[key] = self.counters.get(key, 0) + 1
+            if span.service_key is None:
+                return
+            spans = self.traces.pop(span.service_key, None) or deque(maxlen=self.spans_per_service)
+            spans.append({"phase": span.phase, "start": time.time() - seconds, "seconds": seconds, "ok": ok})
+            self.traces[span.service_key] = spans
+            if len(self.traces) > self.max_traced_services:
+                self.traces.popitem(last=False)
+
+    def trace(self, service_key):
+        with self.lock:
+            return list(self.traces.get(service_key, ()))
+
+    def render(self):
+        """
+        All counters and histograms in the Prometheus text exposition format.
+        """
+        with self.lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(values)) for key, values in self.histograms.items())
+        lines = []
+        typed = set()
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {PREFIX}{name} counter")
+                typed.add(name)
+            lines.append(f"{PREFIX}{name}{_labels(labels)} {value}")
+        for (name, labels), values in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {PREFIX}{name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), values[:-1]):
+                cumulative += count
+                lines.append(f"{PREFIX}{name}_bucket{_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_labels(labels)} {values[-1]:.6f}")
+            lines.append(f"{PREFIX}{name}_count{_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        # Written next to the target and renamed, so scrapers never read a partial file
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+    def start_export(self, path=None, port=None, interval=5.0):
+        """
+        Enables metrics and exports them every interval seconds to path and/or on http://127.0.0.1:port/metrics.
+        """
+        self.enable()
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+            def export_loop():
+                while not self.stop_event.wait(interval):
+                    self._write_quietly(path)
+                self._write_quietly(path)
+
+            self.exporter = threading.Thread(target=export_loop, name="metrics-export", daemon=True)
+            self.exporter.start()
+            print(f"[INFO] Writing metrics to {path} every {interval:.0f}s")
+        if port is not None:
+            self.server = ThreadingHTTPServer(("127.0.0.1", port), self._handler_class())
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+            print(f"[INFO] Serving metrics on http://127.0.0.1:{self.server.server_address[1]}/metrics")
+
+    def _write_quietly(self, path):
+        try:
+            self.write(path)
+        except OSError as e:
+            print(f"[ERROR] Failed to write metrics to {path}: {e}")
+
+    def stop_export(self):
+        self.stop_event.set()
+        if self.exporter:
+            self.exporter.join(timeout=2)
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def _handler_class(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path, _, query = self.path.partition("?")
+                if path == "/metrics":
+                    body, content_type = metrics.render().encode(), "text/plain; version=0.0.4"
+                elif path == "/traces":
+                    params = dict(part.split("=", 1) for part in query.split("&") if "=" in part)
+                    body, content_type = json.dumps(metrics.trace(params.get("service_key"))).encode(), "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+# Process-wide registry shared by the managers
+metrics = Metrics()
@@ -1,124 +1,250 @@
-from mininet.net import Mininet
-from mininet.node import RemoteController, OVSKernelSwitch
-from mininet.log import setLogLevel, info
-from mininet.link import TCLink
-from mininet.cli import CLI
+try:
+    from mininet.net import Mininet
+    from mininet.node import Host, CPULimitedHost, RemoteController, OVSKernelSwitch
+    from mininet.util import custom
+    from mininet.log import setLogLevel, info
+    from mininet.link import TCLink
+    from mininet.cli import CLI
+except ImportError:
+    # Without Mininet only the in-process backend is available
+    Mininet = Host = CPULimitedHost = RemoteController = OVSKernelSwitch = TCLink = CLI = custom = None
+
+    def setLogLevel(level):
+        pass
+
+    def info(message):
+        print(message, end="")
 from gui import ServiceDeployGUI
 from services import ServiceManager
 import threading
 import tkinter as tk
 import os
 import time
-
-class MyTopo:
-    """
-    Defines a simple SDN topology with multiple switches and standard hosts.
-    Each host is connected to a switch and switches are connected in a ring.
-    """
-    def build(self, net, num_hosts, num_switches, bw_h, bw_s, link_type="ring"):
-        switches = []
-        for i in range(1, num_switches + 1):
-            switches.append(net.addSwitch(f"s{i}"))
-
-        for i in range(1, num_hosts + 1):
-            net.addHost(f"h{i}")
-
-        for i in range(1, num_hosts + 1):
-            host = net.get(f"h{i}")
-            net.addLink(host, switches[(i - 1) % num_switches], cls=TCLink, bw=bw_h, delay="10ms")
-
-        if link_type == "ring":
-            for i in range(num_switches):
-                net.addLink(switches[i], switches[(i + 1) % num_switches], cls=TCLink, bw=bw_s, delay="5ms")
-        elif link_type == "linear":
-            for i in range(num_switches - 1):
-                net.addLink(switches[i], switches[i + 1], cls=TCLink, bw=bw_s, delay="5ms")
-        else:
-            raise ValueError("Invalid link_type: choose 'ring' or 'linear'")
-
-
-def build_topology(topology_type, net, link_type="ring"):
-    topo = MyTopo()
-    if topology_type == "simple":
-        topo.build(net, num_hosts=6, num_switches=4, bw_h=50, bw_s=100, link_type=link_type)
-    elif topology_type == "complex":
-        topo.build(net, num_hosts=19, num_switches=7, bw_h=100, bw_s=150, link_type=link_type)
-    else:
-        raise ValueError(f"Unknown topology type: {topology_type}")
-
+import shutil
+import hashlib
+import requests
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from catalog import SCRIPTS_DIR
+from topology import build_topology, PREFIX_LEN
+from fakenet import FakeNet
+from ryu_stub import RyuStub
+from metrics import metrics
+from api import ControlServer, ControlClient, DEFAULT_SOCKET
 
 class NetworkManager:
     """
-    Manages the Mininet network, Ryu controller and service deployment GUI.
+    Manages the Mininet network, Ryu controller, control API and service deployment GUI.
+    The "fake" backend replaces Mininet and Ryu with the in-process FakeNet and RyuStub.
     """
-    def __init__(self, topology_type, link_type="ring"):
+    def __init__(self, topology_type, link_type="ring", runtime="popen", autoscale=False, restore=False,
+                 ryu_api_url="http://localhost:8080", startup_timeout=60, topology_params=None, tiers=None, backend="mininet",
+                 state_dir=None, metrics_file=None, metrics_port=None, api_socket=DEFAULT_SOCKET, api_port=None, qos=False,
+                 host_cpu=None, app_cgroups=False):
         self.topology_type = topology_type
         self.link_type = link_type
+        self.topology_params = topology_params or {}  # sizes of generated topologies (hosts, switches, k, leaves, ...)
+        self.tiers = tiers  # per-tier link bandwidth/delay overrides
+        self.addresses = {}  # host name: IP from the topology's addressing plan
+        self.autoscale = autoscale
+        self.restore = restore
+        self.backend = backend
+        self.ryu_stub = RyuStub() if backend == "fake" else None
+        self.ryu_api_url = self.ryu_stub.url if self.ryu_stub else ryu_api_url
+        self.startup_timeout = startup_timeout  # seconds to wait for the controller and for each readiness check
+        self.timings = []  # (phase, seconds) of the last startup
+        self.metrics_file = metrics_file  # Prometheus text file, rewritten periodically
+        self.metrics_port = metrics_port  # local HTTP port serving /metrics
+        self.api_socket = api_socket  # Unix socket of the control API
+        self.api_port = api_port  # local TCP port of the control API
+        self.control_api = None
         self.net = None
-        self.service_manager = ServiceManager()
+        self.service_manager = ServiceManager(runtime=runtime, ryu_api_url=self.ryu_api_url, state_dir=state_dir)
+        # Per-class queues and meters on the switches, set up as service flows are installed
+        self.qos = qos
+        if qos:
+            self.service_manager.enable_qos()
+        # Fraction of the machine's CPU time each host gets (Mininet CPULimitedHost), None for unlimited hosts
+        self.host_cpu = host_cpu
+        if host_cpu or app_cgroups:
+            # Apps in their own cgroups; on CPU-limited hosts placement also respects each host's CPU budget
+            self.service_manager.enable_cgroups({"cpu": host_cpu * (os.cpu_count() or 1)} if host_cpu else None)
         self.flow_modification_queue = self.service_manager.get_flow_queue()
 
     def start_network(self):
         """
         Starts the Mininet network and Ryu controller.
         """
+        try:
+            self.bring_up()
+            # Watch deployed apps and restart them when they crash
+            self.service_manager.start_supervisor(self.net)
+            if self.autoscale:
+                self.service_manager.start_autoscaler(self.net)
+            # Deploy colab on all hosts, or only fill the slots left free by a restored deployment
+            if self.service_manager.service_instances:
+                self.service_manager.try_redeploy_colab(self.net)
+            else:
+                self.service_manager.deploy_colab_on_all_hosts(self.net)
+            # The GUI, cadctl and scripts all drive the services through the control API
+            self.control_api = ControlServer(self.service_manager, self.net, socket_path=self.api_socket, port=self.api_port)
+            self.control_api.start()
+            info("[INFO] Starting GUI...\n")
+            self.start_gui()
+
+            if self.backend == "fake":
+                input("[INFO] Fake network running, press Enter to stop...\n")
+            else:
+                info("[INFO] Starting Mininet CLI...\n")
+                CLI(self.net)
+                info("[INFO] Mininet CLI stopped...\n")
+            
+        except Exception as e:
+            print(f"[ERROR] An error occurred: {e}")
+        finally:
+            self.stop_network() 
+
+    def bring_up(self):
+        """
+        Builds and starts the network, waits for the switches and provisions the hosts,
+        without starting the GUI. Returns the network.
+        """
         setLogLevel("info")
+        if self.metrics_file or self.metrics_port is not None:
+            metrics.start_export(self.metrics_file, self.metrics_port)
         self.service_manager.clean_shared_folder() 
-
-        try:
-            time.sleep(5)
+        self.timings = []
+        startup = time.time()
+        if self.ryu_stub:
+            self.ryu_stub.start()
+        with self._phase("controller"):
+            self._wait_for_controller()
+        if self.backend == "fake":
+            self.net = FakeNet(ryu_stub=self.ryu_stub)
+            controller = None
+        else:
             # Initialize Mininet with a remote controller and OVS switches
             controller = RemoteController("c1", ip="127.0.0.1", port=6653)
-            self.net = Mininet(switch=OVSKernelSwitch, link=TCLink, build=False)
-            
-            info("[INFO] Building network topology...\n")
-            build_topology(self.topology_type, self.net, link_type=self.link_type)
+            # CPU-limited hosts get a cgroup with a CFS quota of host_cpu of the machine
+            host = custom(CPULimitedHost, cpu=self.host_cpu) if self.host_cpu else Host
+            self.net = Mininet(host=host, switch=OVSKernelSwitch, link=TCLink, build=False)
+        
+        info("[INFO] Building network topology...\n")
+        with self._phase("build"):
+            self.addresses = build_topology(self.topology_type, self.net, link_type=self.link_type,
+                                            tiers=self.tiers, **self.topology_params)
             self.net.addController(controller) 
 
-            info("[INFO] Starting the network...\n")
+        info("[INFO] Starting the network...\n")
+        with self._phase("start"):
             self.net.start()
-            time.sleep(20)
-            info("[INFO] Network started...\n")
+        with self._phase("switches"):
+            self._wait_for_switches()
+        info("[INFO] Network started...\n")
+        with self._phase("hosts"):
             self._configure_hosts()
-            info("[INFO] Starting GUI...\n")
-            self.start_gui()
+        # Bring back the previous run's services and flows, or start a new deployment history
+        if self.restore:
+            with self._phase("restore"):
+                self.service_manager.restore(self.net)
+        else:
+            self.service_manager.record_topology(self.net)
+        breakdown = ", ".join(f"{phase} {seconds:.2f}s" for phase, seconds in self.timings)
+        info(f"[INFO] Startup took {time.time() - startup:.2f}s ({breakdown})\n")
+        return self.net
 
-            info("[INFO] Starting Mininet CLI...\n")
-            CLI(self.net)
-            info("[INFO] Mininet CLI stopped...\n")
-            
-        except Exception as e:
-            print(f"[ERROR] An error occurred: {e}")
+    @contextmanager
+    def _phase(self, name):
+        start = time.time()
+        try:
+            yield
         finally:
-            self.stop_network() 
+            self.timings.append((name, time.time() - start))
+            metrics.observe("startup_phase_seconds", time.time() - start, phase=name)
+
+    def _connected_switches(self):
+        metrics.inc("rest_requests_total", endpoint="switches")
+        response = requests.get(f"{self.ryu_api_url}/stats/switches", timeout=2)
+        response.raise_for_status()
+        return set(response.json())
+
+    def _wait_for_controller(self, interval=0.1):
+        """
+        Waits until the Ryu REST API answers.
+        """
+        deadline = time.time() + self.startup_timeout
+        while True:
+            try:
+                self._connected_switches()
+                return
+            except (requests.exceptions.RequestException, ValueError) as e:
+                if time.time() >= deadline:
+                    raise RuntimeError(f"Ryu controller not reachable at {self.ryu_api_url} after {self.startup_timeout}s: {e}")
+            time.sleep(interval)
+
+    def _wait_for_switches(self, interval=0.1):
+        """
+        Waits until every switch of the topology has connected to the controller.
+        """
+        expected = {int(switch.dpid, 16): switch.name for switch in self.net.switches}
+        deadline = time.time() + self.startup_timeout
+        missing = set(expected)
+        while True:
+            try:
+                missing = set(expected) - self._connected_switches()
+            except (requests.exceptions.RequestException, ValueError):
+                pass
+            if not missing:
+                info(f"[INFO] All {len(expected)} switches connected to the controller\n")
+                return
+            if time.time() >= deadline:
+                names = ", ".join(sorted(expected[dpid] for dpid in missing))
+                raise RuntimeError(f"Switches not connected to the controller after {self.startup_timeout}s: {names}")
+            time.sleep(interval)
 
     def _configure_hosts(self):
         """
         Configures IP addresses for hosts and ensures necessary scripts are accessible.
         """
-        for i, host in enumerate(self.net.hosts):
-            # Assign IPs based on their order, starting from 10.0.0.1
-            host.setIP(f"10.0.0.{i+1}") 
-            info(f"[INFO] Configured host {host.name} with IP {host.IP()}\n")
-            
-            # Ensure the /shared/scripts directory exists on each host
-            host.cmd("mkdir -p /shared/scripts") 
-
-            # Copy application scripts to each host's /shared/scripts directory
-            # to use host.cmd() later
-            script_dir = os.path.join(os.path.dirname(__file__), "scripts")
-            if not os.path.exists(script_dir):
-                print(f"[WARNING] Script directory not found at {script_dir}. Services might fail to deploy.")
-                # Create a dummy script directory if it doesn't exist to prevent errors
-                os.makedirs(script_dir, exist_ok=True)
-            
-            for script_file in os.listdir(script_dir):
-                if script_file.endswith(".py"):
-                    src_path = os.path.join(script_dir, script_file)
-                    dst_path = os.path.join("/shared/scripts", script_file)
-                    # Use 'cp' command on the host to copy the script
-                    host.cmd(f"cp {src_path} {dst_path}") 
-                    info(f"[INFO] Copied {script_file} to {host.name}:{dst_path}\n")
+        # Mininet hosts share the root filesystem: sync the scripts to /shared/scripts once for all hosts.
+        # Fake hosts do not run the scripts.
+        if self.backend != "fake":
+            self._sync_scripts()
+
+        def set_ip(host):
+            # Addresses follow the topology's hierarchical plan: one /24 per edge switch
+            host.setIP(self.addresses[host.name], prefixLen=PREFIX_LEN)
+            return host
+
+        # Each host has its own shell, so they can be configured in parallel
+        with ThreadPoolExecutor(max_workers=min(32, len(self.net.hosts)) or 1) as executor:
+            for host in executor.map(set_ip, self.net.hosts):
+                info(f"[INFO] Configured host {host.name} with IP {host.IP()}\n")
+
+    def _sync_scripts(self, dst_dir=SCRIPTS_DIR):
+        """
+        Copies the application scripts to dst_dir, skipping the ones whose content is already up to date.
+        """
+        script_dir = os.path.join(os.path.dirname(__file__), "scripts")
+        if not os.path.exists(script_dir):
+            print(f"[WARNING] Script directory not found at {script_dir}. Services might fail to deploy.")
+            # Create a dummy script directory if it doesn't exist to prevent errors
+            os.makedirs(script_dir, exist_ok=True)
+        os.makedirs(dst_dir, exist_ok=True)
+        copied = 0
+        for script_file in sorted(os.listdir(script_dir)):
+            if not script_file.endswith(".py"):
+                continue
+            src_path = os.path.join(script_dir, script_file)
+            dst_path = os.path.join(dst_dir, script_file)
+            if os.path.exists(dst_path) and _file_digest(dst_path) == _file_digest(src_path):
+                continue
+            # Copy next to the target and rename, so a host never sees a half-written script
+            tmp_path = dst_path + ".tmp"
+            shutil.copyfile(src_path, tmp_path)
+            os.replace(tmp_path, dst_path)
+            copied += 1
+        info(f"[INFO] Synced scripts to {dst_dir} ({copied} updated)\n")
 
     def start_gui(self):
         """
@@ -126,8 +252,8 @@ class NetworkManager:
         """
         def gui_thread():
             root = tk.Tk()
-            # Pass the network object and the flow modification queue to the GUI
-            ServiceDeployGUI(root, self.net, self.flow_modification_queue) 
+            # The GUI is a client of the control API, like cadctl
+            ServiceDeployGUI(root, ControlClient(self.control_api.address))
             info("[INFO] GUI started...\n")
             root.mainloop()
         
@@ -138,10 +264,22 @@ class NetworkManager:
         Stops the Mininet network and cleans up resources.
         """
         print("[INFO] Stopping the network...")
+        if self.control_api:
+            self.control_api.stop()
+        self.service_manager.shutdown()
+        metrics.stop_export()
         if self.net:
             self.net.stop() 
-        print("[INFO] Stopping the manager...")
-        os.system("sudo mn -c") 
+        if self.service_manager.cgroups:
+            self.service_manager.cgroups.cleanup()
+        if self.ryu_stub:
+            self.ryu_stub.stop()
+        else:
+            print("[INFO] Stopping the manager...")
+            os.system("sudo mn -c") 
+            if self.qos:
+                # QoS and queue records outlive the switch ports they were set on
+                os.system("sudo ovs-vsctl -- --all destroy QoS -- --all destroy Queue")
 
         print("[INFO] Cleaning up the /shared folder...")
         self.service_manager.clean_shared_folder() 
@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+import requests
+from metrics import metrics
+
+# Rate of ports whose link has no bandwidth limit (Mbit/s)
+DEFAULT_PORT_RATE = 1000
+# Meter burst, in milliseconds of traffic at the metered rate
+METER_BURST_MS = 100
+
+
+class QosManager:
+    """
+    Performance isolation between the service classes of the catalog, enforced on the switches.
+
+    Every class has an OVS queue on each switch port its flows leave through: a linux-htb class
+    guaranteed min_rate, capped at max_rate (or the link rate) and served by priority, so a
+    critical service keeps its share of a link that best-effort traffic saturates. Classes
+    with a max_rate also get an OpenFlow meter on the switches where their traffic enters the
+    network, which drops the excess before it reaches the shared links. FlowManager asks for
+    the queue and meter of each flow it installs; they are set up on a switch or port the
+    first time a flow needs them.
+    """
+    def __init__(self, catalog, ryu_api_url='http://localhost:8080'):
+        self.catalog = catalog
+        self.ryu_api_url = ryu_api_url
+        self.classes = catalog.qos_classes
+        # Meter IDs follow the queue IDs, only classes with a max_rate are metered
+        self.meter_ids = {name: spec["queue"] for name, spec in self.classes.items() if spec["max_rate"]}
+        self.lock = threading.Lock()
+        self.ports = set()  # (switch name, port) with queues
+        self.meters = {}  # dpid: {meter ID: installed}
+
+    def flow_qos(self, switch, intf, service_key, ingress):
+        """
+        Queue and meter for a flow of service_key leaving switch through intf, {"queue_id", "meter_id"}
+        (None if the service is unclassified, or the queues or the meter could not be set up). ingress is
+        True on the switch where the flow enters the network.
+        """
+        qos_class = self.catalog.qos_class(service_key.rsplit("-", 1)[0])
+        if qos_class is None:
+            return {"queue_id": None, "meter_id": None}
+        class_name, spec = qos_class
+        queue_id = spec["queue"]
+        if intf is not None and not self._ensure_queues(switch, intf):
+            queue_id = None
+        meter_id = self.meter_ids.get(class_name) if ingress else None
+        if meter_id and not self._ensure_meters(switch).get(meter_id):
+            meter_id = None
+        return {"queue_id": queue_id, "meter_id": meter_id}
+
+    def _ensure_queues(self, switch, intf):
+        # True once the port has its queues. A failed setup is retried by the port's next flow.
+        port = switch.ports[intf]
+        # Also serializes the commands: a switch's shell must not be driven from several threads
+        with self.lock:
+            if (switch.name, port) in self.ports:
+                return True
+            params = getattr(intf, "params", None) or {}
+            start = time.perf_counter()
+            output = switch.cmd(self.queue_command(intf.name, params.get("bw"), params.get("delay")))
+            metrics.observe("qos_setup_seconds", time.perf_counter() - start, kind="queues")
+            if "QOS_FAILED" not in (output or ""):
+                self.ports.add((switch.name, port))
+                return True
+        print(f"[ERROR] Failed to set up the QoS queues of {intf.name}: {(output or '').strip()}")
+        return False
+
+    def queue_command(self, intf_name, bw=None, delay=None):
+        """
+        Shell command giving intf_name one linux-htb queue per class (queue 0 for unclassified traffic).
+        Setting QoS on an OVS port replaces the link's root qdisc, so the link delay is added back
+        as a netem qdisc below every queue.
+        """
+        rate = bw or DEFAULT_PORT_RATE
+        # Guarantees beyond the link rate are scaled down to fit in it
+        guaranteed = sum(spec["min_rate"] for spec in self.classes.values())
+        scale = min(1.0, rate / guaranteed) if guaranteed else 1.0
+        queues = {0: {"max-rate": rate}}
+        for spec in self.classes.values():
+            queues[spec["queue"]] = {"min-rate": spec["min_rate"] * scale, "max-rate": min(spec["max_rate"] or rate, rate),
+                                     "priority": spec["priority"]}
+        command = [f"ovs-vsctl -- set port {intf_name} qos=@qos -- --id=@qos create qos type=linux-htb "
+                   f"other-config:max-rate={int(rate * 1e6)} " + " ".join(f"queues:{q}=@q{q}" for q in queues)]
+        for q, config in queues.items():
+            options = " ".join(f"other-config:{key}={int(value * 1e6) if key.endswith('rate') else value}"
+                               for key, value in config.items() if value or key == "priority")
+            command.append(f"-- --id=@q{q} create queue {options}")
+        command = [" ".join(command) + " > /dev/null"]
+        if delay:
+            # OVS numbers the htb classes of queue q 1:(q + 1)
+            command += [f"tc qdisc add dev {intf_name} parent 1:{q + 1:x} handle {q + 10:x}: netem delay {delay}"
+                        for q in queues]
+        return " && ".join(command) + " || echo QOS_FAILED"
+
+    def _ensure_meters(self, switch):
+        dpid = int(switch.dpid, 16) if isinstance(switch.dpid, str) else switch.dpid
+        with self.lock:
+            if dpid not in self.meters:
+                start = time.perf_counter()
+                self.meters[dpid] = self._install_meters(dpid)
+                metrics.observe("qos_setup_seconds", time.perf_counter() - start, kind="meters")
+            return self.meters[dpid]
+
+    def _install_meters(self, dpid):
+        """
+        Adds the class meters on a switch that supports them, returns {meter ID: installed}. Ryu answers
+        a meter add before the switch has processed it, and a flow referring to a meter the switch
+        rejected is rejected too, so only the meters the switch reports afterwards count as installed.
+        """
+        if not self.meter_ids:
+            return {}
+        features = self._read_stats("meterfeatures", dpid)
+        if not features or features[0].get("max_meter", 0) < max(self.meter_ids.values()) \
+                or "DROP" not in features[0].get("band_types", []):
+            print(f"[WARNING] DPID {dpid} does not support meters, its classes are only queued there")
+            return dict.fromkeys(self.meter_ids.values(), False)
+        for name, meter_id in self.meter_ids.items():
+            self._add_meter(dpid, meter_id, self.classes[name]["max_rate"])
+        installed = {entry.get("meter_id") for entry in self._read_stats("meter", dpid) or []}
+        for meter_id in set(self.meter_ids.values()) - installed:
+            print(f"[WARNING] DPID {dpid} did not install meter {meter_id}, its class is not policed there")
+        return {meter_id: meter_id in installed for meter_id in self.meter_ids.values()}
+
+    def _read_stats(self, kind, dpid):
+        # Entries of GET /stats/<kind>/<dpid>, None if the request failed
+        metrics.inc("rest_requests_total", endpoint=kind)
+        try:
+            response = requests.get(f"{self.ryu_api_url}/stats/{kind}/{dpid}", timeout=2)
+            response.raise_for_status()
+            return response.json().get(str(dpid), [])
+        except (requests.exceptions.RequestException, ValueError) as e:
+            metrics.inc("rest_failures_total", endpoint=kind)
+            print(f"[WARNING] Failed to read the {kind} of DPID {dpid}: {e}")
+            return None
+
+    def _add_meter(self, dpid, meter_id, max_rate):
+        rate_kbps = int(max_rate * 1000)
+        meter_entry = {
+            "dpid": dpid,
+            "flags": ["KBPS", "BURST"],
+            "meter_id": meter_id,
+            "bands": [{"type": "DROP", "rate": rate_kbps, "burst_size": rate_kbps * METER_BURST_MS // 1000}]
+        }
+        metrics.inc("rest_requests_total", endpoint="meterentry/add")
+        try:
+            response = requests.post(f"{self.ryu_api_url}/stats/meterentry/add", data=json.dumps(meter_entry),
+                                     headers={'Content-Type': 'application/json'})
+            response.raise_for_status()
+            print(f"[Ryu API] Meter {meter_id} ({max_rate} Mbit/s) added for DPID {dpid}: {response.status_code}")
+            return True
+        except requests.exceptions.RequestException as e:
+            metrics.inc("rest_failures_total", endpoint="meterentry/add")
+            print(f"[WARNING] Failed to add meter {meter_id} for DPID {dpid}, its class is not policed there: {e}")
+            return False
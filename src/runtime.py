@@ -0,0 +1,207 @@
+import os
+import json
+import stat
+import time
+import socket
+import tempfile
+import subprocess
+import threading
+
+ZYGOTE_SCRIPT = "/shared/scripts/zygote.py"
+# Sockets of the control API and the zygotes: /run for root, else a directory of the user in the temp dir
+RUNTIME_DIR = "/run/cad" if os.getuid() == 0 else os.path.join(tempfile.gettempdir(), f"cad-{os.getuid()}")
+ZYGOTE_SOCKET_DIR = os.path.join(RUNTIME_DIR, "zygote")
+
+
+def private_dir(path):
+    """
+    Creates path (and missing parents) with mode 0700, or checks that the existing directory is
+    owned by this user and closed to everyone else, so no other user can plant or reach the
+    sockets in it. Raises PermissionError otherwise. Returns path.
+    """
+    parent = os.path.dirname(path)
+    if parent and not os.path.isdir(parent):
+        os.makedirs(parent, mode=0o700)
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(f"{path} must be a directory owned by uid {os.getuid()} with mode 0700")
+    return path
+
+
+class ZygoteProcess:
+    """
+    Popen-like handle for an app forked by a host zygote.
+    Exposes pid, stdout, stderr, poll() and wait() so the rest of ServiceManager
+    (log draining, killpg on stop) treats it like a regular popen process.
+    The zygote keeps the spawn connection open and writes the app's exit status on it.
+    """
+    def __init__(self, pid, stdout, stderr, connection, received=b""):
+        self.pid = pid
+        self.stdin = None
+        self.stdout = stdout
+        self.stderr = stderr
+        self.returncode = None
+        self.connection = connection  # spawn connection, None once the status arrived or the zygote is gone
+        self.received = received  # bytes of the status line read so far
+        self.lock = threading.Lock()
+
+    def poll(self):
+        if self.returncode is None and self.lock.acquire(blocking=False):
+            try:
+                self._read_status(0)
+            finally:
+                self.lock.release()
+        return self.returncode
+
+    def wait(self, timeout=None):
+        deadline = None if timeout is None else time.time() + timeout
+        if self.returncode is None and self.lock.acquire(timeout=-1 if timeout is None else timeout):
+            try:
+                while self.returncode is None:
+                    remaining = None if deadline is None else deadline - time.time()
+                    if remaining is not None and remaining <= 0:
+                        break
+                    if self.connection:
+                        self._read_status(remaining)
+                    elif self._read_status(0) is None:
+                        # Zygote gone: only the pid can be watched
+                        time.sleep(0.05)
+            finally:
+                self.lock.release()
+        if self.returncode is None:
+            raise subprocess.TimeoutExpired(f"zygote child {self.pid}", timeout)
+        return self.returncode
+
+    def _read_status(self, timeout):
+        # Reads the exit status if it arrives within timeout (0: only if already there, None: blocks)
+        if self.connection is None:
+            # Zygote gone before reporting: fall back to checking whether the pid still exists
+            try:
+                os.kill(self.pid, 0)
+            except ProcessLookupError:
+                self.returncode = -1
+            return self.returncode
+        self.connection.settimeout(timeout)
+        try:
+            while not self.received.endswith(b"\n"):
+                chunk = self.connection.recv(256)
+                if not chunk:
+                    break
+                self.received += chunk
+        except (BlockingIOError, socket.timeout):
+            return None
+        except OSError:
+            pass
+        self.connection.close()
+        self.connection = None
+        if self.received.endswith(b"\n"):
+            self.returncode = json.loads(self.received.decode())["returncode"]
+        return self.returncode
+
+
+class ZygotePool:
+    """
+    One pre-forked zygote per Mininet host. The zygote is started lazily in the
+    host's namespaces on the first spawn and forks every later app on request.
+    """
+    def __init__(self, zygote_script=ZYGOTE_SCRIPT, socket_dir=ZYGOTE_SOCKET_DIR, python="python3"):
+        self.zygote_script = zygote_script
+        self.socket_dir = socket_dir
+        self.python = python
+        self.zygotes = {}  # host name: (zygote process, control socket path)
+        self.lock = threading.Lock()
+        self._host_locks = {}  # host name: lock serializing zygote startup on that host
+
+    def spawn(self, host, cmd_args, env, cgroup=None):
+        with self.lock:
+            host_lock = self._host_locks.setdefault(host.name, threading.Lock())
+        with host_lock:
+            socket_path = self._ensure_zygote(host)
+        out_r, out_w = os.pipe()
+        err_r, err_w = os.pipe()
+        try:
+            connection, reply, received = _zygote_connect(socket_path, {"op": "spawn", "argv": cmd_args, "env": env,
+                                                                        "cgroup": cgroup or []}, fds=[out_w, err_w])
+        except BaseException:
+            os.close(out_r)
+            os.close(err_r)
+            raise
+        finally:
+            os.close(out_w)
+            os.close(err_w)
+        if "pid" not in reply:
+            connection.close()
+            os.close(out_r)
+            os.close(err_r)
+            raise RuntimeError(f"Zygote on {host.name} refused spawn: {reply.get('error')}")
+        return ZygoteProcess(reply["pid"], os.fdopen(out_r, "rb"), os.fdopen(err_r, "rb"), connection, received)
+
+    def shutdown(self):
+        for proc, socket_path in self.zygotes.values():
+            if proc.poll() is None:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=1)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+        self.zygotes.clear()
+
+    def _ensure_zygote(self, host, timeout=10):
+        entry = self.zygotes.get(host.name)
+        if entry and entry[0].poll() is None:
+            return entry[1]
+        private_dir(self.socket_dir)
+        socket_path = os.path.join(self.socket_dir, f"{host.name}.sock")
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        proc = host.popen([self.python, self.zygote_script, socket_path],
+                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, preexec_fn=os.setsid)
+        # Ready once the control socket answers
+        deadline = time.time() + timeout
+        while True:
+            try:
+                _zygote_request(socket_path, {"op": "ping"})
+                break
+            except (OSError, ValueError):
+                if proc.poll() is not None or time.time() >= deadline:
+                    raise RuntimeError(f"Zygote on {host.name} failed to start")
+                time.sleep(0.01)
+        self.zygotes[host.name] = (proc, socket_path)
+        print(f"[INFO] Zygote started on {host.name}")
+        return socket_path
+
+
+def _zygote_connect(socket_path, request, fds=None):
+    """
+    Sends one request to a zygote. Returns (open connection, reply, bytes received after the reply).
+    """
+    s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        s.settimeout(5)
+        s.connect(socket_path)
+        payload = (json.dumps(request) + "\n").encode()
+        if fds:
+            socket.send_fds(s, [payload], fds)
+        else:
+            s.sendall(payload)
+        received = b""
+        while b"\n" not in received:
+            chunk = s.recv(4096)
+            if not chunk:
+                break
+            received += chunk
+        reply, _, rest = received.partition(b"\n")
+        return s, json.loads(reply.decode()), rest
+    except BaseException:
+        s.close()
+        raise
+
+
+def _zygote_request(socket_path, request, fds=None):
+    connection, reply, _ = _zygote_connect(socket_path, request, fds)
+    connection.close()
+    return reply
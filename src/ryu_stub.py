@@ -0,0 +1,156 @@
+import json
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RyuStub:
+    """
+    Local stand-in for the part of Ryu's ofctl_rest API used by this project:
+    GET /stats/switches, GET /stats/flow/<dpid>, GET /stats/meter/<dpid>, GET /stats/meterfeatures/<dpid>,
+    POST /stats/flowentry/{add,delete,delete_strict} and POST /stats/meterentry/{add,delete}. Flow and meter
+    tables are only recorded, nothing is forwarded. Flows referring to a missing meter are rejected, as a switch
+    would. With max_meter=0 the switches have no meters: meter adds are answered 200, as Ryu does, but dropped.
+    Every call is counted per endpoint.
+    """
+    def __init__(self, host="127.0.0.1", port=0, max_meter=65536):
+        self.flow_tables = {}  # dpid: {(priority, match json): flow entry}
+        self.meter_tables = {}  # dpid: {meter ID: meter entry}
+        self.switches = set()
+        self.max_meter = max_meter
+        self.calls = Counter()  # "METHOD /endpoint": count
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, name="ryu-stub", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def connect_switches(self, dpids):
+        with self.lock:
+            for dpid in dpids:
+                self.switches.add(dpid)
+                self.flow_tables.setdefault(dpid, {})
+                self.meter_tables.setdefault(dpid, {})
+
+    def flows_per_switch(self):
+        with self.lock:
+            return {dpid: len(table) for dpid, table in self.flow_tables.items()}
+
+    def reset_calls(self):
+        with self.lock:
+            self.calls.clear()
+
+    def handle(self, method, path, body=None):
+        """
+        Serves one REST call, returns (status, response object).
+        """
+        parts = [part for part in path.split("?", 1)[0].split("/") if part]
+        endpoint = "/" + "/".join(parts[:3] if parts[:2] in (["stats", "flowentry"], ["stats", "meterentry"]) else parts[:2])
+        with self.lock:
+            self.calls[f"{method} {endpoint}"] += 1
+            if method == "GET" and parts == ["stats", "switches"]:
+                return 200, sorted(self.switches)
+            if method == "GET" and parts[:2] == ["stats", "flow"] and len(parts) == 3:
+                dpid = int(parts[2])
+                if dpid not in self.flow_tables:
+                    return 404, {}
+                return 200, {str(dpid): list(self.flow_tables[dpid].values())}
+            if method == "GET" and parts[:2] == ["stats", "meter"] and len(parts) == 3:
+                dpid = int(parts[2])
+                if dpid not in self.meter_tables:
+                    return 404, {}
+                return 200, {str(dpid): list(self.meter_tables[dpid].values())}
+            if method == "GET" and parts[:2] == ["stats", "meterfeatures"] and len(parts) == 3:
+                dpid = int(parts[2])
+                if dpid not in self.meter_tables:
+                    return 404, {}
+                return 200, {str(dpid): [{"max_meter": self.max_meter, "band_types": ["DROP", "DSCP_REMARK"],
+                                          "capabilities": ["KBPS", "PKTPS", "BURST", "STATS"], "max_bands": 1, "max_color": 0}]}
+            if method == "POST" and parts[:2] == ["stats", "flowentry"] and len(parts) == 3:
+                return self._flowentry(parts[2], body or {})
+            if method == "POST" and parts[:2] == ["stats", "meterentry"] and len(parts) == 3:
+                return self._meterentry(parts[2], body or {})
+        return 404, {}
+
+    def _flowentry(self, command, entry):
+        dpid = entry.get("dpid")
+        if dpid not in self.flow_tables:
+            return 404, {}
+        table = self.flow_tables[dpid]
+        match = entry.get("match", {})
+        if command == "add":
+            meters = [action["meter_id"] for action in entry.get("actions", []) if action.get("type") == "METER"]
+            if any(meter_id not in self.meter_tables[dpid] for meter_id in meters):
+                return 400, {}
+            table[(entry.get("priority", 0), json.dumps(match, sort_keys=True))] = {
+                "priority": entry.get("priority", 0), "match": match, "actions": entry.get("actions", []),
+                "packet_count": 0, "byte_count": 0,
+            }
+        elif command == "delete_strict":
+            table.pop((entry.get("priority", 0), json.dumps(match, sort_keys=True)), None)
+        elif command == "delete":
+            # Non-strict delete: every entry whose match includes the given fields
+            for key in [key for key, flow in table.items() if all(flow["match"].get(k) == v for k, v in match.items())]:
+                del table[key]
+        else:
+            return 404, {}
+        return 200, {}
+
+    def _meterentry(self, command, entry):
+        dpid = entry.get("dpid")
+        if dpid not in self.meter_tables:
+            return 404, {}
+        if command == "add":
+            if entry.get("meter_id", 0) > self.max_meter:
+                return 200, {}
+            self.meter_tables[dpid][entry.get("meter_id")] = {"meter_id": entry.get("meter_id"), "flags": entry.get("flags"),
+                                                               "bands": entry.get("bands", []), "packet_in_count": 0}
+        elif command == "delete":
+            self.meter_tables[dpid].pop(entry.get("meter_id"), None)
+        else:
+            return 404, {}
+        return 200, {}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._reply(*stub.handle("GET", self.path))
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                try:
+                    body = json.loads(self.rfile.read(length) or b"{}")
+                except ValueError:
+                    self._reply(400, {})
+                    return
+                self._reply(*stub.handle("POST", self.path, body))
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,156 @@
+import os
+import sys
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wire import Connection, ProtocolError
+
+# Common client side of the aggregator services (random_sum, datetime_combiner).
+#
+# The upstreams of an aggregator are queried concurrently, so a result takes as long as the
+# slowest upstream instead of the sum of all of them. By default one result is computed and
+# written to /shared/<SERVICE_KEY>.txt for the service test. With CONTINUOUS_RATE set (results
+# per second) the aggregator keeps producing results over persistent upstream connections for
+# CONTINUOUS_DURATION seconds (0: until stopped), which makes the service a load source, and
+# reports its throughput and per-upstream latency to /shared/<SERVICE_KEY>.stats.json.
+
+CONTINUOUS_RATE = float(os.getenv('CONTINUOUS_RATE', 0))
+CONTINUOUS_DURATION = float(os.getenv('CONTINUOUS_DURATION', 0))
+TIMEOUT = 10
+STATS_INTERVAL = 1.0
+
+
+class Upstream:
+    """
+    A server queried by an aggregator, possibly replicated: ip lists the IPs of its replicas,
+    comma separated, and requests take the replicas in turn. The connection to each replica is
+    kept open between requests: the greeting answers the first request, each further request
+    frame gets one more reply. A server closing after its reply (PERSISTENT_CONNECTIONS=0) is
+    reconnected transparently.
+    """
+    def __init__(self, name, ip, port):
+        self.name = name
+        self.ip = ip
+        self.ips = [replica for replica in (ip or "").split(",") if replica]
+        self.port = port
+        self.connections = {}  # replica IP: open Connection
+        self.next_replica = 0
+        self.requests = 0
+        self.errors = 0
+        self.latency_ms_sum = 0.0
+        self.latency_ms_max = 0.0
+
+    def request(self):
+        """
+        Returns (reply, error): one of the two is None.
+        """
+        if not self.ips:
+            return None, f"IP not set for port {self.port}"
+        ip = self.ips[self.next_replica % len(self.ips)]
+        self.next_replica += 1
+        start = time.perf_counter()
+        try:
+            connection = self.connections.get(ip)
+            reply = self._send(connection) if connection else None
+            if reply is None:
+                # First request, or the server closed the connection after its last reply
+                self._close(ip)
+                connection = self.connections[ip] = Connection.connect(ip, self.port, timeout=TIMEOUT)
+                reply = connection.greeting()
+            reply = reply.decode().strip()
+        except (OSError, ProtocolError, UnicodeDecodeError) as e:
+            self._close(ip)
+            self.errors += 1
+            return None, f"Socket error with {ip}:{self.port}: {e}"
+        latency_ms = (time.perf_counter() - start) * 1000
+        self.requests += 1
+        self.latency_ms_sum += latency_ms
+        self.latency_ms_max = max(self.latency_ms_max, latency_ms)
+        return reply, None
+
+    @staticmethod
+    def _send(connection):
+        try:
+            return connection.request(b"")
+        except OSError:
+            return None
+
+    def _close(self, ip):
+        connection = self.connections.pop(ip, None)
+        if connection:
+            connection.close()
+
+    def close(self):
+        for ip in list(self.connections):
+            self._close(ip)
+
+    def stats(self):
+        return {"address": f"{self.ip}:{self.port}", "requests": self.requests, "errors": self.errors,
+                "latency_ms_avg": round(self.latency_ms_sum / self.requests, 3) if self.requests else None,
+                "latency_ms_max": round(self.latency_ms_max, 3)}
+
+
+def fetch_all(executor, upstreams):
+    """
+    Queries every upstream at once. Returns {name: (reply, error)}.
+    """
+    futures = {upstream.name: executor.submit(upstream.request) for upstream in upstreams}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def write_output(service_key, result_str):
+    # Write results to a file in the shared directory
+    output_path = f'/shared/{service_key}.txt'
+    with open(output_path, 'w') as f:
+        f.write(result_str)
+    return output_path
+
+
+def run(service_key, upstreams, combine):
+    """
+    Runs an aggregator. combine(replies) turns {name: (reply, error)} into (result string, ok).
+    """
+    with ThreadPoolExecutor(max_workers=len(upstreams)) as executor:
+        result_str, _ = combine(fetch_all(executor, upstreams))
+        print(result_str, flush=True)
+        print(f"Results written to {write_output(service_key, result_str)}", flush=True)
+        if CONTINUOUS_RATE > 0:
+            run_continuous(service_key, executor, upstreams, combine)
+    for upstream in upstreams:
+        upstream.close()
+
+
+def run_continuous(service_key, executor, upstreams, combine):
+    print(f"Continuous mode: {CONTINUOUS_RATE} results/s"
+          + (f" for {CONTINUOUS_DURATION}s" if CONTINUOUS_DURATION else ""), flush=True)
+    stats_path = f'/shared/{service_key}.stats.json'
+    interval = 1.0 / CONTINUOUS_RATE
+    start = time.monotonic()
+    next_result = start
+    next_stats = start + STATS_INTERVAL
+    results = failures = 0
+    while not CONTINUOUS_DURATION or time.monotonic() - start < CONTINUOUS_DURATION:
+        _, ok = combine(fetch_all(executor, upstreams))
+        results += ok
+        failures += not ok
+        now = time.monotonic()
+        if now >= next_stats:
+            next_stats = now + STATS_INTERVAL
+            _write_stats(stats_path, results, failures, now - start, upstreams)
+        # Results are paced on a fixed schedule; a slow round is not made up with a burst
+        next_result = max(next_result + interval, now)
+        time.sleep(max(0.0, next_result - time.monotonic()))
+    _write_stats(stats_path, results, failures, time.monotonic() - start, upstreams)
+
+
+def _write_stats(path, results, failures, elapsed, upstreams):
+    report = {"results": results, "failures": failures, "elapsed_s": round(elapsed, 3),
+              "results_per_s": round(results / elapsed, 2) if elapsed else 0.0,
+              "target_rate": CONTINUOUS_RATE, "upstreams": {u.name: u.stats() for u in upstreams}}
+    try:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(report, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[ERROR] Failed to write stats to {path}: {e}", file=sys.stderr, flush=True)
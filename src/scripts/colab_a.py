@@ -1,9 +1,11 @@
 import socket
 import sys
 import os
+import random
+from wire import Connection
 
 COLAB_B_PORT = 5004
-# IP address from environment variable
+# IP addresses of the Colab B replicas from environment variable, comma separated
 COLAB_B_IP = os.getenv('COLAB_B_IP')
 SERVICE_KEY = os.getenv('SERVICE_KEY', 'unknown')
 
@@ -21,14 +23,14 @@ if __name__ == "__main__":
 
     result_str = ""
     try:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(10)
-            s.connect((COLAB_B_IP, COLAB_B_PORT))
+        # One-shot client: any replica of Colab B will do
+        with Connection.connect(random.choice(COLAB_B_IP.split(",")), COLAB_B_PORT, timeout=10) as conn:
             message = "Hello from Colab A!"
-            s.sendall(message.encode())
+            # Messages and replies are length-prefixed frames, matched by request ID
+            request_id = conn.send(message)
             print(f"Sent: {message}")
             
-            data = s.recv(1024).decode()
+            data = conn.receive(request_id).decode()
             result_str = f"Colab A received: {data}"
             print(result_str)
 
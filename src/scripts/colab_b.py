@@ -1,29 +1,18 @@
-import socket
 import sys
-import time
+from server_runtime import FrameServer
 
 # port for colab_b to listen on
 PORT = 5004
 # Bind to 0.0.0.0
 HOST = "0.0.0.0"
 
+def reply(data):
+    return f"Colab B received your message: '{data.decode(errors='replace')}'"
+
 if __name__ == "__main__":
     # Ensure standard output is flushed immediately
     sys.stdout.flush()
-    print(f"Colab B server started. Listening on {HOST}:{PORT}")
-
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1) # Allow reuse of address
-        s.bind((HOST, PORT))
-        s.listen()
+    print(f"Colab B server started. Listening on {HOST}:{PORT}", flush=True)
 
-        while True:
-            conn, addr = s.accept()
-            with conn:
-                print(f"Connected by {addr} on port {PORT}")
-                data = conn.recv(1024).decode()
-                print(f"Colab B received: {data}")
-                response = f"Colab B received your message: '{data}'"
-                conn.sendall(response.encode())
-                print(f"Colab B sent: {response}")
-            time.sleep(1)
+    # One reply per message, with the ID of its request
+    FrameServer(reply, PORT, HOST).serve_forever()
@@ -1,11 +1,21 @@
-import http.server
-import socketserver
+import os
 import sys
+import json
+import mmap
+import time
+import struct
+import hashlib
+import tempfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs, unquote
+from server_runtime import MetricsReporter
 
 # port for the HTTP server
 PORT = 81
 # Bind to 0.0.0.0 to be accessible from any IP address on the host
 HOST = "0.0.0.0"
+# Dataset built with "database.py build"; the demo content below is served when unset
+DB_PATH = os.getenv("DB_PATH")
 
 # Fake database content
 fake_database = {
@@ -15,29 +25,181 @@ fake_database = {
     "4": "The quick brown fox jumps over the lazy dog."
 }
 
-class Handler(http.server.SimpleHTTPRequestHandler):
+# Store layout: <path>.data holds the keys and values back to back, <path>.idx a header
+# (magic, entry count) and one fixed-size entry per key sorted by key hash:
+# (hash, offset of the key in .data, key length, value length).
+MAGIC = b"CADKV001"
+HEADER = struct.Struct("<8sQ")
+ENTRY = struct.Struct("<QQII")
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), "little")
+
+
+class MmapStore:
     """
-    Custom HTTP request handler to serve data from the fake_database.
+    Read-only key-value store on two memory-mapped files. Opening maps them without reading:
+    pages are loaded on first access, so multi-GB datasets open instantly and only the hot
+    part is kept in memory. Lookups binary-search the index and return memoryviews of the data.
     """
-    def do_GET(self):
-        # Extract the item ID from the request path (e.g., /1, /2)
-        item_id = self.path.strip("/")
-        # Retrieve the item from the database
-        item = fake_database.get(item_id, "Item not found")
-        
-        # Send HTTP 200 OK response
-        self.send_response(200)
-        # Set Content-type header
-        self.send_header('Content-type', 'text/plain')
-        self.end_headers()
-        # Write the response body (encoded to bytes)
-        self.wfile.write(item.encode())
+    def __init__(self, path):
+        self.files = [open(path + ".data", "rb"), open(path + ".idx", "rb")]
+        self.data = self._map(self.files[0])
+        self.index = self._map(self.files[1])
+        magic, self.count = HEADER.unpack_from(self.index, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}.idx is not a database index")
+        self.data_view = memoryview(self.data)
+
+    @staticmethod
+    def _map(f):
+        # mmap refuses empty files: an empty store maps a placeholder
+        size = os.fstat(f.fileno()).st_size
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def _entry(self, i):
+        return ENTRY.unpack_from(self.index, HEADER.size + i * ENTRY.size)
+
+    def get(self, key):
+        key = key.encode() if isinstance(key, str) else key
+        h = key_hash(key)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._entry(mid)[0] < h:
+                lo = mid + 1
+            else:
+                hi = mid
+        # Entries with the same hash are adjacent: compare the keys themselves
+        while lo < self.count:
+            entry_hash, offset, key_len, value_len = self._entry(lo)
+            if entry_hash != h:
+                break
+            if self.data_view[offset:offset + key_len] == key:
+                return self.data_view[offset + key_len:offset + key_len + value_len]
+            lo += 1
+        return None
+
+    def __len__(self):
+        return self.count
+
+    @staticmethod
+    def build(path, items):
+        """
+        Writes the store from (key, value) pairs of str or bytes. Only the index entries are held
+        in memory while building, 24 bytes per key.
+        """
+        entries = []
+        offset = 0
+        with open(path + ".data.tmp", "wb") as data:
+            for key, value in items:
+                key = key.encode() if isinstance(key, str) else key
+                value = value.encode() if isinstance(value, str) else value
+                data.write(key)
+                data.write(value)
+                entries.append((key_hash(key), offset, len(key), len(value)))
+                offset += len(key) + len(value)
+        entries.sort()
+        with open(path + ".idx.tmp", "wb") as index:
+            index.write(HEADER.pack(MAGIC, len(entries)))
+            for entry in entries:
+                index.write(ENTRY.pack(*entry))
+        # Replace the files only once both are complete
+        os.replace(path + ".data.tmp", path + ".data")
+        os.replace(path + ".idx.tmp", path + ".idx")
+
+
+def make_handler(store, metrics):
+    class Handler(BaseHTTPRequestHandler):
+        """
+        GET /<key>                  the value, 404 if missing
+        GET /batch?keys=1,2,3       JSON object of the values (null if missing)
+        POST /batch {"keys": [...]} the same for long key lists
+        """
+        # HTTP/1.1: connections are kept alive between requests
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes: with Nagle the body waits for the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            start = time.perf_counter()
+            url = urlsplit(self.path)
+            if url.path == "/batch":
+                keys = [key for value in parse_qs(url.query).get("keys", []) for key in value.split(",") if key]
+                self._batch(keys)
+            else:
+                # Extract the item ID from the request path (e.g., /1, /2)
+                item = store.get(unquote(url.path.strip("/")))
+                if item is None:
+                    self._reply(404, b"Item not found", "text/plain")
+                else:
+                    self._reply(200, item, "text/plain")
+            metrics.record((time.perf_counter() - start) * 1000)
+
+        def do_POST(self):
+            start = time.perf_counter()
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if urlsplit(self.path).path != "/batch":
+                self._reply(404, b"Not found", "text/plain")
+                return
+            try:
+                keys = json.loads(body)["keys"]
+            except (ValueError, KeyError, TypeError):
+                self._reply(400, b'Expected {"keys": [...]}', "text/plain")
+                return
+            self._batch([str(key) for key in keys])
+            metrics.record((time.perf_counter() - start) * 1000, count=max(1, len(keys)))
+
+        def _batch(self, keys):
+            values = {}
+            for key in keys:
+                item = store.get(key)
+                values[key] = None if item is None else str(item, "utf-8", "replace")
+            self._reply(200, json.dumps(values).encode(), "application/json")
+
+        def _reply(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # One line per request would flood the app log under load
+            pass
+
+    return Handler
+
+
+def open_store():
+    if DB_PATH:
+        return MmapStore(DB_PATH)
+    # The demo store is removed once mapped: the open files stay readable until the app exits
+    with tempfile.TemporaryDirectory(prefix="cad-db-") as directory:
+        path = os.path.join(directory, "demo")
+        MmapStore.build(path, fake_database.items())
+        return MmapStore(path)
+
 
 if __name__ == "__main__":
+    # Usage: database.py                      serve DB_PATH (or the demo content)
+    #        database.py build <path> <jsonl>  build a store from {"key": ..., "value": ...} lines
+    if len(sys.argv) > 1 and sys.argv[1] == "build":
+        path, source = sys.argv[2], sys.argv[3]
+        with open(source) as f:
+            MmapStore.build(path, ((str(record["key"]), str(record["value"])) for record in map(json.loads, f)))
+        print(f"Built {path}.data and {path}.idx")
+        sys.exit(0)
+
     # standard output is flushed immediately
-    sys.stdout.flush() 
-    # TCP server that listens on the specified host and port
-    with socketserver.TCPServer((HOST, PORT), Handler) as httpd:
-        print(f"Database server is running and listening on {HOST}:{PORT}")
-        # Serve requests indefinitely
-        httpd.serve_forever()
+    sys.stdout.flush()
+    store = open_store()
+    metrics = MetricsReporter().start()
+    # One thread per connection, so keep-alive clients are served concurrently
+    ThreadingHTTPServer.request_queue_size = 128
+    httpd = ThreadingHTTPServer((HOST, PORT), make_handler(store, metrics))
+    httpd.daemon_threads = True
+    print(f"Database server is running and listening on {HOST}:{PORT} ({len(store)} keys)", flush=True)
+    # Serve requests indefinitely
+    httpd.serve_forever()
@@ -0,0 +1,248 @@
+import os
+import sys
+import json
+import time
+import queue
+import threading
+import http.client
+from wire import Connection
+
+# Load generator app, deployed next to a service by ServiceManager.start_loadgen with flows
+# to the app it targets (TARGET_IP:TARGET_PORT, speaking TARGET_PROTOCOL "http" or "wire").
+# TARGET_IP lists the IPs of the target's replicas, comma separated: the workers' connections
+# are spread over them.
+#
+# With LOAD_QPS > 0 the load is open-loop: requests are scheduled at a fixed rate whatever the
+# latency, LOAD_CONCURRENCY workers send them, and latency is measured from the scheduled time,
+# so a slow target shows as latency instead of silently lowering the rate. With LOAD_QPS=0 every
+# worker sends its next request as soon as the last one is answered (closed loop).
+#
+# Every SUMMARY_INTERVAL seconds one JSON line is appended to
+# /shared/loadgen/<SERVICE_KEY>.<INSTANCE_NAME>.jsonl: counts, throughput, percentiles and the
+# interval's latency histogram as sparse [bucket lower bound in us, count] pairs, which can be
+# summed across intervals and load generators.
+
+TARGET_IP = os.getenv('TARGET_IP')
+TARGET_IPS = [ip for ip in (TARGET_IP or "").split(",") if ip]
+TARGET_PORT = int(os.getenv('TARGET_PORT', 0))
+TARGET_PROTOCOL = os.getenv('TARGET_PROTOCOL', 'http')
+LOAD_PATH = os.getenv('LOAD_PATH', '/1')
+LOAD_PAYLOAD = os.getenv('LOAD_PAYLOAD', '')
+LOAD_PAYLOAD_SIZE = int(os.getenv('LOAD_PAYLOAD_SIZE', 0))
+LOAD_QPS = float(os.getenv('LOAD_QPS', 100))
+LOAD_CONCURRENCY = int(os.getenv('LOAD_CONCURRENCY', 8))
+LOAD_DURATION = float(os.getenv('LOAD_DURATION', 60))
+SUMMARY_INTERVAL = float(os.getenv('SUMMARY_INTERVAL', 5))
+SERVICE_KEY = os.getenv('SERVICE_KEY', 'unknown')
+INSTANCE_NAME = os.getenv('INSTANCE_NAME', 'loadgen')
+OUTPUT_DIR = "/shared/loadgen"
+# Bulk traffic: wire requests are padded to LOAD_PAYLOAD_SIZE bytes
+PAYLOAD = LOAD_PAYLOAD.encode().ljust(LOAD_PAYLOAD_SIZE, b".")
+TIMEOUT = 10
+ERROR_BACKOFF = 0.1
+
+# Histogram buckets: exact below 2**SUB_BITS us, then 2**(SUB_BITS - 1) buckets per power of two,
+# i.e. at most 1/64 (1.6%) relative error at any latency
+SUB_BITS = 7
+HALF = 1 << (SUB_BITS - 1)
+
+
+def bucket_index(us):
+    e = max(0, us.bit_length() - SUB_BITS)
+    return e * HALF + (us >> e)
+
+
+def bucket_lower(index):
+    if index < 2 * HALF:
+        return index
+    e = index // HALF - 1
+    return (index - e * HALF) << e
+
+
+class Histogram:
+    """
+    HDR-style latency histogram with log-spaced buckets: constant relative precision from
+    microseconds to minutes in a few hundred sparse counters.
+    """
+    def __init__(self):
+        self.counts = {}  # bucket index: count
+        self.total = 0
+        self.max_us = 0
+
+    def record(self, seconds):
+        us = max(0, int(seconds * 1_000_000))
+        index = bucket_index(us)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.total += 1
+        self.max_us = max(self.max_us, us)
+
+    def percentile(self, q):
+        """Latency in ms below which a fraction q of the samples fall, None without samples."""
+        if not self.total:
+            return None
+        rank = q * self.total
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return round(min(bucket_lower(index + 1), self.max_us) / 1000, 3)
+        return round(self.max_us / 1000, 3)
+
+    def sparse(self):
+        return [[bucket_lower(index), count] for index, count in sorted(self.counts.items())]
+
+
+class Stats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histogram = Histogram()
+        self.ok = 0
+        self.errors = 0
+        self.last_error = None
+
+    def record(self, latency, error=None):
+        with self.lock:
+            if error is None:
+                self.ok += 1
+                self.histogram.record(latency)
+            else:
+                self.errors += 1
+                self.last_error = error
+
+    def take(self):
+        # Swaps in fresh counters: each summary covers one interval
+        with self.lock:
+            taken = (self.histogram, self.ok, self.errors, self.last_error)
+            self.histogram, self.ok, self.errors, self.last_error = Histogram(), 0, 0, None
+        return taken
+
+
+class HTTPTarget:
+    def __init__(self, ip):
+        self.connection = http.client.HTTPConnection(ip, TARGET_PORT, timeout=TIMEOUT)
+
+    def request(self):
+        self.connection.request("GET", LOAD_PATH)
+        response = self.connection.getresponse()
+        response.read()
+        if response.status >= 500:
+            raise ConnectionError(f"HTTP {response.status}")
+
+    def close(self):
+        self.connection.close()
+
+
+class WireTarget:
+    def __init__(self, ip):
+        self.connection = Connection.connect(ip, TARGET_PORT, timeout=TIMEOUT)
+        self.greeted = False
+
+    def request(self):
+        # Greeting servers answer the connect first: drain that before the first request
+        if not self.greeted:
+            self.greeted = True
+            if not PAYLOAD:
+                self.connection.greeting()
+                return
+        self.connection.request(PAYLOAD)
+
+    def close(self):
+        self.connection.close()
+
+
+TARGETS = {"http": HTTPTarget, "wire": WireTarget}
+
+
+def worker(ip, stats, deadline, schedule):
+    """
+    Sends requests over one persistent connection to the replica at ip, reconnecting after errors.
+    schedule is the queue of open-loop send times, or None in closed loop.
+    """
+    target = None
+    while time.monotonic() < deadline:
+        if schedule is not None:
+            try:
+                start = schedule.get(timeout=0.2)
+            except queue.Empty:
+                continue
+        else:
+            start = time.monotonic()
+        try:
+            if target is None:
+                target = TARGETS[TARGET_PROTOCOL](ip)
+            target.request()
+            stats.record(time.monotonic() - start)
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            stats.record(None, f"{type(e).__name__}: {e}")
+            if target is not None:
+                target.close()
+            target = None
+            if schedule is None:
+                # Closed loop: an unreachable target would otherwise be retried in a busy loop
+                time.sleep(ERROR_BACKOFF)
+    if target is not None:
+        target.close()
+
+
+def dispatch(schedule, deadline):
+    # Open loop: send times are fixed in advance, lateness of the workers does not delay them
+    interval = 1.0 / LOAD_QPS
+    next_send = time.monotonic()
+    while next_send < deadline:
+        delay = next_send - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        schedule.put(next_send)
+        next_send += interval
+
+
+def write_summary(path, stats, interval_s, elapsed_s, backlog):
+    histogram, ok, errors, last_error = stats.take()
+    summary = {"t": round(time.time(), 3), "elapsed_s": round(elapsed_s, 3), "interval_s": round(interval_s, 3),
+               "target": f"{TARGET_PROTOCOL}://{TARGET_IP}:{TARGET_PORT}", "qps_target": LOAD_QPS,
+               "ok": ok, "errors": errors, "qps": round(ok / interval_s, 2) if interval_s else 0.0,
+               "p50_ms": histogram.percentile(0.5), "p90_ms": histogram.percentile(0.9),
+               "p99_ms": histogram.percentile(0.99), "p999_ms": histogram.percentile(0.999),
+               "max_ms": round(histogram.max_us / 1000, 3), "backlog": backlog, "hist": histogram.sparse()}
+    if last_error:
+        summary["last_error"] = last_error
+    with open(path, "a") as f:
+        f.write(json.dumps(summary, separators=(",", ":")) + "\n")
+    return summary
+
+
+if __name__ == "__main__":
+    # standard output is flushed immediately
+    sys.stdout.flush()
+    if not TARGET_IPS or not TARGET_PORT or TARGET_PROTOCOL not in TARGETS:
+        print("[ERROR] TARGET_IP, TARGET_PORT and TARGET_PROTOCOL (http or wire) must be set. Exiting.")
+        sys.exit(1)
+    mode = f"{LOAD_QPS} qps open loop" if LOAD_QPS > 0 else "closed loop"
+    print(f"Load generator started: {TARGET_PROTOCOL}://{TARGET_IP}:{TARGET_PORT}, {mode}, "
+          f"{LOAD_CONCURRENCY} workers, {LOAD_DURATION or 'unlimited'}s", flush=True)
+
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    path = os.path.join(OUTPUT_DIR, f"{SERVICE_KEY}.{INSTANCE_NAME}.jsonl")
+    start = time.monotonic()
+    deadline = start + LOAD_DURATION if LOAD_DURATION > 0 else float("inf")
+    stats = Stats()
+    schedule = queue.Queue() if LOAD_QPS > 0 else None
+    threads = [threading.Thread(target=worker, args=(TARGET_IPS[i % len(TARGET_IPS)], stats, deadline, schedule), daemon=True)
+               for i in range(LOAD_CONCURRENCY)]
+    if schedule is not None:
+        threads.append(threading.Thread(target=dispatch, args=(schedule, deadline), daemon=True))
+    for thread in threads:
+        thread.start()
+
+    last = start
+    while any(thread.is_alive() for thread in threads):
+        time.sleep(max(0.0, min(SUMMARY_INTERVAL - (time.monotonic() - last), deadline - time.monotonic())))
+        now = time.monotonic()
+        if now - last >= SUMMARY_INTERVAL or now >= deadline:
+            summary = write_summary(path, stats, now - last, now - start, schedule.qsize() if schedule else 0)
+            print(f"{summary['qps']} qps, p50 {summary['p50_ms']} ms, p99 {summary['p99_ms']} ms, "
+                  f"{summary['errors']} errors", flush=True)
+            last = now
+            if now >= deadline:
+                break
+    print(f"Load generator finished, summaries in {path}", flush=True)
@@ -0,0 +1,49 @@
+import socket
+import sys
+import time
+import http.client
+
+# Readiness probe run on a Mininet host through host.cmd().
+# Usage: probe.py tcp <ip> <port> [timeout]
+#        probe.py http <ip> <port> <path> [timeout]
+# Prints READY as soon as the target answers, TIMEOUT otherwise.
+
+RETRY_INTERVAL = 0.05
+
+def probe_tcp(ip, port):
+    """Succeeds once the target accepts a TCP connection."""
+    try:
+        with socket.create_connection((ip, port), timeout=1):
+            return True
+    except OSError:
+        return False
+
+def probe_http(ip, port, path):
+    """Succeeds once the target answers a GET with a non-5xx status."""
+    conn = http.client.HTTPConnection(ip, port, timeout=1)
+    try:
+        conn.request("GET", path)
+        return conn.getresponse().status < 500
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    kind, ip, port = sys.argv[1], sys.argv[2], int(sys.argv[3])
+    if kind == "http":
+        path = sys.argv[4]
+        timeout = float(sys.argv[5]) if len(sys.argv) > 5 else 10
+        check = lambda: probe_http(ip, port, path)
+    else:
+        timeout = float(sys.argv[4]) if len(sys.argv) > 4 else 10
+        check = lambda: probe_tcp(ip, port)
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if check():
+            print("READY")
+            sys.exit(0)
+        time.sleep(RETRY_INTERVAL)
+    print("TIMEOUT")
+    sys.exit(1)
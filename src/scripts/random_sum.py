@@ -1,6 +1,7 @@
 import os
-import socket
 import sys
+import aggregator
+from aggregator import Upstream
 
 # ports for the random generators
 GEN1_PORT = 5000
@@ -14,27 +15,23 @@ SERVICE_KEY = os.getenv('SERVICE_KEY', 'unknown')
 # Ensure the /shared directory exists for output
 os.makedirs('/shared', exist_ok=True)
 
-def get_data_from_generator(gen_ip, gen_port):
+def combine(replies):
     """
-    Connects to a random generator and fetches a number.
+    Sums the numbers of the two generators. Returns (result string, ok).
     """
-    if not gen_ip:
-        return None, f"Generator IP not set for port {gen_port}"
-
+    (data1, err1), (data2, err2) = replies["gen1"], replies["gen2"]
+    try:
+        num1 = int(data1) if data1 is not None else None
+    except ValueError:
+        num1, err1 = None, f"Invalid data from {GEN1_IP}:{GEN1_PORT}"
     try:
-        # Create a TCP/IP socket
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            s.settimeout(10) # Set a timeout for connection and receive
-            s.connect((gen_ip, gen_port)) # Connect to the generator
-            data = s.recv(1024).decode() # Receive data
-            print(f"Received {data} from {gen_ip}:{gen_port}")
-            return int(data), None
-    except socket.error as e:
-        return None, f"Socket error with {gen_ip}:{gen_port}: {e}"
+        num2 = int(data2) if data2 is not None else None
     except ValueError:
-        return None, f"Invalid data from {gen_ip}:{gen_port}"
-    except Exception as e:
-        return None, f"An error occurred with {gen_ip}:{gen_port}: {e}"
+        num2, err2 = None, f"Invalid data from {GEN2_IP}:{GEN2_PORT}"
+
+    if num1 is not None and num2 is not None:
+        return f"Sum of {num1} and {num2} is: {num1 + num2}", True
+    return f"Failed to get numbers. Errors: Gen1: {err1}, Gen2: {err2}", False
 
 if __name__ == "__main__":
     # Ensure standard output is flushed immediately
@@ -45,20 +42,5 @@ if __name__ == "__main__":
         print("[ERROR] One or both generator IPs not set. Exiting.")
         sys.exit(1)
 
-    num1, err1 = get_data_from_generator(GEN1_IP, GEN1_PORT)
-    num2, err2 = get_data_from_generator(GEN2_IP, GEN2_PORT)
-
-    result_str = ""
-    if num1 is not None and num2 is not None:
-        total_sum = num1 + num2
-        result_str = f"Sum of {num1} and {num2} is: {total_sum}"
-        print(result_str)
-    else:
-        result_str = f"Failed to get numbers. Errors: Gen1: {err1}, Gen2: {err2}"
-        print(result_str)
-
-    # Write results to a file in the shared directory
-    output_path = f'/shared/{SERVICE_KEY}.txt'
-    with open(output_path, 'w') as f:
-        f.write(result_str)
-    print(f"Random Sum results written to {output_path}")
+    # Both generators are queried at once
+    aggregator.run(SERVICE_KEY, [Upstream("gen1", GEN1_IP, GEN1_PORT), Upstream("gen2", GEN2_IP, GEN2_PORT)], combine)
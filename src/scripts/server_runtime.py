@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import time
+import socket
+import selectors
+import threading
+from wire import FrameDecoder, ProtocolError, GREETING_ID, MAX_BUFFERS, frame, advance
+
+# Common runtime of the TCP servers (random generators, date/time fetchers, colab_b).
+#
+# One thread multiplexes every connection with selectors, so concurrent clients are served at
+# once instead of waiting in the accept backlog. Requests and responses are wire.py frames.
+# A "greeting" server answers as soon as a client connects (request ID 0), which is all a
+# one-shot client reads. In persistent mode (the default, PERSISTENT_CONNECTIONS=0 turns it off)
+# the connection then stays open, and every request frame gets a response frame with its ID;
+# pipelined requests are answered in order.
+#
+# Request counts and latencies are reported to /shared/metrics/<SERVICE_KEY>.<INSTANCE_NAME>.json
+# for the autoscaler, by a MetricsReporter that the HTTP servers use as well.
+
+METRICS_DIR = "/shared/metrics"
+RECV_SIZE = 256 * 1024
+
+
+class MetricsReporter:
+    """
+    Cumulative request count and latency sum of this app, written atomically for the autoscaler.
+    Does nothing outside a deployment (SERVICE_KEY and INSTANCE_NAME unset).
+    """
+    def __init__(self):
+        self.requests = 0
+        self.latency_ms_sum = 0.0
+        self.lock = threading.Lock()
+        self.reported = None
+        self.path = None
+        service_key, instance_name = os.getenv("SERVICE_KEY"), os.getenv("INSTANCE_NAME")
+        if service_key and instance_name:
+            self.path = os.path.join(METRICS_DIR, f"{service_key}.{instance_name}.json")
+
+    def record(self, latency_ms, count=1):
+        with self.lock:
+            self.requests += count
+            self.latency_ms_sum += latency_ms
+
+    def write(self):
+        # Rewritten only when new requests came in
+        if not self.path or self.requests == self.reported:
+            return
+        with self.lock:
+            report = {"requests": self.requests, "latency_ms_sum": self.latency_ms_sum}
+        try:
+            os.makedirs(METRICS_DIR, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(report, f)
+            os.replace(tmp_path, self.path)
+            self.reported = report["requests"]
+        except OSError as e:
+            print(f"[ERROR] Failed to write metrics to {self.path}: {e}", file=sys.stderr, flush=True)
+
+    def start(self, interval=1.0):
+        # For servers without their own loop: report from a background thread
+        def report_loop():
+            while True:
+                time.sleep(interval)
+                self.write()
+
+        threading.Thread(target=report_loop, name="metrics", daemon=True).start()
+        return self
+
+
+class Connection:
+    __slots__ = ("sock", "decoder", "outbuf", "last_active", "closing", "events")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.decoder = FrameDecoder()
+        self.outbuf = []  # memoryviews still to send, headers and payloads
+        self.last_active = time.monotonic()
+        self.closing = False
+        self.events = selectors.EVENT_READ
+
+
+class FrameServer:
+    def __init__(self, handler, port, host="0.0.0.0", greet=False, persistent=None, idle_timeout=60.0,
+                 metrics_interval=1.0):
+        self.handler = handler  # request payload (None for the greeting) -> response str or bytes
+        self.port = port
+        self.host = host
+        self.greet = greet
+        if persistent is None:
+            persistent = os.getenv("PERSISTENT_CONNECTIONS", "1") != "0"
+        self.persistent = persistent
+        self.idle_timeout = idle_timeout
+        self.selector = selectors.DefaultSelector()
+        self.connections = {}  # socket: Connection
+        self.metrics = MetricsReporter()
+        self.metrics_interval = metrics_interval
+        # Every read lands in this one buffer: the loop is single-threaded
+        self.recv_buffer = bytearray(RECV_SIZE)
+        self.recv_view = memoryview(self.recv_buffer)
+
+    def serve_forever(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)  # Allow reuse of address
+        listener.bind((self.host, self.port))
+        listener.listen(1024)
+        listener.setblocking(False)
+        self.selector.register(listener, selectors.EVENT_READ, None)
+        next_housekeeping = time.monotonic() + self.metrics_interval
+        while True:
+            for key, mask in self.selector.select(timeout=self.metrics_interval):
+                if key.data is None:
+                    self._accept(listener)
+                    continue
+                if mask & selectors.EVENT_READ:
+                    self._read(key.data)
+                if mask & selectors.EVENT_WRITE:
+                    self._flush(key.data)
+            now = time.monotonic()
+            if now >= next_housekeeping:
+                next_housekeeping = now + self.metrics_interval
+                for conn in [c for c in self.connections.values() if now - c.last_active > self.idle_timeout]:
+                    self._close(conn)
+                self.metrics.write()
+
+    def _accept(self, listener):
+        # Drain the backlog: under load many clients are waiting at once
+        while True:
+            try:
+                sock, _ = listener.accept()
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                print(f"[ERROR] Accept failed on port {self.port}: {e}", flush=True)
+                return
+            sock.setblocking(False)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = Connection(sock)
+            self.connections[sock] = conn
+            self.selector.register(sock, selectors.EVENT_READ, conn)
+            if self.greet:
+                self._respond(conn, GREETING_ID, None)
+                self._flush(conn)
+
+    def _read(self, conn):
+        try:
+            n = conn.sock.recv_into(self.recv_view)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            n = 0
+        if not n:
+            self._close(conn)
+            return
+        conn.last_active = time.monotonic()
+        conn.decoder.feed(self.recv_view[:n])
+        try:
+            frames = conn.decoder.frames()
+        except ProtocolError as e:
+            print(f"[ERROR] Dropping client on port {self.port}: {e}", flush=True)
+            self._close(conn)
+            return
+        # Pipelined requests are all answered, then flushed together
+        for request_id, payload in frames:
+            if conn.closing:
+                break
+            self._respond(conn, request_id, payload)
+        self._flush(conn)
+
+    def _respond(self, conn, request_id, payload):
+        start = time.perf_counter()
+        try:
+            buffers = frame(request_id, self.handler(payload))
+        except Exception as e:
+            buffers = frame(request_id, f"ERROR {e}")
+            print(f"[ERROR] Request failed on port {self.port}: {e}", flush=True)
+        conn.outbuf.extend(buffers)
+        self.metrics.record((time.perf_counter() - start) * 1000)
+        # Without persistent connections every connection carries a single response
+        if not self.persistent:
+            conn.closing = True
+
+    def _flush(self, conn):
+        if conn.sock not in self.connections:
+            return
+        try:
+            while conn.outbuf:
+                sent = conn.sock.sendmsg(conn.outbuf[:MAX_BUFFERS])
+                advance(conn.outbuf, sent)
+        except (BlockingIOError, InterruptedError):
+            pass
+        except OSError:
+            self._close(conn)
+            return
+        if not conn.outbuf and conn.closing:
+            self._close(conn)
+            return
+        events = selectors.EVENT_READ | (selectors.EVENT_WRITE if conn.outbuf else 0)
+        if events != conn.events:
+            conn.events = events
+            self.selector.modify(conn.sock, events, conn)
+
+    def _close(self, conn):
+        if self.connections.pop(conn.sock, None) is None:
+            return
+        self.selector.unregister(conn.sock)
+        conn.sock.close()
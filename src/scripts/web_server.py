@@ -1,46 +1,177 @@
 import requests
 import sys
-import time
 import os
+import json
+import time
 import random
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from requests.adapters import HTTPAdapter
+from server_runtime import MetricsReporter
 
 # port for the database service
 DB_PORT = 81
-# IP address of the database server from environment variable
+# IP addresses of the database replicas from environment variable, comma separated
 DB_IP = os.getenv('DB_IP')
+DB_IPS = [ip for ip in (DB_IP or "").split(",") if ip]
 # Get the service key to identify the output file
 SERVICE_KEY = os.getenv('SERVICE_KEY', 'unknown')
+# port of the web frontend
+LISTEN_PORT = int(os.getenv('LISTEN_PORT', 85))
+# Cached responses (0 disables the cache) and how long they stay valid
+CACHE_SIZE = int(os.getenv('CACHE_SIZE', 10000))
+CACHE_TTL = float(os.getenv('CACHE_TTL', 30))
+# Kept-alive connections to the database, one per concurrently served request at most
+DB_POOL_SIZE = 32
 
 # Ensure the /shared directory exists for output
 os.makedirs('/shared', exist_ok=True)
 
-def fetch_data_from_db(db_ip, item_id):
+
+class TTLCache:
+    """
+    LRU cache whose entries expire ttl seconds after being loaded. Concurrent misses on the
+    same key are coalesced: the first request loads it and the others wait for its result,
+    so a hot key expiring sends one request to the database instead of one per client.
+    """
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key: (expiry, value)
+        self.loading = {}  # key: Future of the load in progress
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def get(self, key, load):
+        if self.maxsize <= 0:
+            with self.lock:
+                self.misses += 1
+            return load(key)
+        leader = False
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            future = self.loading.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                self.misses += 1
+                future = self.loading[key] = Future()
+                leader = True
+        if not leader:
+            return future.result()
+        try:
+            value = load(key)
+        except Exception as e:
+            # Failures are not cached: the waiting requests get the error, the next one retries
+            with self.lock:
+                del self.loading[key]
+            future.set_exception(e)
+            raise
+        with self.lock:
+            del self.loading[key]
+            self.entries[key] = (time.monotonic() + self.ttl, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        future.set_result(value)
+        return value
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {"hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                    "evictions": self.evictions, "size": len(self.entries), "maxsize": self.maxsize,
+                    "ttl_s": self.ttl, "hit_ratio": round(self.hits / lookups, 4) if lookups else None}
+
+
+def db_session():
+    # One session for all threads: its pools, one per database replica, keep the connections alive between requests
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max(1, len(DB_IPS)), pool_maxsize=DB_POOL_SIZE, pool_block=True)
+    session.mount("http://", adapter)
+    return session
+
+
+def fetch_data_from_db(session, db_ip, item_id):
     """
-    Fetches data from the database server.
+    Fetches data from the database server. Returns (status, text); a missing item is a 404.
     """
     url = f"http://{db_ip}:{DB_PORT}/{item_id}"
-    try:
-        # HTTP GET request to the database server
-        response = requests.get(url, timeout=5)
-        response.raise_for_status() # Raise HTTPError for bad responses (4xx or 5xx)
-        return response.text
-    except requests.exceptions.RequestException as e:
-        return f"Error fetching from DB ({db_ip}): {e}"
+    # HTTP GET request to the database server
+    response = session.get(url, timeout=5)
+    if response.status_code >= 500:
+        response.raise_for_status()  # Raise HTTPError for server errors, which are not cached
+    return response.status_code, response.text
+
+
+def make_handler(cache, load, metrics):
+    class Handler(BaseHTTPRequestHandler):
+        """
+        GET /<item_id>  the item, through the cache
+        GET /stats      cache hit/miss counters as JSON
+        """
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            start = time.perf_counter()
+            item_id = self.path.split("?")[0].strip("/")
+            if item_id == "stats":
+                self._reply(200, json.dumps(cache.stats()).encode(), "application/json")
+                return
+            try:
+                status, text = cache.get(item_id, load)
+                self._reply(status, text.encode(), "text/plain")
+            except requests.exceptions.RequestException as e:
+                self._reply(502, f"Error fetching from DB ({DB_IP}): {e}".encode(), "text/plain")
+            metrics.record((time.perf_counter() - start) * 1000)
+
+        def _reply(self, status, body, content_type):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
 
 if __name__ == "__main__":
     # standard output is flushed immediately
-    sys.stdout.flush() 
+    sys.stdout.flush()
     print(f"Web server started. Attempting to connect to DB at {DB_IP}:{DB_PORT}")
 
-    if not DB_IP:
+    if not DB_IPS:
         print("[ERROR] DB_IP environment variable not set. Exiting.")
         sys.exit(1)
 
+    session = db_session()
+    cache = TTLCache(CACHE_SIZE, CACHE_TTL)
+    # Requests take the database replicas in turn, so every replica gets a share of the load
+    db_ips = itertools.cycle(DB_IPS)
+    load = lambda item_id: fetch_data_from_db(session, next(db_ips), item_id)
+
     result_data = []
     item_id = str(random.randint(1, 4))
-    # Give the database server some time to start up
-    time.sleep(2)
-    data = fetch_data_from_db(DB_IP, item_id)
+    # The database passed its readiness probe before this app was started
+    try:
+        data = cache.get(item_id, load)[1]
+    except requests.exceptions.RequestException as e:
+        data = f"Error fetching from DB ({DB_IP}): {e}"
     print(f"Fetched data (item {item_id}): {data}")
     result_data.append(f"Item {item_id}: {data}")
 
@@ -49,3 +180,10 @@ if __name__ == "__main__":
     with open(output_path, 'w') as f:
         f.write("\n".join(result_data))
     print(f"Web server results written to {output_path}")
+
+    metrics = MetricsReporter().start()
+    ThreadingHTTPServer.request_queue_size = 128
+    httpd = ThreadingHTTPServer(("0.0.0.0", LISTEN_PORT), make_handler(cache, load, metrics))
+    httpd.daemon_threads = True
+    print(f"Web server listening on 0.0.0.0:{LISTEN_PORT} (cache size {CACHE_SIZE}, TTL {CACHE_TTL}s)", flush=True)
+    httpd.serve_forever()
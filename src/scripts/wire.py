@@ -0,0 +1,188 @@
+import socket
+import struct
+
+# Length-prefixed framing shared by the TCP services (generators, fetchers, colab).
+#
+# Every message is a frame: an 8-byte header (payload length and request ID, unsigned 32-bit
+# big-endian) followed by the payload bytes. A reply carries the ID of its request, so clients
+# can pipeline: send several requests on one connection, then match the replies by ID. ID 0 is
+# the greeting some servers send as soon as a client connects.
+#
+# Sends gather the header and the payload with sendmsg, receives fill preallocated buffers with
+# recv_into: payloads are never concatenated or sliced into copies on the way.
+
+HEADER = struct.Struct("!II")
+GREETING_ID = 0
+MAX_PAYLOAD = 64 * 1024 * 1024
+# Buffers per sendmsg call, below the IOV_MAX of the platforms we run on
+MAX_BUFFERS = 512
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def _payload(payload):
+    return memoryview(payload.encode() if isinstance(payload, str) else payload).cast("B")
+
+
+def frame(request_id, payload):
+    """
+    The buffers of a frame, (header, payload view), to be sent with sendmsg.
+    """
+    payload = _payload(payload)
+    if len(payload) > MAX_PAYLOAD:
+        raise ProtocolError(f"Payload of {len(payload)} bytes exceeds {MAX_PAYLOAD}")
+    return HEADER.pack(len(payload), request_id), payload
+
+
+def send_buffers(sock, buffers):
+    """
+    Sends a list of buffers with as few sendmsg calls as the socket allows, on a blocking socket.
+    """
+    buffers = [memoryview(b).cast("B") for b in buffers if len(b)]
+    while buffers:
+        sent = sock.sendmsg(buffers[:MAX_BUFFERS])
+        buffers = advance(buffers, sent)
+
+
+def advance(buffers, sent):
+    """
+    Drops sent bytes from the front of a list of memoryviews; a partly sent one is sliced, not copied.
+    """
+    while sent:
+        if sent >= len(buffers[0]):
+            sent -= len(buffers.pop(0))
+        else:
+            buffers[0] = buffers[0][sent:]
+            sent = 0
+    return buffers
+
+
+def send_frame(sock, request_id, payload):
+    send_buffers(sock, frame(request_id, payload))
+
+
+def recv_into_exact(sock, view):
+    """
+    Fills a writable memoryview from a blocking socket. Returns the number of bytes read,
+    less than len(view) only if the peer closed the connection first.
+    """
+    filled = 0
+    while filled < len(view):
+        n = sock.recv_into(view[filled:])
+        if n == 0:
+            break
+        filled += n
+    return filled
+
+
+def recv_frame(sock):
+    """
+    Reads one frame from a blocking socket. Returns (request ID, payload bytearray), or None if
+    the peer closed the connection between frames.
+    """
+    header = bytearray(HEADER.size)
+    n = recv_into_exact(sock, memoryview(header))
+    if n == 0:
+        return None
+    if n < HEADER.size:
+        raise ConnectionError("Connection closed inside a frame header")
+    length, request_id = HEADER.unpack(header)
+    if length > MAX_PAYLOAD:
+        raise ProtocolError(f"Frame of {length} bytes exceeds {MAX_PAYLOAD}")
+    payload = bytearray(length)
+    if recv_into_exact(sock, memoryview(payload)) < length:
+        raise ConnectionError("Connection closed inside a frame")
+    return request_id, payload
+
+
+class FrameDecoder:
+    """
+    Splits a byte stream into frames for non-blocking readers: feed() whatever was received,
+    frames() returns the complete frames so far as (request ID, payload bytes).
+    """
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+
+    def frames(self):
+        frames = []
+        pos = 0
+        with memoryview(self.buffer) as view:
+            while len(self.buffer) - pos >= HEADER.size:
+                length, request_id = HEADER.unpack_from(self.buffer, pos)
+                if length > MAX_PAYLOAD:
+                    raise ProtocolError(f"Frame of {length} bytes exceeds {MAX_PAYLOAD}")
+                end = pos + HEADER.size + length
+                if end > len(self.buffer):
+                    break
+                frames.append((request_id, bytes(view[pos + HEADER.size:end])))
+                pos = end
+        del self.buffer[:pos]
+        return frames
+
+    def __len__(self):
+        return len(self.buffer)
+
+
+class Connection:
+    """
+    Blocking client connection. request() is one round trip; send() and receive() pipeline,
+    with replies matched to their request by ID whatever order they arrive in.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.next_id = 1
+        self.replies = {}  # request ID: payload received ahead of its receive() call
+
+    @classmethod
+    def connect(cls, ip, port, timeout=10):
+        sock = socket.create_connection((ip, port), timeout=timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return cls(sock)
+
+    def send(self, payload):
+        request_id = self.next_id
+        # IDs wrap around and skip the greeting's
+        self.next_id = request_id % 0xFFFFFFFF + 1
+        send_frame(self.sock, request_id, payload)
+        return request_id
+
+    def receive(self, request_id):
+        while request_id not in self.replies:
+            received = recv_frame(self.sock)
+            if received is None:
+                raise ConnectionError("Connection closed before the reply")
+            self.replies[received[0]] = received[1]
+        return self.replies.pop(request_id)
+
+    def request(self, payload):
+        return self.receive(self.send(payload))
+
+    def pipeline(self, payloads):
+        """
+        Sends every request before reading any reply. Returns the replies in request order.
+        """
+        buffers = []
+        request_ids = []
+        for payload in payloads:
+            request_ids.append(self.next_id)
+            buffers.extend(frame(self.next_id, payload))
+            self.next_id = self.next_id % 0xFFFFFFFF + 1
+        send_buffers(self.sock, buffers)
+        return [self.receive(request_id) for request_id in request_ids]
+
+    def greeting(self):
+        return self.receive(GREETING_ID)
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,190 @@
+import os
+import sys
+import json
+import signal
+import socket
+import runpy
+import selectors
+import traceback
+
+# Pre-forked service runtime, one per Mininet host.
+# Usage: zygote.py <control socket path>
+# The zygote imports the modules shared by the service scripts once, then forks a
+# child per spawn request so apps skip interpreter startup and imports.
+#
+# Control protocol (one request per connection, JSON terminated by a newline):
+#   {"op": "spawn", "argv": [...], "env": {...}, "cgroup": [cgroup.procs paths]}
+#       + 2 fds (stdout, stderr) via SCM_RIGHTS -> {"pid": <pid>}, then {"returncode": <int>}
+#       once the child exits, after which the connection is closed
+#   {"op": "ping"} -> {"ok": true}
+
+# Modules used by the service scripts, imported once here and inherited by every child
+import random
+import time
+import datetime
+import http.server
+import http.client
+import socketserver
+try:
+    import requests
+except ImportError:
+    requests = None
+
+exit_codes = {}  # pid: returncode, filled by the SIGCHLD reaper
+children = set()
+watchers = {}  # pid: spawn connection waiting for the child's exit status
+
+
+def reap_children(signum, frame):
+    """Collects the exit status of finished children so they never linger as zombies."""
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        children.discard(pid)
+        if os.WIFSIGNALED(status):
+            exit_codes[pid] = -os.WTERMSIG(status)
+        else:
+            exit_codes[pid] = os.WEXITSTATUS(status)
+
+
+def report_exits():
+    """Sends the exit status of every finished child on its spawn connection and closes it."""
+    while exit_codes:
+        pid, returncode = exit_codes.popitem()
+        conn = watchers.pop(pid, None)
+        if conn is None:
+            continue
+        try:
+            conn.sendall((json.dumps({"returncode": returncode}) + "\n").encode())
+        except OSError:
+            pass
+        conn.close()
+
+
+def run_child(inherited, argv, env, out_fd, err_fd, cgroup):
+    """Runs in the forked child: becomes a session leader and executes the script as __main__."""
+    # The zygote's sockets (listener, wakeup pair, spawn connections) are not the app's
+    signal.set_wakeup_fd(-1)
+    for obj in inherited:
+        obj.close()
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # New session and process group, like preexec_fn=os.setsid with popen
+    os.setsid()
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.dup2(out_fd, 1)
+    os.dup2(err_fd, 2)
+    for fd in (devnull, out_fd, err_fd):
+        os.close(fd)
+    # Move into the app's own cgroup before the script runs, so its limits apply from the start
+    for path in cgroup:
+        try:
+            with open(path, "w") as f:
+                f.write(str(os.getpid()))
+        except OSError as e:
+            print(f"[WARNING] Could not join cgroup {path}: {e}", file=sys.stderr, flush=True)
+    os.environ.clear()
+    os.environ.update(env)
+    script = argv[1]
+    sys.argv = argv[1:]
+    sys.path[0] = os.path.dirname(script)
+    code = 0
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(code)
+
+
+def handle(inherited, conn):
+    """
+    Serves one request. Returns True if conn was kept open to report a child's exit status.
+    """
+    msg, fds, _, _ = socket.recv_fds(conn, 65536, 2)
+    while not msg.endswith(b"\n"):
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        msg += chunk
+    request = json.loads(msg.decode())
+    if request["op"] == "ping":
+        conn.sendall((json.dumps({"ok": True}) + "\n").encode())
+        return False
+    if request["op"] != "spawn" or len(fds) != 2:
+        for fd in fds:
+            os.close(fd)
+        conn.sendall((json.dumps({"error": "bad request"}) + "\n").encode())
+        return False
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        run_child(inherited + [conn] + list(watchers.values()), request["argv"], request["env"], fds[0], fds[1],
+                  request.get("cgroup", []))
+    children.add(pid)
+    for fd in fds:
+        os.close(fd)
+    conn.sendall((json.dumps({"pid": pid}) + "\n").encode())
+    # The exit status follows on this connection (report_exits)
+    watchers[pid] = conn
+    return True
+
+
+def shutdown(signum, frame):
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    socket_path = sys.argv[1]
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    # SIGCHLD writes to the wakeup socket, so the loop below reports exits as soon as they happen
+    wake_r, wake_w = socket.socketpair()
+    wake_r.setblocking(False)
+    wake_w.setblocking(False)
+    signal.set_wakeup_fd(wake_w.fileno())
+    signal.signal(signal.SIGCHLD, reap_children)
+    signal.signal(signal.SIGTERM, shutdown)
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as listener:
+        listener.bind(socket_path)
+        listener.listen(64)
+        selector = selectors.DefaultSelector()
+        selector.register(listener, selectors.EVENT_READ)
+        selector.register(wake_r, selectors.EVENT_READ)
+        inherited = [listener, wake_r, wake_w, selector]
+        print(f"Zygote ready on {socket_path}", flush=True)
+        try:
+            while True:
+                for key, _ in selector.select():
+                    if key.fileobj is wake_r:
+                        try:
+                            while wake_r.recv(4096):
+                                pass
+                        except BlockingIOError:
+                            pass
+                        continue
+                    conn, _ = listener.accept()
+                    kept = False
+                    try:
+                        kept = handle(inherited, conn)
+                    except Exception as e:
+                        print(f"[ERROR] Zygote request failed: {e}", flush=True)
+                    finally:
+                        if not kept:
+                            conn.close()
+                report_exits()
+        finally:
+            os.unlink(socket_path)
@@ -3,211 +3,782 @@ import time
 import signal
 import subprocess
 import random
-from flow import FlowManager
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flow import FlowManager, FlowEntry
+from qos import QosManager
+from cgroups import CgroupManager
+from logs import LogDrainer
+from catalog import ServiceCatalog, base_app, replica_name, replica_index
+from runtime import ZygotePool
+from supervisor import Supervisor
+from autoscaler import Autoscaler
+from journal import DeploymentJournal
+from metrics import metrics
 
 class ServiceManager:
-    def __init__(self, controller=None):
-        self.service_instances = {}  # (service_key, app_name): {host, process, ip, listen_port}
+    def __init__(self, controller=None, log_spill_dir=None, spec_path=None, runtime="popen", state_dir=None,
+                 ryu_api_url="http://localhost:8080"):
+        self.service_instances = {}  # (service_key, instance_name): {host, process, ip, listen_port, base_app, pins, ...}
         self.host_app_counts = {}
         self.host_max_apps = 2
-        self.flow_manager = FlowManager()
+        # Per-host CPU (cores) and memory (MiB) budgets, e.g. of CPU-limited hosts; empty: only app counts are checked
+        self.host_capacity = {}
+        self.cgroups = None
+        self.flow_manager = FlowManager(ryu_api_url)
+        self.ryu_api_url = ryu_api_url
         self.active_flows = {}
-        self.service_counters = {k: 0 for k in ["web", "random", "datetime", "colab"]}
-        self.service_definitions = {
-            "web": [
-                ("database", "python3 /shared/scripts/database.py", {"LISTEN_PORT": "81"}),
-                ("web_server", "python3 /shared/scripts/web_server.py", {"DB_IP": None, "LISTEN_PORT": "85"})
-            ],
-            "random": [
-                ("random_gen1", "python3 /shared/scripts/random_gen1.py", {"LISTEN_PORT": "5000"}),
-                ("random_gen2", "python3 /shared/scripts/random_gen2.py", {"LISTEN_PORT": "5001"}),
-                ("random_sum", "python3 /shared/scripts/random_sum.py", {"GEN1_IP": None, "GEN2_IP": None, "LISTEN_PORT": "8083"})
-            ],
-            "datetime": [
-                ("date_fetcher", "python3 /shared/scripts/date_fetcher.py", {"LISTEN_PORT": "5002"}),
-                ("time_fetcher", "python3 /shared/scripts/time_fetcher.py", {"LISTEN_PORT": "5003"}),
-                ("datetime_combiner", "python3 /shared/scripts/datetime_combiner.py", {"DATE_IP": None, "TIME_IP": None, "LISTEN_PORT": "8081"})
-            ],
-            "colab": [
-                ("colab_a", "python3 /shared/scripts/colab_a.py", {"COLAB_B_IP": None, "LISTEN_PORT": "8082"}),
-                ("colab_b", "python3 /shared/scripts/colab_b.py", {"LISTEN_PORT": "5004"})
-            ]
-        }
+        # Apps, ports, dependencies and readiness probes come from the service spec file
+        self.catalog = ServiceCatalog.load(spec_path)
+        self.service_definitions = self.catalog.definitions()
+        self.service_counters = {k: 0 for k in self.catalog.names()}
         self.controller = controller
         self.flow_modification_queue = None
-        
-         
+        # Drains every app's stdout/stderr so servers never block on a full pipe
+        self.log_drainer = LogDrainer(spill_dir=log_spill_dir)
+        # Apps of a service start in parallel: guard shared state and each host's shell
+        self.lock = threading.Lock()
+        self._host_locks = {}
+        # Stop, scale and relocate of one service must not interleave
+        self._service_locks = {}
+        # "popen" starts a fresh interpreter per app, "zygote" forks apps from a pre-warmed process per host
+        self.runtime = runtime
+        self.zygotes = ZygotePool() if runtime == "zygote" else None
+        self.supervisor = None
+        self.autoscaler = None
+        # Deploy, stop and flow events are journaled so a restarted network can be restored
+        self.journal = DeploymentJournal(state_dir)
+        self.flow_manager.journal = self.journal
+
     def get_flow_queue(self):
         return self.flow_modification_queue
 
-    def _find_available_host(self, net, used_hosts=None):
+    def _find_available_host(self, net, used_hosts=None, resources=None):
         # used_hosts: set of host names already used for this service_key
+        # resources: the app's requested resources, which must fit in the host's capacity left
         if used_hosts is None:
             used_hosts = set()
+        loads = self._host_loads()
         candidates = [host for host in net.hosts
                       if self.host_app_counts.get(host.name, 0) < self.host_max_apps
-                      and host.name not in used_hosts]
+                      and host.name not in used_hosts and self._fits(loads, host.name, resources or {})]
         if candidates:
             return random.choice(candidates)
         return None
 
-    def deploy_service_instance(self, net, service_key, app_name, command, env_vars, host=None, used_hosts=None):
+    def _host_lock(self, host):
+        # Mininet host shells are not safe to drive from several threads at once
+        with self.lock:
+            return self._host_locks.setdefault(host.name, threading.Lock())
+
+    def _service_lock(self, service_key):
+        with self.lock:
+            return self._service_locks.setdefault(service_key, threading.RLock())
+
+    @staticmethod
+    def _service_name(service_key):
+        return service_key.rsplit("-", 1)[0]
+
+    def _host_loads(self):
+        """
+        CPU and memory in use per host: {host name: {"cpu": cores, "memory_mb": MiB}}. Each app counts
+        with the larger of its requested resources and its measured usage. Empty without host_capacity.
+        """
+        loads = {}
+        if not self.host_capacity:
+            return loads
+        for (service_key, app_name), instance in list(self.service_instances.items()):
+            requested = self._resources(service_key, app_name)
+            used = instance.get("usage") or {}
+            load = loads.setdefault(instance["host"].name, {})
+            for resource in self.host_capacity:
+                load[resource] = load.get(resource, 0) + max(requested.get(resource) or 0, used.get(resource) or 0)
+        return loads
+
+    def _resources(self, service_key, instance_name):
+        # CPU and memory requested by an app instance in the catalog
+        return self.catalog.app(self._service_name(service_key), base_app(instance_name))["resources"]
+
+    def _fits(self, loads, host_name, resources):
+        # True if the host has the capacity left for an app with these requested resources
+        load = loads.get(host_name, {})
+        return all(load.get(resource, 0) + (resources.get(resource) or 0) <= capacity
+                   for resource, capacity in self.host_capacity.items())
+
+    def _place_service(self, net, service_name, used_hosts=None, temp_counts=None, temp_loads=None):
+        """
+        Picks a host for every app replica of a service without starting anything.
+        Hosts in used_hosts are avoided when possible, then any host with a free slot is accepted.
+        With host_capacity set, a host must also have the CPU and memory the app requests left.
+        Returns {instance_name: host}, or None if the service does not fit.
+        """
+        if used_hosts is None:
+            used_hosts = set()
+        if temp_counts is None:
+            temp_counts = self.host_app_counts.copy()
+        if temp_loads is None:
+            temp_loads = self._host_loads()
+        placement = {}
+        for instance_name in self.catalog.instances(service_name):
+            resources = self.catalog.app(service_name, base_app(instance_name))["resources"]
+            free = [h for h in net.hosts
+                    if temp_counts.get(h.name, 0) < self.host_max_apps and self._fits(temp_loads, h.name, resources)]
+            candidates = [h for h in free if h.name not in used_hosts]
+            # Fallback: if not enough hosts, allow reuse for this service instance
+            if not candidates and used_hosts:
+                candidates = free
+            if not candidates:
+                return None
+            host = random.choice(candidates)
+            placement[instance_name] = host
+            used_hosts.add(host.name)
+            temp_counts[host.name] = temp_counts.get(host.name, 0) + 1
+            load = temp_loads.setdefault(host.name, {})
+            for resource in self.host_capacity:
+                load[resource] = load.get(resource, 0) + (resources.get(resource) or 0)
+        return placement
+
+    def _pin_dependencies(self, service_name, instance_name, placement):
+        """
+        Pins an app instance to every replica of each of its dependencies in placement. The instance
+        gets the IPs of all of them and spreads its requests over them, so a single client instance
+        loads every replica. Returns {dependency app: [dependency instance names]}.
+        """
+        return {dep: sorted((name for name in placement if base_app(name) == dep), key=replica_index)
+                for dep in self.catalog.app(service_name, base_app(instance_name))["depends_on"]}
+
+    @staticmethod
+    def _dependency_ips(pins, placement):
+        # Value of each dependency's environment variable: the IPs of its pinned replicas, comma separated
+        return {dep: ",".join(placement[name].IP() for name in replicas if name in placement) or None
+                for dep, replicas in pins.items()}
+
+    def _flow_endpoints(self, service_key, placement, pins):
+        """
+        (src_ip, dst_ip, dst_port, protocol) of both directions of the flow pairs a service needs, as they appear
+        in flow keys: ICMP between the hosts of placement and TCP from each instance to the replicas in pins
+        ({instance name: {dependency app: [dependency instance names]}}). Pins to replicas gone from placement are skipped.
+        """
+        TCP = 6
+        ICMP = 1
+        service_name = self._service_name(service_key)
+        ips = [host.IP() for host in placement.values()]
+        endpoints = set()
+        for i in range(len(ips)):
+            for j in range(i + 1, len(ips)):
+                endpoints.update({(ips[i], ips[j], None, ICMP), (ips[j], ips[i], None, ICMP)})
+        for instance_name, host in placement.items():
+            for dep, replicas in pins.get(instance_name, {}).items():
+                for dep_instance in replicas:
+                    if dep_instance not in placement:
+                        continue
+                    dep_ip = placement[dep_instance].IP()
+                    endpoints.update({(host.IP(), dep_ip, self.catalog.app(service_name, dep)["listen_port"], TCP),
+                                      (dep_ip, host.IP(), None, TCP)})
+        return endpoints
+
+    def _current_placement(self, service_key):
+        return {name: instance["host"] for (s_k, name), instance in list(self.service_instances.items()) if s_k == service_key}
+
+    @metrics.timed("deploy", key="service_key")
+    def _start_service(self, net, service_key, placement, workers=8):
+        """
+        Installs the flows of a placed service, then starts its apps along the dependency DAG.
+        Replicas and apps without pending dependencies start in parallel and every dependent
+        starts as soon as the dependency replicas pass their readiness probe. Rolls back on failure.
+        """
+        service_name = self._service_name(service_key)
+        self._install_flows_for_service(net, service_key, placement)
+        futures = {}
+        # Apps are submitted in dependency order, so the ones waiting always wait on apps already running
+        with ThreadPoolExecutor(max_workers=min(workers, len(placement))) as executor:
+            for level in self.catalog.levels(service_name):
+                for instance_name in [name for name in placement if base_app(name) in level]:
+                    pins = self._pin_dependencies(service_name, instance_name, placement)
+                    dep_futures = [futures[dep_instance] for replicas in pins.values() for dep_instance in replicas]
+                    futures[instance_name] = executor.submit(self._start_app, net, service_key, instance_name, placement, pins, dep_futures)
+            started = all([self._succeeded(service_key, name, future) for name, future in futures.items()])
+        if not started:
+            print(f"[ERROR] Failed to start {service_key}. Rolling back.")
+            self.stop_service_instance(service_key)
+        return started
+
+    @staticmethod
+    def _succeeded(service_key, instance_name, future):
+        # An exception raised while starting an app counts as a failed start
+        try:
+            return future.result()
+        except Exception as e:
+            print(f"[ERROR] Failed to start {instance_name} of {service_key}: {e}")
+            return False
+
+    def _start_app(self, net, service_key, instance_name, placement, pins, dep_futures):
+        # Block until every dependency replica this instance is pinned to is up and ready
+        # A dependency that raised is reported by _start_service
+        if not all(future.exception() is None and future.result() for future in dep_futures):
+            return False
+        service_name = self._service_name(service_key)
+        app_name = base_app(instance_name)
+        env_vars = self.catalog.resolve_env(service_name, app_name, self._dependency_ips(pins, placement))
+        host = placement[instance_name]
+        if not self.deploy_service_instance(net, service_key, instance_name, self.catalog.command(service_name, app_name), env_vars, host=host, pins=pins):
+            return False
+        return self._wait_until_ready(service_key, instance_name, host)
+
+    def _wait_until_ready(self, service_key, app_name, host):
+        probe = self.catalog.probe_command(self._service_name(service_key), base_app(app_name))
+        if not probe:
+            return True
+        start = time.time()
+        with metrics.span("readiness", service_key), self._host_lock(host):
+            output = host.cmd(probe)
+        if "READY" in output:
+            print(f"[INFO] {app_name} of {service_key} ready after {time.time() - start:.2f}s")
+            return True
+        print(f"[ERROR] {app_name} of {service_key} did not pass its readiness probe")
+        return False
+
+    def deploy_service_instance(self, net, service_key, app_name, command, env_vars, host=None, used_hosts=None, pins=None):
         if not host:
-            host = self._find_available_host(net, used_hosts)
+            host = self._find_available_host(net, used_hosts, self._resources(service_key, app_name))
         if not host:
             print(f"[ERROR] No available host for {service_key}-{app_name}")
             return False
-        env = {line.split('=', 1)[0]: line.split('=', 1)[1] for line in host.cmd("env").strip().split('\n') if '=' in line}
+        with metrics.span("env_capture", service_key), self._host_lock(host):
+            host_env = host.cmd("env")
+        env = {line.split('=', 1)[0]: line.split('=', 1)[1] for line in host_env.strip().split('\n') if '=' in line}
         env.update({k: v for k, v in env_vars.items() if v is not None})
         env["SERVICE_KEY"] = service_key
+        env["INSTANCE_NAME"] = app_name
         cmd_args = command.split()
+        cgroup = None
         try:
-            proc = host.popen(cmd_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, preexec_fn=os.setsid, env=env)
+            if self.cgroups:
+                cgroup = self.cgroups.create(host, service_key, app_name, self._resources(service_key, app_name))
+            with metrics.span("spawn", service_key):
+                proc = self._spawn(host, cmd_args, env, cgroup)
             self.service_instances[(service_key, app_name)] = {
+                "service_key": service_key,
+                "app": app_name,
+                "base_app": base_app(app_name),
+                "replica": replica_index(app_name),
+                "pins": dict(pins or {}),
                 "host": host,
                 "process": proc,
                 "ip": host.IP(),
-                "listen_port": int(env_vars.get("LISTEN_PORT", 0))
+                "listen_port": int(env_vars.get("LISTEN_PORT", 0)),
+                "command": command,
+                "env_vars": dict(env_vars),
+                "cgroup": cgroup,
+                "status": "running"
             }
-            self.host_app_counts[host.name] = self.host_app_counts.get(host.name, 0) + 1
+            self.log_drainer.register(service_key, app_name, proc)
+            self._journal_instance(self.service_instances[(service_key, app_name)])
+            with self.lock:
+                self.host_app_counts[host.name] = self.host_app_counts.get(host.name, 0) + 1
             print(f"[INFO] {app_name} of {service_key} deployed on {host.name} ({host.IP()})")
             return True
         except Exception as e:
             print(f"[ERROR] Failed to deploy {app_name}: {e}")
+            if cgroup and (service_key, app_name) not in self.service_instances:
+                self.cgroups.remove(cgroup)
             return False
 
+    @metrics.timed("stop", key="service_key")
     def stop_service_instance(self, service_key):
-        # Stop all apps for this service_key
-        for (s_k, a_n) in list(self.service_instances.keys()):
-            if s_k == service_key:
-                inst = self.service_instances[(s_k, a_n)]
-                proc = inst["process"]
-                host = inst["host"]
-                try:
-                    if proc and proc.poll() is None:
-                        os.killpg(os.getpgid(proc.pid), signal.SIGTERM)
-                        time.sleep(0.5)
-                        if proc.poll() is None:
-                            os.killpg(os.getpgid(proc.pid), signal.SIGKILL)
-                        proc.wait(timeout=1)
-                except Exception as e:
-                    print(f"[ERROR] Error terminating {a_n}: {e}")
-                self.host_app_counts[host.name] = max(0, self.host_app_counts.get(host.name, 1) - 1)
-                del self.service_instances[(s_k, a_n)]
-        self._remove_flows_for_service(service_key)
+        # Stop all apps (and all their replicas) for this service_key
+        with self._service_lock(service_key):
+            for (s_k, a_n) in list(self.service_instances.keys()):
+                if s_k == service_key:
+                    self._release_instance(s_k, a_n)
+            self._remove_flows_for_service(service_key)
         return True
 
+    def _release_instance(self, service_key, app_name):
+        # Terminates one app instance and frees its host slot
+        inst = self.service_instances[(service_key, app_name)]
+        proc = inst["process"]
+        host = inst["host"]
+        # Tell the supervisor this exit is expected
+        inst["status"] = "stopping"
+        try:
+            self._terminate(proc)
+        except Exception as e:
+            print(f"[ERROR] Error terminating {app_name}: {e}")
+        if self.cgroups:
+            self.cgroups.remove(inst.get("cgroup"))
+        with self.lock:
+            self.host_app_counts[host.name] = max(0, self.host_app_counts.get(host.name, 1) - 1)
+        self.log_drainer.forget(service_key, app_name)
+        del self.service_instances[(service_key, app_name)]
+        self.journal.record("stop", service_key=service_key, app=app_name)
+
+    @metrics.timed("scale", key="service_key")
+    def scale_app(self, net, service_key, app_name, replicas):
+        """
+        Scales one app of a running service to `replicas` instances. New replicas are started
+        next to the existing ones and removed replicas are the most recent ones; the other
+        replicas keep running. The clients of the app get flows to the new replicas and are
+        restarted with the new list of replica IPs.
+        """
+        with self._service_lock(service_key):
+            service_name = self._service_name(service_key)
+            current = sorted((name for (s_k, name) in self.service_instances if s_k == service_key and base_app(name) == app_name),
+                             key=replica_index)
+            if not current or replicas < 1:
+                print(f"[ERROR] Cannot scale {app_name} of {service_key} to {replicas}")
+                return False
+            if replicas > len(current):
+                next_index = replica_index(current[-1]) + 1
+                for index in range(next_index, next_index + replicas - len(current)):
+                    if not self._add_instance(net, service_key, replica_name(app_name, index)):
+                        return False
+            else:
+                for instance_name in current[replicas:][::-1]:
+                    self._remove_instance(service_key, instance_name)
+            self._rebalance_dependents(net, service_key, app_name)
+            self._rebalance_dependencies(net, service_key, app_name)
+            self.active_flows = self.flow_manager.get_active_flows()
+            print(f"[SUCCESS] {app_name} of {service_key} scaled to {replicas} replicas")
+            return True
+
+    def _add_instance(self, net, service_key, instance_name, env_overrides=None):
+        # Places one more app instance of a running service, wires its flows and starts it
+        TCP = 6
+        ICMP = 1
+        service_name = self._service_name(service_key)
+        app_name = base_app(instance_name)
+        placement = self._current_placement(service_key)
+        service_hosts = {host.name for host in placement.values()}
+        resources = self._resources(service_key, instance_name)
+        host = self._find_available_host(net, service_hosts, resources) or self._find_available_host(net, resources=resources)
+        if not host:
+            print(f"[ERROR] No available host for {instance_name} of {service_key}")
+            return False
+        placement[instance_name] = host
+        pins = self._pin_dependencies(service_name, instance_name, placement)
+        for other_host in {h.name: h for name, h in placement.items() if name != instance_name}.values():
+            self.flow_manager.add_flow_queue(net, service_key, host, other_host, ICMP)
+        for dep, replicas in pins.items():
+            for dep_instance in replicas:
+                self.flow_manager.add_flow_queue(net, service_key, host, placement[dep_instance], TCP, None,
+                                                 self.catalog.app(service_name, dep)["listen_port"])
+        env_vars = self.catalog.resolve_env(service_name, app_name, self._dependency_ips(pins, placement))
+        env_vars.update(env_overrides or {})
+        if not self.deploy_service_instance(net, service_key, instance_name, self.catalog.command(service_name, app_name),
+                                            env_vars, host=host, pins=pins):
+            return False
+        self._wait_until_ready(service_key, instance_name, host)
+        return True
+
+    def _remove_instance(self, service_key, instance_name):
+        ip = self.service_instances[(service_key, instance_name)]["ip"]
+        self._release_instance(service_key, instance_name)
+        # Drop the instance's flows by key, keeping the ones the service's apps left on its host still use.
+        # Its clients lose their flows to it here and are re-pinned by _rebalance_dependents.
+        keep = self._flow_endpoints(service_key, self._current_placement(service_key), self._current_pins(service_key))
+        self.flow_manager.remove_flows_for_ip(service_key, ip, keep)
+
+    def _current_pins(self, service_key):
+        return {name: instance["pins"] for (s_k, name), instance in list(self.service_instances.items()) if s_k == service_key}
+
+    def start_loadgen(self, net, service_key, qps=None, concurrency=None, duration=None, payload_size=None, app_name="loadgen"):
+        """
+        Starts a load generator against a running service: an instance of the service's
+        loadgen app (declared with "replicas": 0 in the catalog), pinned and wired with flows
+        to its target like any dependent app. qps=0 runs it closed-loop, payload_size pads the
+        requests of TCP targets to that many bytes. Returns its instance name.
+        """
+        service_name = self._service_name(service_key)
+        if not any(s_k == service_key for (s_k, _) in self.service_instances):
+            raise ValueError(f"No running service {service_key}")
+        if app_name not in [app["name"] for app in self.catalog.apps(service_name)]:
+            raise ValueError(f"Service {service_name} has no {app_name} app")
+        running = [replica_index(name) for (s_k, name) in self.service_instances if s_k == service_key and base_app(name) == app_name]
+        instance_name = replica_name(app_name, max(running, default=0) + 1)
+        overrides = {"LOAD_QPS": qps, "LOAD_CONCURRENCY": concurrency, "LOAD_DURATION": duration, "LOAD_PAYLOAD_SIZE": payload_size}
+        if not self._add_instance(net, service_key, instance_name, {k: str(v) for k, v in overrides.items() if v is not None}):
+            return None
+        self._rebalance_dependencies(net, service_key, app_name)
+        self.active_flows = self.flow_manager.get_active_flows()
+        print(f"[SUCCESS] {instance_name} of {service_key} started")
+        return instance_name
+
+    def stop_loadgen(self, service_key, instance_name):
+        if base_app(instance_name) != "loadgen" or (service_key, instance_name) not in self.service_instances:
+            raise ValueError(f"No load generator {instance_name} in {service_key}")
+        self._remove_instance(service_key, instance_name)
+        self.active_flows = self.flow_manager.get_active_flows()
+        return True
+
+    def _rebalance_dependents(self, net, service_key, app_name):
+        # Re-pins the clients of app_name to its current replicas and rewires the ones whose replicas changed
+        TCP = 6
+        service_name = self._service_name(service_key)
+        placement = self._current_placement(service_key)
+        port = self.catalog.app(service_name, app_name)["listen_port"]
+        env_var_by_app = {dependent: self.catalog.app(service_name, dependent)["depends_on"][app_name]
+                          for dependent in self.catalog.dependents(service_name, app_name)}
+        clients = [name for (s_k, name), instance in list(self.service_instances.items())
+                   if s_k == service_key and instance["base_app"] in env_var_by_app]
+        replicas = sorted((name for name in placement if base_app(name) == app_name), key=replica_index)
+        # The flows still needed once the clients are re-pinned
+        pins = {name: dict(app_pins) for name, app_pins in self._current_pins(service_key).items()}
+        for name in clients:
+            pins[name][app_name] = replicas
+        keep = self._flow_endpoints(service_key, placement, pins)
+        for name in clients:
+            instance = self.service_instances[(service_key, name)]
+            old_pins = instance["pins"].get(app_name) or []
+            if old_pins == replicas:
+                continue
+            for old_pin in set(old_pins) - set(replicas):
+                old_instance = self.service_instances.get((service_key, old_pin))
+                # Another client on the same host may still be pinned to the old replica
+                if old_instance and (instance["ip"], old_instance["ip"], port, TCP) not in keep:
+                    self.flow_manager.remove_flow_pair(service_key, instance["ip"], old_instance["ip"], TCP, port)
+            for new_pin in set(replicas) - set(old_pins):
+                self.flow_manager.add_flow_queue(net, service_key, instance["host"], placement[new_pin], TCP, None, port)
+            instance["pins"][app_name] = replicas
+            instance["env_vars"][env_var_by_app[instance["base_app"]]] = self._dependency_ips({app_name: replicas}, placement)[app_name]
+            print(f"[INFO] {name} of {service_key} re-pinned from {old_pins} to {replicas}")
+            self._restart_app(instance, instance["command"], self._app_env(service_key, instance))
+            self._journal_instance(instance)
+
+    def _rebalance_dependencies(self, net, service_key, app_name):
+        # The instances of app_name are clients too: after adding or removing one, spread them over their dependencies again
+        for dep in self.catalog.app(self._service_name(service_key), app_name)["depends_on"]:
+            self._rebalance_dependents(net, service_key, dep)
+
+    @metrics.timed("restart", key=lambda args: args["instance"]["service_key"])
     def _restart_app(self, instance, command, env_updates):
         # Get the current process and host for the app instance
         process = instance["process"]
         host = instance["host"]
         try:
             # If the process is running, terminate it gracefully
-            if process and process.poll() is None:
-                os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-                time.sleep(0.5)
-                # If still running, force kill it
-                if process.poll() is None:
-                    os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-                process.wait(timeout=1)
+            self._terminate(process)
         except Exception:
             # Ignore errors during process termination
             pass
         # Prepare the environment variables for the new process
-        env = {line.split('=', 1)[0]: line.split('=', 1)[1] for line in host.cmd("env").strip().split('\n') if '=' in line}
+        with metrics.span("env_capture", instance["service_key"]), self._host_lock(host):
+            host_env = host.cmd("env")
+        env = {line.split('=', 1)[0]: line.split('=', 1)[1] for line in host_env.strip().split('\n') if '=' in line}
         env.update(env_updates)
         # Split the command into arguments
         cmd_args = command.split()
         # Start the new process with the updated environment
-        new_process = host.popen(cmd_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, preexec_fn=os.setsid, env=env)
-        # Update the instance with the new process
+        with metrics.span("spawn", instance["service_key"]):
+            new_process = self._spawn(host, cmd_args, env, instance.get("cgroup"))
+        # Update the instance with the new process and keep draining its output
         instance["process"] = new_process
+        self.log_drainer.register(instance["service_key"], instance["app"], new_process)
 
-    def control_services(self, net, action, service_name=None, selected_process=None, gui=None):
-        if action == "deploy":
-            if not service_name:
-                print("[ERROR] Service name required.")
-                return
-            app_defs = self.service_definitions.get(service_name)
-            needed_slots = len(app_defs)
-            available_slots = sum(self.host_max_apps - self.host_app_counts.get(h.name, 0) for h in net.hosts)
-            # If not enough space, stop as many colab instances as needed
-            if available_slots < needed_slots and service_name != "colab":
-                colab_keys = sorted({k[0] for k in self.service_instances if k[0].startswith("colab")})
-                stopped = 0
-                for colab_key in colab_keys:
-                    if available_slots >= needed_slots:
-                        break
-                    if self.stop_service_instance(colab_key):
-                        stopped += 1
-                        available_slots = sum(self.host_max_apps - self.host_app_counts.get(h.name, 0) for h in net.hosts)
-                if available_slots < needed_slots:
-                    print("[ERROR] Not enough space to deploy the service, even after stopping colab.")
-                    if gui:
-                        gui.test_results_text.config(state="normal")
-                        gui.test_results_text.insert("end", "Not enough space to deploy the service.\n")
-                        gui.test_results_text.config(state="disabled")
-                    return
-            self.service_counters[service_name] += 1
-            service_key = f"{service_name}-{self.service_counters[service_name]}"
-            used_hosts = set()
-            for idx, (app_name, command, env_vars) in enumerate(app_defs):
-                host = self._find_available_host(net, used_hosts)
-                # Fallback: if not enough hosts, allow reuse for this service instance
-                if not host and used_hosts:
-                    host = self._find_available_host(net)
-                if not self.deploy_service_instance(net, service_key, app_name, command, env_vars.copy(), host=host):
-                    print(f"[ERROR] Failed to deploy {app_name} for {service_key}. Rolling back.")
-                    self.stop_service_instance(service_key)
-                    return
-                if host:
-                    used_hosts.add(host.name)
+    def _terminate(self, process, grace=0.5):
+        # SIGTERM the app's process group and SIGKILL it if it is still running after the grace period
+        if not process or process.poll() is not None:
+            return
+        self._signal_group(process, signal.SIGTERM)
+        try:
+            process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            self._signal_group(process, signal.SIGKILL)
+            process.wait(timeout=1)
+
+    @staticmethod
+    def _signal_group(process, sig):
+        # Stand-in processes of the in-process backend (fakenet) handle signals themselves
+        if hasattr(process, "signal_group"):
+            process.signal_group(sig)
+        else:
+            os.killpg(os.getpgid(process.pid), sig)
+
+    def _spawn(self, host, cmd_args, env, cgroup=None):
+        # Both runtimes give the app its own process group, which stop_service_instance relies on,
+        # and move it into its cgroup (if any) before it runs
+        if self.zygotes:
+            try:
+                return self.zygotes.spawn(host, cmd_args, env, cgroup.procs_files if cgroup else None)
+            except (OSError, RuntimeError, ValueError) as e:
+                print(f"[WARNING] Zygote spawn failed on {host.name}, falling back to popen: {e}")
+        if cgroup is None:
+            return host.popen(cmd_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, preexec_fn=os.setsid, env=env)
+
+        def preexec():
+            os.setsid()
+            cgroup.join()
+        kwargs = {}
+        if getattr(host, "cgroup", None):
+            # CPULimitedHost.popen runs "mnexec -g <host>", which would move the app back to the host's cgroup
+            kwargs["mncmd"] = ["mnexec", "-da", str(host.pid)]
+        return host.popen(cmd_args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE, preexec_fn=preexec, env=env, **kwargs)
+
+    def _app_env(self, service_key, instance):
+        # Environment the app was deployed with, used to restart it identically
+        env = {k: v for k, v in instance["env_vars"].items() if v is not None}
+        env["SERVICE_KEY"] = service_key
+        env["INSTANCE_NAME"] = instance["app"]
+        return env
+
+    def probe_liveness(self, instance):
+        """
+        Lightweight TCP liveness check of an app's listen_port, run in its host's namespace.
+        """
+        host = instance["host"]
+        port = instance["listen_port"]
+        with self._host_lock(host):
+            output = host.cmd(f"timeout 1 bash -c ': > /dev/tcp/127.0.0.1/{port}' 2>/dev/null && echo ALIVE")
+        return "ALIVE" in output
+
+    @metrics.timed("relocate", key="service_key")
+    def relocate_app(self, net, service_key, app_name):
+        """
+        Moves an app that keeps failing to another host. The service's flows are reinstalled
+        for the new placement and the apps depending on it are restarted with its new IP.
+        The app is started on the new host before its old entry is released; if that fails,
+        the old entry is put back so the supervisor keeps handling it.
+        """
+        with self._service_lock(service_key):
+            # A concurrent stop or scale-down may have removed it since the supervisor looked
+            instance = self.service_instances.get((service_key, app_name))
+            if not instance or instance.get("status") == "stopping":
+                return False
+            old_host = instance["host"]
+            service_hosts = {inst["host"].name for (s_k, _), inst in list(self.service_instances.items()) if s_k == service_key}
+            resources = self._resources(service_key, app_name)
+            new_host = (self._find_available_host(net, service_hosts | {old_host.name}, resources)
+                        or self._find_available_host(net, {old_host.name}, resources))
+            if not new_host:
+                print(f"[ERROR] No host available to move {app_name} of {service_key}")
+                return False
+            status = instance["status"]
+            instance["status"] = "relocating"
+            process = instance["process"]
+            try:
+                if process and process.poll() is None:
+                    self._signal_group(process, signal.SIGKILL)
+                    process.wait(timeout=1)
+            except Exception:
+                pass
+            if not self.deploy_service_instance(net, service_key, app_name, instance["command"], instance["env_vars"], host=new_host, pins=instance["pins"]):
+                # Keep the old entry: its flows, pins and journal record still describe it
+                self.service_instances[(service_key, app_name)] = instance
+                instance["status"] = status
+                return False
+            if self.cgroups:
+                self.cgroups.remove(instance.get("cgroup"))
+            with self.lock:
+                self.host_app_counts[old_host.name] = max(0, self.host_app_counts.get(old_host.name, 1) - 1)
+            print(f"[INFO] Moved {app_name} of {service_key} from {old_host.name} to {new_host.name}")
+            self._remove_flows_for_service(service_key)
             self._install_flows_for_service(net, service_key)
-            self.active_flows = self.flow_manager.get_active_flows() # Update local active flows from FlowManager
+            self._wait_until_ready(service_key, app_name, new_host)
+            service_name = self._service_name(service_key)
+            moved_app = base_app(app_name)
+            # Restart the instances pinned to the moved replica with its new IP
+            placement = self._current_placement(service_key)
+            for (s_k, name), dep_instance in list(self.service_instances.items()):
+                if s_k == service_key and app_name in dep_instance["pins"].get(moved_app, ()):
+                    env_var = self.catalog.app(service_name, dep_instance["base_app"])["depends_on"][moved_app]
+                    dep_instance["env_vars"][env_var] = self._dependency_ips(dep_instance["pins"], placement)[moved_app]
+                    self._restart_app(dep_instance, dep_instance["command"], self._app_env(service_key, dep_instance))
+                    self._journal_instance(dep_instance)
+            return True
+
+    def _journal_instance(self, instance):
+        self.journal.record("deploy", service_key=instance["service_key"], app=instance["app"], host=instance["host"].name,
+                            command=instance["command"], env_vars=instance["env_vars"], pins=instance["pins"],
+                            listen_port=instance["listen_port"])
+
+    def record_topology(self, net, persist=True):
+        """
+        Starts a fresh deployment history for a newly started network (see DeploymentJournal.reset for persist).
+        """
+        self.journal.reset(persist)
+        self.journal.record("topology", hosts=[host.name for host in net.hosts])
+
+    @metrics.timed("restore")
+    def restore(self, net, workers=16):
+        """
+        Restores the deployment journaled by a previous run on the same topology: counters and
+        placement are replayed, all flows are installed in one parallel batch, then the apps are
+        spawned in parallel one dependency level at a time. The new history replaces the saved one
+        on disk only once the restore is over, so a restore that crashes can be retried.
+        Returns True if anything was restored.
+        """
+        start = time.time()
+        state = self.journal.load()
+        hosts = {host.name: host for host in net.hosts}
+        if not state["instances"]:
+            print("[INFO] No previous deployment to restore.")
+            self.record_topology(net)
+            return False
+        if state["hosts"] != list(hosts):
+            print("[ERROR] The saved deployment was made on a different topology, not restoring it.")
+            self.record_topology(net)
+            return False
+        # The restored history is rebuilt in memory and written out by the snapshot at the end
+        self.record_topology(net, persist=False)
+        self.service_counters.update(state["counters"])
+        self.journal.record("counters", counters=self.service_counters)
+        self.flow_manager.install_flows([FlowEntry.from_row(row) for row in state["flows"].values()], net=net)
+        self.active_flows = self.flow_manager.get_active_flows()
+        print(f"[INFO] Restored {len(state['flows'])} flows in {time.time() - start:.2f}s")
+
+        # Group instances by their app's DAG level so dependencies are up before their dependents
+        by_level = {}
+        for saved in state["instances"].values():
+            levels = self.catalog.levels(self._service_name(saved["service_key"]))
+            depth = next(i for i, level in enumerate(levels) if base_app(saved["app"]) in level)
+            by_level.setdefault(depth, []).append(saved)
+        restored = 0
+        with ThreadPoolExecutor(max_workers=min(workers, len(state["instances"]))) as executor:
+            for depth in sorted(by_level):
+                futures = [executor.submit(self._restore_instance, net, saved, hosts[saved["host"]]) for saved in by_level[depth]]
+                restored += sum(1 for future in futures if future.result())
+        self.journal.snapshot()
+        print(f"[SUCCESS] Restored {restored}/{len(state['instances'])} app instances in {time.time() - start:.2f}s")
+        return True
+
+    def _restore_instance(self, net, saved, host):
+        service_key, app_name = saved["service_key"], saved["app"]
+        if not self.deploy_service_instance(net, service_key, app_name, saved["command"], saved["env_vars"],
+                                            host=host, pins=saved["pins"]):
+            return False
+        return self._wait_until_ready(service_key, app_name, host)
+
+    def start_supervisor(self, net):
+        if not self.supervisor:
+            self.supervisor = Supervisor(self, net)
+        self.supervisor.start()
+
+    def enable_qos(self):
+        """
+        Gives the flows installed from now on the queue and meter of their service's QoS class.
+        """
+        if not self.flow_manager.qos:
+            self.flow_manager.qos = QosManager(self.catalog, self.ryu_api_url)
+            print(f"[INFO] QoS enabled: {', '.join(self.catalog.qos_classes) or 'no classes defined'}")
+
+    def enable_cgroups(self, host_capacity=None):
+        """
+        Runs every app deployed from now on in its own cgroup with the CPU and memory limits of its
+        app spec, and samples their usage. With host_capacity ({"cpu": cores, "memory_mb": MiB}) apps are
+        only placed on hosts with that much left, counting each app's request or measured usage.
+        """
+        if host_capacity:
+            self.host_capacity = dict(host_capacity)
+        if not self.cgroups:
+            self.cgroups = CgroupManager(self)
+            self.cgroups.start()
+            print(f"[INFO] App cgroups enabled (cgroup v{self.cgroups.version})")
+
+    def start_autoscaler(self, net):
+        if not self.autoscaler:
+            self.autoscaler = Autoscaler(self, net)
+        self.autoscaler.start()
+
+    def shutdown(self):
+        if self.autoscaler:
+            self.autoscaler.stop()
+        if self.supervisor:
+            self.supervisor.stop()
+        self.log_drainer.stop()
+        if self.cgroups:
+            self.cgroups.stop()
+        if self.zygotes:
+            self.zygotes.shutdown()
+        self.journal.close()
+
+    def get_instance_logs(self, service_key, app_name, lines=50):
+        return self.log_drainer.tail(service_key, app_name, lines)
+
+    def deploy_services(self, net, service_name, count=1, workers=8):
+        """
+        Deploys count instances of a service as one batch. Colab instances are stopped if the
+        batch needs their slots, hosts are reserved for every instance up front and the
+        instances then start in parallel, flows included. Returns the keys of the started instances.
+        """
+        if service_name not in self.catalog.services or service_name == "colab":
+            raise ValueError(f"Unknown service: {service_name}")
+        needed_slots = self.catalog.slots(service_name) * count
+        if self.available_slots(net) < needed_slots:
+            self.make_room(net, needed_slots)
+        temp_counts = self.host_app_counts.copy()
+        temp_loads = self._host_loads()
+        placements = []
+        with metrics.span("placement"):
+            for _ in range(count):
+                placement = self._place_service(net, service_name, temp_counts=temp_counts, temp_loads=temp_loads)
+                if placement is None:
+                    break
+                placements.append(placement)
+        if len(placements) < count:
+            print(f"[ERROR] No available hosts for {count - len(placements)} of {count} {service_name} instances.")
+        if not placements:
+            return []
+        service_keys = []
+        for _ in placements:
+            self.service_counters[service_name] += 1
+            service_keys.append(f"{service_name}-{self.service_counters[service_name]}")
+        self.journal.record("counters", counters={service_name: self.service_counters[service_name]})
+        with ThreadPoolExecutor(max_workers=min(workers, len(placements))) as executor:
+            started = list(executor.map(lambda args: self._start_service(net, *args), zip(service_keys, placements)))
+        self.active_flows = self.flow_manager.get_active_flows() # Update local active flows from FlowManager
+        deployed = [key for key, ok in zip(service_keys, started) if ok]
+        for service_key in deployed:
             print(f"[SUCCESS] Service '{service_key}' deployed.")
-            if gui:
-                gui.update_active_services()
-                gui.update_communication_results()
-        elif action == "stop":
-            if not selected_process:
-                print("[ERROR] No service instance selected to stop.")
-                return
-            parts = selected_process.split(', ')
-            service_key = parts[0].split(': ')[1]
-            if self.stop_service_instance(service_key):
-                print("[DEBUG] Calling try_redeploy_colab after stopping service")
-                self.try_redeploy_colab(net)
-                print("[DEBUG] Finished try_redeploy_colab")
-                print(f"[SUCCESS] Stopped {service_key}")
-            if gui:
-                gui.update_active_services()
-                gui.update_communication_results()
+        return deployed
+
+    def stop_services(self, net, service_keys, workers=8):
+        """
+        Stops several services in parallel, then fills the freed slots with colab once.
+        """
+        if not service_keys:
+            return []
+        with ThreadPoolExecutor(max_workers=min(workers, len(service_keys))) as executor:
+            list(executor.map(self.stop_service_instance, service_keys))
+        self.try_redeploy_colab(net)
+        for service_key in service_keys:
+            print(f"[SUCCESS] Stopped {service_key}")
+        return list(service_keys)
+
+    def available_slots(self, net):
+        return sum(self.host_max_apps - self.host_app_counts.get(h.name, 0) for h in net.hosts)
+
+    def make_room(self, net, needed_slots):
+        """
+        Colab instances are a preemptible buffer: stops them until needed_slots host slots are free.
+        Returns the number of free slots afterwards.
+        """
+        available_slots = self.available_slots(net)
+        colab_keys = sorted({k[0] for k in self.service_instances if k[0].startswith("colab")})
+        for colab_key in colab_keys:
+            if available_slots >= needed_slots:
+                break
+            if self.stop_service_instance(colab_key):
+                available_slots = self.available_slots(net)
+        return available_slots
 
     def deploy_colab_on_all_hosts(self, net):
         service_name = "colab"
-        app_defs = self.service_definitions[service_name]
+        # Apps started per instance; declared-only apps like the load generator do not count
+        slots = self.catalog.slots(service_name)
         used_hosts = set()
         for _ in net.hosts:
-            service_key = f"colab-{len(self.service_instances)//len(app_defs)+1}"
-            for app_name, command, env_vars in app_defs:
-                host = self._find_available_host(net, used_hosts)
-                # If no unused host, allow reuse for this service instance
-                if not host and used_hosts:
-                    host = self._find_available_host(net)
-                if not self.deploy_service_instance(net, service_key, app_name, command, env_vars.copy(), host=host):
-                    print(f"[ERROR] Failed to deploy {app_name} for {service_key}. Rolling back.")
-                    self.stop_service_instance(service_key)
-                    break
-                if host:
-                    used_hosts.add(host.name)
-            self._install_flows_for_service(net, service_key)
+            service_key = f"colab-{len(self.service_instances)//slots+1}"
+            placement = self._place_service(net, service_name, used_hosts)
+            if placement is None:
+                print(f"[ERROR] No available hosts for {service_key}.")
+                break
+            self._start_service(net, service_key, placement)
 
     def try_redeploy_colab(self, net):
         print("[DEBUG] try_redeploy_colab started")
         service_name = "colab"
-        app_defs = self.service_definitions[service_name]
 
-        used_hosts = set(inst["host"].name for (k, _), inst in self.service_instances.items() if k.startswith("colab"))
+        used_hosts = set(inst["host"].name for (k, _), inst in list(self.service_instances.items()) if k.startswith("colab"))
         print(f"[DEBUG] Used hosts for colab: {used_hosts}")
 
         existing_keys = set(k for (k, _) in self.service_instances if k.startswith("colab"))
@@ -221,42 +792,13 @@ class ServiceManager:
                 idx += 1
             service_key = f"colab-{idx}"
 
-            hosts_for_apps = []
-            used_hosts_for_this_colab = set()
-
-            for app_name, command, env_vars in app_defs:
-                # Trova host con almeno 1 slot libero basandosi su temp_host_app_counts
-                candidate_hosts = [h for h in net.hosts if temp_host_app_counts.get(h.name,0) < self.host_max_apps and h.name not in used_hosts_for_this_colab]
-                
-                if not candidate_hosts:
-                    # prova anche senza escludere usati per altre app di questo colab
-                    candidate_hosts = [h for h in net.hosts if temp_host_app_counts.get(h.name,0) < self.host_max_apps]
-                
-                if not candidate_hosts:
-                    print("[DEBUG] No more hosts available for this app, stopping deployment of this colab instance.")
-                    break
-                
-                # Scegli uno random tra i candidati
-                host = random.choice(candidate_hosts)
-                
-                hosts_for_apps.append((app_name, command, env_vars, host))
-                used_hosts_for_this_colab.add(host.name)
-                
-                # Aggiorna il conteggio temporaneo
-                temp_host_app_counts[host.name] = temp_host_app_counts.get(host.name,0) + 1
-
-            if len(hosts_for_apps) < len(app_defs):
+            # Simulate the allocation on the temporary counts before deploying
+            placement = self._place_service(net, service_name, temp_counts=temp_host_app_counts)
+            if placement is None:
+                print("[DEBUG] No more hosts available for this app, stopping deployment of this colab instance.")
                 break
 
-            success = True
-            for app_name, command, env_vars, host in hosts_for_apps:
-                if not self.deploy_service_instance(net, service_key, app_name, command, env_vars.copy(), host=host):
-                    print(f"[ERROR] Failed to deploy {app_name} on {host.name} for {service_key}")
-                    success = False
-                    break
-
-            if success:
-                self._install_flows_for_service(net, service_key)
+            if self._start_service(net, service_key, placement):
                 existing_keys.add(service_key)
                 idx += 1
             else:
@@ -291,18 +833,18 @@ class ServiceManager:
     
     def test_service(self, service_key_to_test):
         test_results = {}
-        client_map = {"web": "web_server", "random": "random_sum", "datetime": "datetime_combiner", "colab": "colab_a"}
-        for prefix, client_app in client_map.items():
-            if service_key_to_test.startswith(prefix):
-                break
-        else:
+        service_name = self._service_name(service_key_to_test)
+        client_app = self.catalog.client(service_name) if service_name in self.catalog.services else None
+        if not client_app:
             test_results[service_key_to_test] = "Error: No client application defined."
             return test_results
-        instance = next((info for (s_k, a_n), info in self.service_instances.items() if s_k == service_key_to_test and a_n == client_app), None)
+        # Deploys and stops change service_instances while a test waits for its result
+        instance = next((info for (s_k, a_n), info in list(self.service_instances.items()) if s_k == service_key_to_test and a_n == client_app), None)
         if instance:
             host = instance["host"]
             output_file = f"/shared/{service_key_to_test}.txt"
-            content = self.wait_for_file_content(host, output_file)
+            with metrics.span("result_wait", service_key_to_test):
+                content = self.wait_for_file_content(host, output_file)
             if content:
                 test_results[service_key_to_test] = content
             else:
@@ -313,24 +855,30 @@ class ServiceManager:
 
     def clean_shared_folder(self):
         shared_folder = "/shared"
-        if os.path.exists(shared_folder):
-            for filename in os.listdir(shared_folder):
-                file_path = os.path.join(shared_folder, filename)
+        # Load generator summaries and app metrics of a previous run would be merged into this run's
+        for folder in (shared_folder, os.path.join(shared_folder, "loadgen"), os.path.join(shared_folder, "metrics")):
+            if not os.path.exists(folder):
+                continue
+            for filename in os.listdir(folder):
+                file_path = os.path.join(folder, filename)
                 try:
                     if os.path.isfile(file_path) or os.path.islink(file_path):
                         os.unlink(file_path)
                 except Exception as e:
                     print(f"[ERROR] Failed to delete {file_path}: {e}")
+        if os.path.exists(shared_folder):
             print(f"[INFO] Cleaned up /shared folder.")
 
     def update_gui_with_active_services(self):
-        return [f"Service: {s_k}, App: {a_n}, Host: {instance['host'].name}, IP: {instance['ip']}" for (s_k, a_n), instance in self.service_instances.items()]
+        return [f"Service: {s_k}, App: {a_n}, Host: {instance['host'].name}, IP: {instance['ip']}, Status: {instance['status']}" for (s_k, a_n), instance in list(self.service_instances.items())]
 
     def update_gui_with_active_flows(self):
+        # Compact rows: a copy the GUI can keep without holding on to the live flow table
         self.active_flows = self.flow_manager.get_active_flows()
-        return {"flows": self.active_flows}
+        return {"flows": self.flow_manager.flow_rows()}
 
 
+    @metrics.timed("flow_remove", key="service_key")
     def _remove_flows_for_service(self, service_key):
         # The FlowManager handles the direct API calls for removal
         flows = self.flow_manager.get_active_flows()
@@ -340,21 +888,25 @@ class ServiceManager:
                 flows_to_remove.append(flow) # Collect flows associated with the service_key
                 
         # Call remove_flow_queue (which now calls _send_flow_to_ryu for removal) for each.
-        for flow_data in flows_to_remove:
+        for flow in flows_to_remove:
             self.flow_manager.remove_flow_queue(
                 service_key,
-                flow_data['src_ip'],
-                flow_data['dst_ip'],
-                flow_data['protocol'],
-                flow_data['src_port'],
-                flow_data['dst_port']
+                flow[FlowEntry.SRC_IP],
+                flow[FlowEntry.DST_IP],
+                flow[FlowEntry.PROTOCOL],
+                flow[FlowEntry.SRC_PORT],
+                flow[FlowEntry.DST_PORT]
             )
 
-    def _install_flows_for_service(self, net, service_key):
-        apps = {app: instance for (s_k, app), instance in self.service_instances.items() if s_k == service_key}
+    @metrics.timed("flow_install", key="service_key")
+    def _install_flows_for_service(self, net, service_key, placement=None):
+        # placement: {instance_name: host}, defaults to where the service's apps currently run
+        if placement is None:
+            placement = self._current_placement(service_key)
         TCP = 6
         ICMP = 1
-        hosts = [inst["host"] for inst in apps.values()]
+        service_name = self._service_name(service_key)
+        hosts = list(placement.values())
         
         # ICMP flows between all pairs (for ping)
         for i in range(len(hosts)):
@@ -363,26 +915,9 @@ class ServiceManager:
                     net, service_key,
                     hosts[i], hosts[j], ICMP
                 )
-        # Service-specific TCP flows and env updates
-        if service_key.startswith("web"):
-            db, web = apps.get("database"), apps.get("web_server")
-            if db and web:
-                self.flow_manager.add_flow_queue(net, service_key, web["host"], db["host"], TCP, None, db["listen_port"])
-                self._restart_app(web, self.service_definitions["web"][1][1], {"DB_IP": db["ip"], "SERVICE_KEY": service_key})
-        elif service_key.startswith("random"):
-            g1, g2, sum = apps.get("random_gen1"), apps.get("random_gen2"), apps.get("random_sum")
-            if g1 and g2 and sum:
-                self.flow_manager.add_flow_queue(net, service_key, sum["host"], g1["host"], TCP, None, g1["listen_port"])
-                self.flow_manager.add_flow_queue(net, service_key, sum["host"], g2["host"], TCP, None, g2["listen_port"])
-                self._restart_app(sum, self.service_definitions["random"][2][1], {"GEN1_IP": g1["ip"], "GEN2_IP": g2["ip"], "SERVICE_KEY": service_key})
-        elif service_key.startswith("datetime"):
-            date, time, combiner = apps.get("date_fetcher"), apps.get("time_fetcher"), apps.get("datetime_combiner")
-            if date and time and combiner:
-                self.flow_manager.add_flow_queue(net, service_key, combiner["host"], date["host"], TCP, None, date["listen_port"])
-                self.flow_manager.add_flow_queue(net, service_key, combiner["host"], time["host"], TCP, None, time["listen_port"])
-                self._restart_app(combiner, self.service_definitions["datetime"][2][1], {"DATE_IP": date["ip"], "TIME_IP": time["ip"], "SERVICE_KEY": service_key})
-        elif service_key.startswith("colab"):
-            a, b = apps.get("colab_a"), apps.get("colab_b")
-            if a and b:
-                self.flow_manager.add_flow_queue(net, service_key, a["host"], b["host"], TCP, None, b["listen_port"])
-                self._restart_app(a, self.service_definitions["colab"][0][1], {"COLAB_B_IP": b["ip"], "SERVICE_KEY": service_key})
+        # TCP flows from each instance to the listen port of the dependency replicas it is pinned to
+        for instance_name, host in placement.items():
+            for dep, replicas in self._pin_dependencies(service_name, instance_name, placement).items():
+                for dep_instance in replicas:
+                    self.flow_manager.add_flow_queue(net, service_key, host, placement[dep_instance], TCP, None,
+                                                     self.catalog.app(service_name, dep)["listen_port"])
@@ -0,0 +1,225 @@
+import os
+import time
+import selectors
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Supervisor:
+    """
+    Watches every process in ServiceManager.service_instances from a single thread.
+    Process exits are detected through pidfds multiplexed on one selector (falling back
+    to polling where pidfds are unavailable), servers get periodic TCP liveness probes
+    on their listen_port, and failed apps are restarted in place with exponential
+    backoff. An app that keeps failing on its host is moved to another one, which is
+    the only case where its flows are reinstalled.
+    """
+    def __init__(self, service_manager, net, interval=0.5, probe_interval=5.0, probe_failures=3,
+                 backoff_base=0.5, backoff_max=30.0, max_restarts_in_place=3, max_restarts=10, stable_after=30.0):
+        self.service_manager = service_manager
+        self.net = net
+        self.interval = interval
+        self.probe_interval = probe_interval
+        self.probe_failures = probe_failures
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_restarts_in_place = max_restarts_in_place
+        self.max_restarts = max_restarts
+        self.stable_after = stable_after
+        self.state = {}  # (service_key, app_name): {"restarts", "in_place", "next_restart", "probe_failures", "started"}
+        self.watched = {}  # id(process): (pidfd or None, key, process)
+        self.selector = selectors.DefaultSelector()
+        self.use_pidfd = hasattr(os, "pidfd_open")
+        self.probe_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="liveness")
+        self.pending_probes = {}  # key: future
+        self.next_probe = 0
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, name="supervisor", daemon=True)
+        self.thread.start()
+        print("[INFO] Supervisor started")
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2)
+        self.probe_executor.shutdown(wait=False)
+        for pidfd, _, _ in self.watched.values():
+            if pidfd is not None:
+                self.selector.unregister(pidfd)
+                os.close(pidfd)
+        self.watched.clear()
+
+    def _loop(self):
+        while self.running:
+            try:
+                self._sync_watches()
+                self._wait_for_exits()
+                now = time.time()
+                self._run_due_restarts(now)
+                self._collect_probes()
+                if now >= self.next_probe:
+                    self._start_probes()
+                    self.next_probe = now + self.probe_interval
+            except Exception as e:
+                print(f"[ERROR] Supervisor iteration failed: {e}")
+                time.sleep(self.interval)
+
+    def _sync_watches(self):
+        """
+        Watches the current process of every instance and drops watches on processes that
+        were stopped or replaced by a restart.
+        """
+        current = {}
+        for key, instance in list(self.service_manager.service_instances.items()):
+            proc = instance.get("process")
+            if proc is not None and instance.get("status") == "running":
+                current[id(proc)] = (key, proc)
+                self.state.setdefault(key, {"restarts": 0, "in_place": 0, "next_restart": None, "probe_failures": 0, "started": time.time()})
+        for proc_id in list(self.watched):
+            if proc_id not in current:
+                self._unwatch(proc_id)
+        for proc_id, (key, proc) in current.items():
+            if proc_id in self.watched:
+                continue
+            pidfd = None
+            if self.use_pidfd:
+                try:
+                    pidfd = os.pidfd_open(proc.pid)
+                    self.selector.register(pidfd, selectors.EVENT_READ, proc_id)
+                except ProcessLookupError:
+                    pidfd = None
+                except OSError:
+                    # Kernel without pidfd support: poll every process instead
+                    self.use_pidfd = False
+                    pidfd = None
+            self.watched[proc_id] = (pidfd, key, proc)
+        for key in list(self.state):
+            if key not in self.service_manager.service_instances:
+                del self.state[key]
+
+    def _unwatch(self, proc_id):
+        pidfd, _, _ = self.watched.pop(proc_id)
+        if pidfd is not None:
+            self.selector.unregister(pidfd)
+            os.close(pidfd)
+
+    def _wait_for_exits(self):
+        exited = []
+        if any(pidfd is not None for pidfd, _, _ in self.watched.values()):
+            for sel_key, _ in self.selector.select(timeout=self.interval):
+                exited.append(sel_key.data)
+        else:
+            time.sleep(self.interval)
+        # Processes without a pidfd are polled
+        exited.extend(proc_id for proc_id, (pidfd, _, proc) in self.watched.items()
+                      if pidfd is None and proc.poll() is not None)
+        for proc_id in exited:
+            if proc_id in self.watched:
+                _, key, proc = self.watched[proc_id]
+                self._unwatch(proc_id)
+                self._on_exit(key, proc)
+
+    def _on_exit(self, key, proc):
+        instance = self.service_manager.service_instances.get(key)
+        # Expected exits: the app was stopped, replaced or is being moved
+        if not instance or instance["process"] is not proc or instance["status"] != "running":
+            return
+        returncode = proc.poll()
+        service_key, app_name = key
+        policy = self.service_manager.catalog.restart_policy(self.service_manager._service_name(service_key), instance["base_app"])
+        if policy == "never" or (policy == "on-failure" and returncode == 0):
+            instance["status"] = "exited" if returncode == 0 else "failed"
+            print(f"[INFO] {app_name} of {service_key} exited with code {returncode}")
+            return
+        print(f"[WARNING] {app_name} of {service_key} exited with code {returncode}")
+        self._schedule_restart(key, instance)
+
+    def _schedule_restart(self, key, instance):
+        state = self.state[key]
+        if state["restarts"] >= self.max_restarts:
+            instance["status"] = "failed"
+            print(f"[ERROR] {key[1]} of {key[0]} failed {state['restarts']} restarts, giving up")
+            return
+        delay = min(self.backoff_base * (2 ** state["restarts"]), self.backoff_max)
+        state["next_restart"] = time.time() + delay
+        instance["status"] = "restarting"
+        print(f"[INFO] Restarting {key[1]} of {key[0]} in {delay:.1f}s")
+
+    def _run_due_restarts(self, now):
+        for key, state in list(self.state.items()):
+            instance = self.service_manager.service_instances.get(key)
+            if not instance:
+                continue
+            # A process that has been up long enough earns a fresh backoff
+            if instance["status"] == "running" and state["restarts"] and now - state["started"] > self.stable_after:
+                state["restarts"] = 0
+                state["in_place"] = 0
+            if state["next_restart"] is None or now < state["next_restart"] or instance["status"] != "restarting":
+                continue
+            state["next_restart"] = None
+            state["restarts"] += 1
+            state["probe_failures"] = 0
+            self._restart(key, instance, state)
+            state["started"] = time.time()
+
+    def _restart(self, key, instance, state):
+        service_key, app_name = key
+        sm = self.service_manager
+        if state["in_place"] < self.max_restarts_in_place:
+            state["in_place"] += 1
+            with sm._service_lock(service_key):
+                # A concurrent stop or scale-down may have removed it since it was scheduled
+                if sm.service_instances.get(key) is not instance or instance["status"] != "restarting":
+                    return
+                try:
+                    sm._restart_app(instance, instance["command"], sm._app_env(service_key, instance))
+                    instance["status"] = "running"
+                    print(f"[INFO] Restarted {app_name} of {service_key} on {instance['host'].name} (attempt {state['restarts']})")
+                    return
+                except Exception as e:
+                    print(f"[ERROR] In-place restart of {app_name} of {service_key} failed: {e}")
+        # Keeps failing on this host: move it and rewire its flows
+        if sm.relocate_app(self.net, service_key, app_name):
+            state["in_place"] = 0
+            return
+        instance = sm.service_instances.get(key)
+        if instance:
+            self._schedule_restart(key, instance)
+
+    def _start_probes(self):
+        sm = self.service_manager
+        for key, instance in list(sm.service_instances.items()):
+            if key in self.pending_probes or instance.get("status") != "running":
+                continue
+            app = sm.catalog.app(sm._service_name(key[0]), instance["base_app"])
+            # Only servers (apps with a readiness probe) are expected to listen
+            if not app["readiness"] or not instance["listen_port"]:
+                continue
+            self.pending_probes[key] = self.probe_executor.submit(sm.probe_liveness, instance)
+
+    def _collect_probes(self):
+        for key, future in list(self.pending_probes.items()):
+            if not future.done():
+                continue
+            del self.pending_probes[key]
+            instance = self.service_manager.service_instances.get(key)
+            state = self.state.get(key)
+            if not instance or not state or instance["status"] != "running":
+                continue
+            try:
+                alive = future.result()
+            except Exception:
+                alive = False
+            if alive:
+                state["probe_failures"] = 0
+                continue
+            state["probe_failures"] += 1
+            if state["probe_failures"] >= self.probe_failures:
+                print(f"[WARNING] {key[1]} of {key[0]} failed {state['probe_failures']} liveness probes")
+                self._schedule_restart(key, instance)
@@ -0,0 +1,148 @@
+try:
+    from mininet.link import TCLink
+except ImportError:
+    # Only the in-process backend (fakenet), which ignores the link class, works without Mininet
+    TCLink = None
+
+# Link parameters per tier: "host" links hosts to their edge switch, "switch" links ring/linear
+# switches, "aggregation" links edge to aggregation switches (fat-tree) or leaves to spines,
+# "core" links aggregation to core switches (fat-tree)
+DEFAULT_TIERS = {
+    "host": {"bw": 100, "delay": "10ms"},
+    "switch": {"bw": 150, "delay": "5ms"},
+    "aggregation": {"bw": 200, "delay": "2ms"},
+    "core": {"bw": 400, "delay": "1ms"},
+}
+
+# The fixed topologies offered before the generator, kept by name
+PRESETS = {
+    "simple": {"hosts": 6, "switches": 4, "tiers": {"host": {"bw": 50, "delay": "10ms"}, "switch": {"bw": 100, "delay": "5ms"}}},
+    "complex": {"hosts": 19, "switches": 7, "tiers": {"host": {"bw": 100, "delay": "10ms"}, "switch": {"bw": 150, "delay": "5ms"}}},
+}
+
+HOSTS_PER_EDGE = 253  # .1 to .253 of an edge switch's /24
+PREFIX_LEN = 8
+
+
+def host_ip(edge_index, host_index):
+    """
+    Hierarchical address of the host_index-th host below the edge_index-th edge switch:
+    10.<edge_index / 256>.<edge_index % 256>.<host_index + 1>. Every edge switch owns one /24
+    of 10.0.0.0/8, so topologies scale to 65536 edge switches of 253 hosts each.
+    """
+    if host_index >= HOSTS_PER_EDGE:
+        raise ValueError(f"At most {HOSTS_PER_EDGE} hosts per edge switch")
+    if edge_index >= 65536:
+        raise ValueError("At most 65536 edge switches")
+    return f"10.{edge_index // 256}.{edge_index % 256}.{host_index + 1}"
+
+
+class TopologyBuilder:
+    """
+    Adds switches, hosts and links to a Mininet network. Switches and hosts get sequential
+    names (s1, s2, ... and h1, h2, ...) with explicit dpids, hosts get their address from
+    the hierarchical plan and links get the bandwidth and delay of their tier.
+    """
+    def __init__(self, net, tiers=None):
+        self.net = net
+        self.tiers = {tier: dict(params) for tier, params in DEFAULT_TIERS.items()}
+        for tier, params in (tiers or {}).items():
+            self.tiers.setdefault(tier, {}).update(params)
+        self.addresses = {}  # host name: IP
+        self.switch_count = 0
+        self.edge_hosts = {}  # edge index: hosts attached so far
+
+    def switch(self):
+        self.switch_count += 1
+        return self.net.addSwitch(f"s{self.switch_count}", dpid=f"{self.switch_count:016x}")
+
+    def host(self, edge, edge_index):
+        host_index = self.edge_hosts.get(edge_index, 0)
+        self.edge_hosts[edge_index] = host_index + 1
+        name = f"h{len(self.addresses) + 1}"
+        ip = host_ip(edge_index, host_index)
+        host = self.net.addHost(name, ip=f"{ip}/{PREFIX_LEN}")
+        self.addresses[name] = ip
+        self.link(host, edge, "host")
+        return host
+
+    def link(self, node1, node2, tier):
+        params = self.tiers[tier]
+        self.net.addLink(node1, node2, cls=TCLink, bw=params["bw"], delay=params["delay"])
+
+
+def ring(net, hosts, switches, tiers=None, closed=True):
+    """
+    Switches in a ring (or a chain if closed is False), hosts spread round-robin over them.
+    """
+    builder = TopologyBuilder(net, tiers)
+    edges = [builder.switch() for _ in range(switches)]
+    for i in range(hosts):
+        builder.host(edges[i % switches], i % switches)
+    for i in range(switches - 1):
+        builder.link(edges[i], edges[i + 1], "switch")
+    # Two switches are already linked by the chain
+    if closed and switches > 2:
+        builder.link(edges[-1], edges[0], "switch")
+    return builder.addresses
+
+
+def fat_tree(net, k, tiers=None):
+    """
+    k-ary fat-tree: k pods of k/2 edge and k/2 aggregation switches, (k/2)^2 core switches
+    and k/2 hosts per edge switch, k^3/4 hosts in total.
+    """
+    if k < 2 or k % 2:
+        raise ValueError("Fat-tree k must be an even number >= 2")
+    half = k // 2
+    builder = TopologyBuilder(net, tiers)
+    cores = [builder.switch() for _ in range(half * half)]
+    for pod in range(k):
+        aggregations = [builder.switch() for _ in range(half)]
+        for i, aggregation in enumerate(aggregations):
+            for j in range(half):
+                builder.link(aggregation, cores[i * half + j], "core")
+        for e in range(half):
+            edge = builder.switch()
+            for aggregation in aggregations:
+                builder.link(edge, aggregation, "aggregation")
+            for _ in range(half):
+                builder.host(edge, pod * half + e)
+    return builder.addresses
+
+
+def leaf_spine(net, leaves, spines, hosts_per_leaf, tiers=None):
+    """
+    Two-tier Clos: every leaf switch is linked to every spine switch, hosts hang off the leaves.
+    """
+    builder = TopologyBuilder(net, tiers)
+    spine_switches = [builder.switch() for _ in range(spines)]
+    for leaf_index in range(leaves):
+        leaf = builder.switch()
+        for spine in spine_switches:
+            builder.link(leaf, spine, "aggregation")
+        for _ in range(hosts_per_leaf):
+            builder.host(leaf, leaf_index)
+    return builder.addresses
+
+
+def build_topology(topology_type, net, link_type="ring", tiers=None, **params):
+    """
+    Builds a preset ("simple", "complex") or generated ("ring", "linear", "fat-tree", "leaf-spine")
+    topology. Returns {host name: IP} of the addressing plan.
+    """
+    if topology_type in PRESETS:
+        preset = PRESETS[topology_type]
+        preset_tiers = {tier: dict(values) for tier, values in preset["tiers"].items()}
+        for tier, values in (tiers or {}).items():
+            preset_tiers.setdefault(tier, {}).update(values)
+        if link_type not in ("ring", "linear"):
+            raise ValueError("Invalid link_type: choose 'ring' or 'linear'")
+        return ring(net, preset["hosts"], preset["switches"], preset_tiers, closed=link_type == "ring")
+    if topology_type in ("ring", "linear"):
+        return ring(net, params.get("hosts", 6), params.get("switches", 4), tiers, closed=topology_type == "ring")
+    if topology_type == "fat-tree":
+        return fat_tree(net, params.get("k", 4), tiers)
+    if topology_type == "leaf-spine":
+        return leaf_spine(net, params.get("leaves", 4), params.get("spines", 2), params.get("hosts_per_leaf", 4), tiers)
+    raise ValueError(f"Unknown topology type: {topology_type}")